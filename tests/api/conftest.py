@@ -8,6 +8,27 @@ import requests
 from typing import Generator
 import logging
 
+from harness.codec import get_codec, install as install_codec
+from harness.latency import SequentialLatencyTest
+from harness.rate_limit import DEFAULT_RATE, DEFAULT_STATE_DIR, RateLimiter, parse_limits, throttle
+from harness.snapshot import SnapshotMismatch, SnapshotStore
+from harness.dataset import Dataset
+from harness.standin import MAX_LIST, StandInServer
+
+# Opt-in harness plugins (each adds its own command line options)
+pytest_plugins = [
+    'harness.profiling',
+    'harness.memory',
+    'harness.soak',
+    'harness.metrics',
+    'harness.tracing',
+    'harness.compare',
+    'harness.history',
+    'harness.monitor',
+    'harness.cases',
+    'harness.impact',
+]
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -20,11 +41,54 @@ API_ENDPOINTS = {
     'httpbin': 'https://httpbin.org'
 }
 
+# Unpaginated list lengths of the public JSONPlaceholder API
+PUBLIC_LIST_COUNTS = {
+    'users': 10,
+    'posts': 100,
+    'comments': 500,
+    'todos': 200
+}
+
+# Maximum requests per second per API_ENDPOINTS key (ethics limit from perf-plan.md)
+RATE_LIMITS = {
+    'reqres': DEFAULT_RATE,
+    'jsonplaceholder': DEFAULT_RATE,
+    'httpbin': DEFAULT_RATE
+}
+
+
+def pytest_addoption(parser):
+    """Command line options for the shared API session and response helpers"""
+    group = parser.getgroup('api', 'API session')
+    group.addoption('--rate-limit', action='append', default=[], metavar='KEY=RPS',
+                    help='Override the request rate for an API_ENDPOINTS key (repeatable)')
+    group.addoption('--no-rate-limit', action='store_true', default=False,
+                    help='Disable rate limiting (only for local stand-in targets)')
+    group.addoption('--rate-limit-dir', default=DEFAULT_STATE_DIR,
+                    help='Directory holding the token buckets shared between processes')
+    group.addoption('--json-codec', default='auto', choices=('auto', 'orjson', 'stdlib'),
+                    help='JSON codec for response.json() (default: auto, orjson when installed)')
+    group.addoption('--standin', default=None, metavar='DATASET',
+                    help='Serve a generated dataset locally and run against it instead of the public APIs')
+    group.addoption('--fuzz-cases', type=int, default=2000, metavar='N',
+                    help='Generated negative payloads per fuzzed endpoint (default: 2000)')
+    group.addoption('--fuzz-seed', type=int, default=0, help='Seed of the payload generator (default: 0)')
+    group.addoption('--fuzz-concurrency', type=int, default=8, metavar='N',
+                    help='Fuzz requests in flight (default: 8)')
+    group.addoption('--upload-mb', type=float, default=16.0, metavar='MB',
+                    help='Body size of the streamed upload tests (default: 16)')
+    group.addoption('--snapshot-update', action='store_true', default=False,
+                    help='Record new response snapshots and overwrite mismatching ones')
+    group.addoption('--snapshot-dir', default='snapshots',
+                    help='Directory holding response snapshot files (default: snapshots)')
+
 
 @pytest.fixture(scope='session')
-def api_session() -> Generator[requests.Session, None, None]:
+def api_session(pytestconfig) -> Generator[requests.Session, None, None]:
     """
     Creates a requests session for efficient connection pooling
+    Requests are throttled per host to RATE_LIMITS, shared across workers
+    response.json() decodes with the --json-codec codec
     Scope: session (shared across all tests)
     """
     session = requests.Session()
@@ -32,28 +96,74 @@ def api_session() -> Generator[requests.Session, None, None]:
         'User-Agent': 'QA-Test-Suite/1.0',
         'Accept': 'application/json'
     })
+    install_codec(session, get_codec(pytestconfig.getoption('json_codec')))
+    
+    if not pytestconfig.getoption('no_rate_limit'):
+        limits = dict(RATE_LIMITS, **_rate_limit_overrides(pytestconfig))
+        limiter = RateLimiter.from_endpoints(
+            API_ENDPOINTS, limits, state_dir=pytestconfig.getoption('rate_limit_dir')
+        )
+        throttle(session, limiter)
     
     yield session
     
     session.close()
 
 
+@pytest.fixture(scope='session')
+def api_endpoints(pytestconfig) -> Generator[dict, None, None]:
+    """
+    Base URLs per API key: API_ENDPOINTS, or a local stand-in with --standin
+    Scope: session (the stand-in server lives for the whole run)
+    """
+    dataset_path = pytestconfig.getoption('standin')
+    if not dataset_path:
+        yield API_ENDPOINTS
+        return
+    
+    dataset = Dataset(dataset_path)
+    server = StandInServer(dataset).start()
+    logger.info(f"Stand-in API serving {dataset_path} on {server.url}")
+    
+    yield server.endpoints()
+    
+    server.stop()
+    dataset.close()
+
+
+@pytest.fixture(scope='session')
+def list_counts(pytestconfig) -> dict:
+    """
+    Expected length of each unpaginated JSONPlaceholder list
+    PUBLIC_LIST_COUNTS, or with --standin the dataset's counts capped at MAX_LIST
+    """
+    dataset_path = pytestconfig.getoption('standin')
+    if not dataset_path:
+        return PUBLIC_LIST_COUNTS
+    
+    dataset = Dataset(dataset_path)
+    try:
+        return {table: min(count, MAX_LIST) for table, count in dataset.counts.items()}
+    finally:
+        dataset.close()
+
+
 @pytest.fixture
-def reqres_base_url() -> str:
+def reqres_base_url(api_endpoints) -> str:
     """Returns base URL for reqres.in API"""
-    return API_ENDPOINTS['reqres']
+    return api_endpoints['reqres']
 
 
 @pytest.fixture
-def jsonplaceholder_base_url() -> str:
+def jsonplaceholder_base_url(api_endpoints) -> str:
     """Returns base URL for JSONPlaceholder API"""
-    return API_ENDPOINTS['jsonplaceholder']
+    return api_endpoints['jsonplaceholder']
 
 
 @pytest.fixture
-def httpbin_base_url() -> str:
+def httpbin_base_url(api_endpoints) -> str:
     """Returns base URL for httpbin.org API"""
-    return API_ENDPOINTS['httpbin']
+    return api_endpoints['httpbin']
 
 
 @pytest.fixture
@@ -75,8 +185,17 @@ def valid_post_payload() -> dict:
     }
 
 
+def _rate_limit_overrides(config) -> dict:
+    """--rate-limit values; a key outside API_ENDPOINTS is a usage error"""
+    try:
+        return parse_limits(config.getoption('rate_limit'), known=API_ENDPOINTS)
+    except ValueError as exc:
+        raise pytest.UsageError(f"--rate-limit: {exc}")
+
+
 def pytest_configure(config):
     """Custom pytest configuration"""
+    _rate_limit_overrides(config)
     logger.info("=" * 80)
     logger.info("Starting API Test Suite")
     logger.info(f"Testing endpoints: {', '.join(API_ENDPOINTS.keys())}")
@@ -110,13 +229,103 @@ def assert_response_time():
 
 
 @pytest.fixture
-def assert_json_schema():
+def assert_latency_slo(api_session):
+    """
+    Helper fixture to assert a latency percentile SLO with sequential sampling
+    Clear cases are decided on the first response and one resend; borderline ones are re-sent
+    until the sequential test reaches a verdict at the configured error rates
+    Resamples are timed by response.elapsed, which excludes rate-limit waits
+    """
+    def _assert(response: requests.Response, max_time_ms: int = 500, percentile: float = 95,
+                resample=None, **options):
+        if resample is None:
+            if response.request.method not in ('GET', 'HEAD', 'OPTIONS'):
+                raise ValueError(f"Pass resample= to re-sample a {response.request.method} request")
+            resample = lambda: api_session.send(response.request)
+        
+        test = SequentialLatencyTest(max_time_ms, percentile, **options)
+        result = test.run(
+            lambda: resample().elapsed.total_seconds() * 1000,
+            first_ms=response.elapsed.total_seconds() * 1000
+        )
+        logger.info(result.describe(max_time_ms, percentile))
+        assert result.passed, result.describe(max_time_ms, percentile)
+        return result
+    return _assert
+
+
+@pytest.fixture
+def run_scenario(api_session, api_endpoints):
+    """
+    Helper fixture to run a declarative CRUD workflow (harness.scenario)
+    Returns per-step and end-to-end latencies; in-flight workflows are bounded by concurrency
+    """
+    from harness.scenario import ScenarioRunner
+    
+    def _run(scenario, instances: int = 1, concurrency: int = 1, **context):
+        runner = ScenarioRunner(api_session, api_endpoints[scenario.api])
+        result = runner.run(scenario, instances, concurrency, **context)
+        logger.info(f"Scenario {scenario.name}: {result.completed}/{instances} completed, "
+                    f"{result.throughput:.1f} workflows/s")
+        return result
+    return _run
+
+
+@pytest.fixture
+def fuzz(pytestconfig, api_endpoints):
+    """
+    Helper fixture to fuzz one endpoint with payloads derived from a schema and a valid payload
+    Only runs against the local stand-in (--standin); the public APIs are never fuzzed
+    """
+    from harness.fuzz import Fuzzer, generate_cases
+    
+    if not pytestconfig.getoption('standin'):
+        pytest.skip('Fuzzing only runs against the local stand-in (--standin=DATASET)')
+    
+    def _fuzz(api: str, method: str, path: str, schema: dict, payload: dict):
+        fuzzer = Fuzzer(f"{api_endpoints[api]}{path}", method,
+                        concurrency=pytestconfig.getoption('fuzz_concurrency'))
+        cases = generate_cases(schema, payload, pytestconfig.getoption('fuzz_cases'),
+                               pytestconfig.getoption('fuzz_seed'))
+        report = fuzzer.run(cases)
+        logger.info(report.summary())
+        return report
+    return _fuzz
+
+
+@pytest.fixture
+def measure_upload(pytestconfig, api_session, httpbin_base_url):
+    """
+    Helper fixture to stream a chunked upload to the httpbin echo and measure it (harness.upload)
+    Only runs against the local stand-in (--standin); bulk bodies are never sent to the public APIs
+    """
+    from harness.upload import MB, measure_upload as _measure_upload, synthetic_ndjson
+    
+    if not pytestconfig.getoption('standin'):
+        pytest.skip('Bulk uploads only run against the local stand-in (--standin=DATASET)')
+    
+    def _measure(chunks=None, content_type: str = 'application/x-ndjson', **kwargs):
+        if chunks is None:
+            chunks = synthetic_ndjson(int(pytestconfig.getoption('upload_mb') * MB))
+        result = _measure_upload(api_session, f"{httpbin_base_url}/post", chunks, content_type, **kwargs)
+        logger.info(f"Upload of {result.sent_bytes / MB:.1f} MB: {result.upload_mb_s:.1f} MB/s, "
+                    f"echo matches: {result.echo_matches}")
+        return result
+    return _measure
+
+
+@pytest.fixture
+def assert_json_schema(pytestconfig):
     """Helper fixture to validate JSON schema"""
     from jsonschema import validate, ValidationError
+    from harness.impact import record_schema
+    from harness.tracing import span
     
     def _assert(data: dict, schema: dict):
+        record_schema(pytestconfig, schema)
         try:
-            validate(instance=data, schema=schema)
+            with span(pytestconfig, 'validate', 'validate'):
+                validate(instance=data, schema=schema)
             return True
         except ValidationError as e:
             pytest.fail(f"JSON schema validation failed: {e.message}")
@@ -124,6 +333,30 @@ def assert_json_schema():
     return _assert
 
 
+@pytest.fixture
+def assert_snapshot(request):
+    """
+    Helper fixture to compare JSON data against its stored snapshot
+    Volatile fields (createdAt, updatedAt, uuid, origin) are masked by default
+    """
+    store = SnapshotStore(
+        str(request.config.rootpath / request.config.getoption('snapshot_dir')),
+        update=request.config.getoption('snapshot_update')
+    )
+    calls = []
+    
+    def _assert(data, name: str = None, mask: list = None):
+        calls.append(name)
+        suffix = name or str(len(calls))
+        key = f"{request.node.path.stem}/{request.node.name}-{suffix}"
+        try:
+            return store.check(key, data, mask)
+        except SnapshotMismatch as e:
+            pytest.fail(str(e))
+    
+    return _assert
+
+
 # JSON Schemas for validation
 USER_SCHEMA = {
     "type": "object",
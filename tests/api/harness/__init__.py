@@ -0,0 +1,4 @@
+"""
+Test harness support for the API test suite
+Plugins and helpers used by conftest.py; contains no test cases itself
+"""
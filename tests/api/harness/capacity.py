@@ -0,0 +1,373 @@
+"""
+Capacity search: the highest request rate a target sustains within the SLOs
+Runs the load-test.js request mix with a closed-loop load generator and
+searches over concurrency: doubling until a step breaks the thresholds declared
+in performance/load-test.js (p95, http_req_failed, api_errors), then bisecting
+between the last passing and first failing concurrency. Reports the maximum
+sustainable RPS, the latency curve of every step and the knee, where latency
+starts to grow sharply.
+
+Only for local stand-ins and staging; public API hosts are refused.
+
+Usage:
+    python -m harness.capacity --standin=data/bench-1m.qads
+    python -m harness.capacity --url http://127.0.0.1:8080 --step-duration 15 --report capacity.json
+    python -m harness.capacity --target jsonplaceholder=https://staging.example.com --max-concurrency 512
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import requests
+
+from harness.scenario import pooled_session
+from harness.soak import percentile
+
+LOAD_TEST_JS = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..',
+                                            'performance', 'load-test.js'))
+
+# Hosts that must never be load tested (see performance/perf-plan.md)
+PUBLIC_HOSTS = ('reqres.in', 'jsonplaceholder.typicode.com', 'httpbin.org')
+
+# A step whose client used more than this share of one core is limited by the
+# client (GIL), not necessarily by the target
+CLIENT_BOUND_CPU = 0.9
+
+
+@dataclass
+class Thresholds:
+    """SLOs a step must meet; defaults match performance/load-test.js"""
+
+    p95_ms: float = 500.0
+    failed_rate: float = 0.01
+    api_error_rate: float = 0.05
+
+    @classmethod
+    def from_k6(cls, path: str = LOAD_TEST_JS) -> 'Thresholds':
+        """Read http_req_duration p(95), http_req_failed and api_errors from a k6 script"""
+        thresholds = cls()
+        if not os.path.exists(path):
+            return thresholds
+        with open(path) as f:
+            script = f.read()
+        patterns = {
+            'p95_ms': r"http_req_duration:\s*\[[^\]]*'p\(95\)<(\d+(?:\.\d+)?)'",
+            'failed_rate': r"http_req_failed:\s*\[[^\]]*'rate<(\d*\.?\d+)'",
+            'api_error_rate': r"api_errors:\s*\[[^\]]*'rate<(\d*\.?\d+)'",
+        }
+        for name, pattern in patterns.items():
+            match = re.search(pattern, script)
+            if match:
+                setattr(thresholds, name, float(match.group(1)))
+        return thresholds
+
+
+@dataclass
+class Request:
+    """One entry of the request mix, relative to an API_ENDPOINTS key"""
+
+    api: str
+    method: str
+    path: str
+    json: Any = None
+    expect: int = 200
+
+
+# The requests of performance/load-test.js, in the same order
+LOAD_TEST_MIX = (
+    Request('reqres', 'GET', '/users?page=2'),
+    Request('reqres', 'GET', '/users/2'),
+    Request('jsonplaceholder', 'GET', '/posts?_limit=10'),
+    Request('jsonplaceholder', 'POST', '/posts', json={'title': 'k6 Performance Test',
+                                                       'body': 'This is a test post from k6 load testing',
+                                                       'userId': 1}, expect=201),
+    Request('httpbin', 'GET', '/get?test=performance'),
+    Request('httpbin', 'POST', '/post', json={'test': 'performance'}),
+)
+
+
+@dataclass
+class StepResult:
+    """Measurements of one fixed-concurrency step (after its warm-up)"""
+
+    concurrency: int
+    duration_s: float = 0.0
+    requests: int = 0
+    latencies_ms: List[float] = field(default_factory=list)
+    failed: int = 0
+    api_errors: int = 0
+    cpu_s: float = 0.0
+
+    @property
+    def rps(self) -> float:
+        return self.requests / self.duration_s if self.duration_s else 0.0
+
+    @property
+    def p95_ms(self) -> Optional[float]:
+        return percentile(self.latencies_ms, 95)
+
+    @property
+    def failed_rate(self) -> float:
+        return self.failed / self.requests if self.requests else 1.0
+
+    @property
+    def api_error_rate(self) -> float:
+        return self.api_errors / self.requests if self.requests else 1.0
+
+    def violations(self, thresholds: Thresholds) -> List[str]:
+        """Thresholds this step breaks, in k6 notation"""
+        broken = []
+        if self.p95_ms is None or self.p95_ms >= thresholds.p95_ms:
+            broken.append(f"p(95)<{thresholds.p95_ms:g}")
+        if self.failed_rate >= thresholds.failed_rate:
+            broken.append(f"http_req_failed<{thresholds.failed_rate:g}")
+        if self.api_error_rate >= thresholds.api_error_rate:
+            broken.append(f"api_errors<{thresholds.api_error_rate:g}")
+        return broken
+
+    def summary(self, thresholds: Thresholds) -> dict:
+        cpu = self.cpu_s / self.duration_s if self.duration_s else 0.0
+        return {
+            'concurrency': self.concurrency,
+            'requests': self.requests,
+            'rps': round(self.rps, 1),
+            'p50_ms': _round(percentile(self.latencies_ms, 50)),
+            'p95_ms': _round(self.p95_ms),
+            'p99_ms': _round(percentile(self.latencies_ms, 99)),
+            'failed_rate': round(self.failed_rate, 4),
+            'api_error_rate': round(self.api_error_rate, 4),
+            'client_cpu': round(cpu, 2),
+            'client_bound': cpu > CLIENT_BOUND_CPU,
+            'violations': self.violations(thresholds),
+        }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 2)
+
+
+class LoadGenerator:
+    """Closed-loop load: `concurrency` threads each send the mix back to back"""
+
+    def __init__(self, endpoints: Dict[str, str], mix: Sequence[Request] = LOAD_TEST_MIX, timeout: float = 10.0):
+        self.targets = [(request, endpoints[request.api].rstrip('/') + request.path)
+                        for request in mix if request.api in endpoints]
+        if not self.targets:
+            raise ValueError(f"No request of the mix targets {', '.join(endpoints) or 'any API'}")
+        self.timeout = timeout
+
+    def run_step(self, concurrency: int, duration: float, warmup: float = 0.0) -> StepResult:
+        """Run for warmup + duration seconds; only requests started after the warm-up count"""
+        session = pooled_session(concurrency)
+        result = StepResult(concurrency)
+        lock = threading.Lock()
+        started = time.perf_counter()
+        measure_from = started + warmup
+        deadline = measure_from + duration
+
+        def worker(offset: int):
+            latencies, sent_count, failed, api_errors = [], 0, 0, 0
+            index = offset
+            while True:
+                request, url = self.targets[index % len(self.targets)]
+                index += 1
+                sent = time.perf_counter()
+                if sent >= deadline:
+                    break
+                try:
+                    response = session.request(request.method, url, json=request.json, timeout=self.timeout)
+                except requests.RequestException:
+                    response = None
+                if sent < measure_from:
+                    continue
+                sent_count += 1
+                if response is None:
+                    failed += 1
+                    api_errors += 1
+                    continue
+                latencies.append(response.elapsed.total_seconds() * 1000)
+                if response.status_code >= 400:
+                    failed += 1
+                if response.status_code != request.expect:
+                    api_errors += 1
+            with lock:
+                result.requests += sent_count
+                result.latencies_ms.extend(latencies)
+                result.failed += failed
+                result.api_errors += api_errors
+
+        threads = [threading.Thread(target=worker, args=(index,), name=f"load-{index}", daemon=True)
+                   for index in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        time.sleep(max(0.0, measure_from - time.perf_counter()))
+        cpu_started = time.process_time()
+        time.sleep(max(0.0, deadline - time.perf_counter()))
+        result.cpu_s = time.process_time() - cpu_started
+        for thread in threads:
+            thread.join()
+        session.close()
+        result.duration_s = duration
+        return result
+
+
+def search(run_step: Callable[[int], StepResult], thresholds: Thresholds, start: int = 1,
+           max_concurrency: int = 256, log: Optional[Callable[[StepResult], None]] = None) -> List[StepResult]:
+    """
+    Doubling then bisection over concurrency; returns every step run
+    The bracket narrows until the last passing and first failing concurrency
+    are adjacent, or the search reaches max_concurrency without a failure.
+    """
+    steps: Dict[int, StepResult] = {}
+
+    def passes(concurrency: int) -> bool:
+        if concurrency not in steps:
+            steps[concurrency] = run_step(concurrency)
+            if log is not None:
+                log(steps[concurrency])
+        return not steps[concurrency].violations(thresholds)
+
+    good, bad = 0, None
+    concurrency = max(1, start)
+    while concurrency <= max_concurrency:
+        if not passes(concurrency):
+            bad = concurrency
+            break
+        good = concurrency
+        if concurrency == max_concurrency:
+            break
+        concurrency = min(concurrency * 2, max_concurrency)
+    while bad is not None and bad - good > 1 and good > 0:
+        middle = (good + bad) // 2
+        if passes(middle):
+            good = middle
+        else:
+            bad = middle
+    return [steps[concurrency] for concurrency in sorted(steps)]
+
+
+def find_knee(curve: Sequence[Tuple[float, float]]) -> Optional[int]:
+    """
+    Index of the knee of a (rps, p95_ms) curve ordered by concurrency
+    The knee is the step with the highest power, throughput / latency
+    (Kleinrock): beyond it, added concurrency raises latency faster than
+    throughput. None for fewer than three points, where no bend can show.
+    """
+    if len(curve) < 3:
+        return None
+    powers = [rps / p95 if p95 else 0.0 for rps, p95 in curve]
+    return max(range(len(curve)), key=lambda index: powers[index])
+
+
+def report(steps: Sequence[StepResult], thresholds: Thresholds, max_concurrency: int) -> dict:
+    """Maximum sustainable RPS, the latency curve and its knee"""
+    curve = [step.summary(thresholds) for step in steps]
+    passing = [entry for entry in curve if not entry['violations']]
+    best = max(passing, key=lambda entry: entry['rps']) if passing else None
+    measured = [entry for entry in curve if entry['p95_ms'] is not None]
+    knee = find_knee([(entry['rps'], entry['p95_ms']) for entry in measured])
+    return {
+        'thresholds': {'p95_ms': thresholds.p95_ms, 'http_req_failed': thresholds.failed_rate,
+                       'api_errors': thresholds.api_error_rate},
+        'max_sustainable_rps': best['rps'] if best else None,
+        # Lowest concurrency reaching that rate, and the highest one still passing
+        'at_concurrency': best['concurrency'] if best else None,
+        'max_passing_concurrency': passing[-1]['concurrency'] if passing else None,
+        # A step failed; when False the target may sustain more than was tried
+        'limit_reached': len(passing) < len(curve),
+        'max_concurrency': max_concurrency,
+        'knee': measured[knee] if knee is not None else None,
+        'client_bound_steps': [entry['concurrency'] for entry in curve if entry['client_bound']],
+        'curve': curve,
+    }
+
+
+def standin_endpoints(url: str) -> Dict[str, str]:
+    """API_ENDPOINTS of a server with the stand-in layout"""
+    base = url.rstrip('/')
+    return {'reqres': f"{base}/api", 'jsonplaceholder': base, 'httpbin': base}
+
+
+def serve_standin(dataset: str) -> Tuple[subprocess.Popen, str]:
+    """
+    Start a stand-in in its own process, so it does not compete with the load
+    generator for the GIL; returns the process and its base URL
+    """
+    process = subprocess.Popen(
+        [sys.executable, '-u', '-m', 'harness.standin', dataset, '--port', '0'],
+        stdout=subprocess.PIPE, text=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    match = re.search(r'https?://\S+', process.stdout.readline())
+    if match is None:
+        process.kill()
+        raise SystemExit(f"Stand-in for {dataset} did not start")
+    return process, match.group(0)
+
+
+def _check_target(url: str) -> None:
+    host = requests.utils.urlparse(url).hostname or ''
+    if any(host == public or host.endswith('.' + public) for public in PUBLIC_HOSTS):
+        raise SystemExit(f"Refusing to load test public API host {host}; use --standin or a staging URL")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Find the highest request rate a target sustains within the SLOs')
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--standin', metavar='DATASET', help='Serve a generated dataset locally and search it')
+    target.add_argument('--url', help='Base URL of a stand-in layout server (reqres under /api)')
+    target.add_argument('--target', action='append', metavar='KEY=URL',
+                        help='Base URL of one API_ENDPOINTS key; only its requests of the mix are sent (repeatable)')
+    parser.add_argument('--step-duration', type=float, default=10.0, help='Measured seconds per step (default: 10)')
+    parser.add_argument('--warmup', type=float, default=2.0, help='Unmeasured seconds per step (default: 2)')
+    parser.add_argument('--start', type=int, default=1, help='First concurrency (default: 1)')
+    parser.add_argument('--max-concurrency', type=int, default=256)
+    parser.add_argument('--thresholds', default=LOAD_TEST_JS, metavar='K6_SCRIPT',
+                        help='k6 script declaring the thresholds (default: performance/load-test.js)')
+    parser.add_argument('--report', default=None, metavar='PATH', help='Also write the JSON report to PATH')
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.standin:
+        server, base = serve_standin(args.standin)
+        endpoints = standin_endpoints(base)
+    elif args.url:
+        endpoints = standin_endpoints(args.url)
+    else:
+        endpoints = dict(value.split('=', 1) for value in args.target)
+    for url in endpoints.values():
+        _check_target(url)
+
+    thresholds = Thresholds.from_k6(args.thresholds)
+    generator = LoadGenerator(endpoints)
+
+    def log(step: StepResult) -> None:
+        entry = step.summary(thresholds)
+        verdict = 'FAIL ' + ', '.join(entry['violations']) if entry['violations'] else 'ok'
+        print(f"concurrency {entry['concurrency']:>4}: {entry['rps']:>8} rps  p95 {entry['p95_ms']} ms  "
+              f"failed {entry['failed_rate']:.2%}  {verdict}", file=sys.stderr)
+
+    try:
+        steps = search(lambda concurrency: generator.run_step(concurrency, args.step_duration, args.warmup),
+                       thresholds, args.start, args.max_concurrency, log)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    result = report(steps, thresholds, args.max_concurrency)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(result, f, indent=2)
+    print(json.dumps(result, indent=2))
+    return 0 if result['max_sustainable_rps'] is not None else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
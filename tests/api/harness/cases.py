@@ -0,0 +1,296 @@
+"""
+Lazy, generator-backed parametrization
+@lazy_cases collects a test as a few shard items instead of one item per case;
+the cases are read from a JSONL or CSV file, a generator or the stand-in
+dataset only while the shard runs, and every case is reported under its own
+nodeid (test_get_post[post-123]). Collection time and memory do not depend on
+the number of cases.
+
+Files are split into shards by byte range (one record per line), so a shard
+seeks straight to its part without an index; generators are split round-robin.
+Function-scoped fixtures are set up once per shard and shared by its cases.
+
+Usage:
+    @lazy_cases('post_id', standin_ids('posts'), ids='post-{}')
+    @lazy_cases('row', jsonl_cases('data/users.jsonl'), ids=lambda row: f"user-{row['id']}")
+    @lazy_cases('user_id', generated_cases(lambda: range(1, 1000001)))
+
+    pytest --lazy-shards 8 --lazy-limit 1000 --lazy-case post-17 --lazy-case post-18
+"""
+
+import csv
+import io
+import itertools
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple, Union
+
+import pytest
+from _pytest.skipping import evaluate_xfail_marks, xfailed_key
+
+from harness.dataset import Dataset
+
+MARKER = 'lazy_cases'
+
+Ids = Union[None, str, Callable[[Any], str]]
+
+
+class CaseSource(ABC):
+    """Produces one shard's cases; sources are re-iterable and keep no cases in memory"""
+
+    @abstractmethod
+    def iterate(self, config, shard: int, shards: int) -> Iterator[Any]:
+        """The cases of shard (0-based) out of shards"""
+
+
+def _byte_range_lines(path: str, shard: int, shards: int, skip_first: bool = False) -> Iterator[bytes]:
+    """Lines starting inside the shard's byte range of the file"""
+    size = os.path.getsize(path)
+    start, end = size * shard // shards, size * (shard + 1) // shards
+    with open(path, 'rb') as f:
+        if skip_first:
+            header_end = len(f.readline())
+            start = max(start, header_end)
+        if start:
+            # The line containing start belongs to the previous shard unless it starts there
+            f.seek(start - 1)
+            f.readline()
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            yield line
+
+
+class JsonlCases(CaseSource):
+    """One JSON value per line"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def iterate(self, config, shard, shards):
+        path = os.path.join(str(config.rootpath), self.path)
+        for line in _byte_range_lines(path, shard, shards):
+            if line.strip():
+                yield json.loads(line)
+
+
+class CsvCases(CaseSource):
+    """Rows of a CSV file with a header line, as dicts or as one converted column"""
+
+    def __init__(self, path: str, column: Optional[str] = None, convert: Callable[[str], Any] = str):
+        self.path = path
+        self.column = column
+        self.convert = convert
+
+    def iterate(self, config, shard, shards):
+        path = os.path.join(str(config.rootpath), self.path)
+        with open(path, newline='') as f:
+            header = next(csv.reader(f))
+        for line in _byte_range_lines(path, shard, shards, skip_first=True):
+            if not line.strip():
+                continue
+            row = dict(zip(header, next(csv.reader(io.StringIO(line.decode('utf-8'))))))
+            yield row if self.column is None else self.convert(row[self.column])
+
+
+class GeneratedCases(CaseSource):
+    """Cases from a zero-argument factory returning an iterable; shards take every n-th case"""
+
+    def __init__(self, factory: Callable[[], Iterable[Any]]):
+        self.factory = factory
+
+    def iterate(self, config, shard, shards):
+        return itertools.islice(self.factory(), shard, None, shards)
+
+
+class StandInIds(CaseSource):
+    """Every id of a stand-in dataset table (--standin); skips against the public APIs"""
+
+    def __init__(self, table: str):
+        self.table = table
+
+    def iterate(self, config, shard, shards):
+        path = config.getoption('standin', None)
+        if not path:
+            pytest.skip('Every-id cases run against the local stand-in only (--standin)')
+        dataset = Dataset(path)
+        try:
+            count = dataset.counts[self.table]
+        finally:
+            dataset.close()
+        return iter(range(1 + shard, count + 1, shards))
+
+
+jsonl_cases = JsonlCases
+csv_cases = CsvCases
+generated_cases = GeneratedCases
+standin_ids = StandInIds
+
+
+def lazy_cases(argname: str, source: CaseSource, ids: Ids = None):
+    """Parametrize argname over source lazily; ids is a format string ('post-{}') or a callable"""
+    return pytest.mark.lazy_cases(argname, source, ids=ids)
+
+
+def case_id(case: Any, ids: Ids, index: int) -> str:
+    if callable(ids):
+        return str(ids(case))
+    if isinstance(ids, str):
+        return ids.format(case)
+    if isinstance(case, (str, int, float, bool)):
+        return str(case)
+    return f"case{index}"
+
+
+class Shard:
+    """Parameter value of a shard item; replaced by each case when the shard runs"""
+
+    def __init__(self, index: int, count: int):
+        self.index = index
+        self.count = count
+
+    @property
+    def id(self) -> str:
+        return 'lazy' if self.count == 1 else f"lazy{self.index + 1}of{self.count}"
+
+    def __repr__(self):
+        return f"<Shard {self.id}>"
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('lazy cases', 'Lazy parametrization')
+    group.addoption('--lazy-shards', type=int, default=None, metavar='N',
+                    help='Shard items per lazily parametrized test (default: 1, or the xdist worker count)')
+    group.addoption('--lazy-limit', type=int, default=None, metavar='N',
+                    help='Run at most N cases per shard')
+    group.addoption('--lazy-case', action='append', default=[], metavar='ID',
+                    help='Run only the cases with this id, e.g. to rerun a failure (repeatable)')
+
+
+def _shard_count(config) -> int:
+    shards = config.getoption('lazy_shards')
+    if shards:
+        return shards
+    workers = getattr(config.option, 'numprocesses', None)
+    if isinstance(workers, int) and workers > 0:
+        return workers
+    if workers == 'auto':
+        return os.cpu_count() or 1
+    return 1
+
+
+def pytest_generate_tests(metafunc):
+    marker = metafunc.definition.get_closest_marker(MARKER)
+    if marker is None:
+        return
+    shards = [Shard(index, _shard_count(metafunc.config)) for index in range(_shard_count(metafunc.config))]
+    metafunc.parametrize(marker.args[0], shards, ids=[shard.id for shard in shards])
+
+
+def _report(item, nodeid: str, when: str, outcome: str = 'passed', longrepr=None, start: float = 0.0,
+            duration: float = 0.0, user_properties=(), wasxfail: Optional[str] = None) -> pytest.TestReport:
+    path, lineno, _ = item.location
+    report = pytest.TestReport(
+        nodeid, (path, lineno, nodeid.split('::', 1)[-1]), {name: 1 for name in item.keywords}, outcome, longrepr,
+        when,
+        duration=duration, start=start, stop=start + duration, user_properties=list(user_properties),
+    )
+    if wasxfail is not None:
+        report.wasxfail = wasxfail
+    return report
+
+
+def _run_case(item, call: Callable[[], Any], xfailed=None) -> Tuple[str, Any, Optional[str]]:
+    """
+    (outcome, longrepr, wasxfail) of one case, rendered like a regular test's
+    report: pytest.fail() fails only its case, pytest.skip() and pytest.xfail()
+    skip or xfail it, and an xfail marker (xfailed) applies to every case
+    """
+    path, lineno = item.location[:2]
+    if xfailed is not None and not xfailed.run:
+        return 'skipped', (str(path), (lineno or 0) + 1, f"[NOTRUN] {xfailed.reason}"), xfailed.reason
+    try:
+        call()
+    except pytest.skip.Exception as e:
+        return 'skipped', (str(path), (lineno or 0) + 1, f"Skipped: {e.msg}"), None
+    except pytest.xfail.Exception as e:
+        return 'skipped', item.repr_failure(pytest.ExceptionInfo.from_current()), e.msg
+    except (Exception, pytest.fail.Exception) as e:
+        longrepr = item.repr_failure(pytest.ExceptionInfo.from_current())
+        if xfailed is not None and _expected(xfailed.raises, e):
+            return 'skipped', longrepr, xfailed.reason
+        return 'failed', longrepr, None
+    if xfailed is not None:
+        if xfailed.strict:
+            return 'failed', f"[XPASS(strict)] {xfailed.reason}", None
+        return 'passed', None, xfailed.reason
+    return 'passed', None, None
+
+
+def _expected(raises, exc: BaseException) -> bool:
+    """Whether an xfail marker's raises= accepts exc (a type, a tuple or pytest.RaisesExc)"""
+    if raises is None:
+        return True
+    if isinstance(raises, (type, tuple)):
+        return isinstance(exc, raises)
+    return raises.matches(exc)
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_pyfunc_call(pyfuncitem):
+    callspec = getattr(pyfuncitem, 'callspec', None)
+    marker = pyfuncitem.get_closest_marker(MARKER)
+    if marker is None or callspec is None:
+        return None
+    argname, source = marker.args[0], marker.args[1]
+    shard = callspec.params.get(argname)
+    if not isinstance(shard, Shard):
+        return None
+
+    config = pyfuncitem.config
+    session = pyfuncitem.session
+    selected = set(config.getoption('lazy_case'))
+    limit = config.getoption('lazy_limit')
+    ids = marker.kwargs.get('ids')
+    xfailed = None if config.option.runxfail else evaluate_xfail_marks(pyfuncitem)
+    if xfailed is not None:
+        # The marker is applied per case; a falsy non-None value stops pytest
+        # from re-evaluating it for the shard item, which only runs the cases
+        pyfuncitem.stash[xfailed_key] = False
+    funcargs = {name: pyfuncitem.funcargs[name] for name in pyfuncitem._fixtureinfo.argnames}
+    # Progress stays per collected item; cases would push it past 100%
+    progress = getattr(config.pluginmanager.get_plugin('terminalreporter'), '_progress_nodeids_reported', set())
+    ran = 0
+    prefix = pyfuncitem.nodeid[:-len(callspec.id) - 2]
+    for index, case in enumerate(source.iterate(config, shard.index, shard.count)):
+        name = case_id(case, ids, index * shard.count + shard.index)
+        if selected and name not in selected:
+            continue
+        if limit is not None and ran >= limit:
+            break
+        ran += 1
+        nodeid = f"{prefix}[{callspec.id.replace(shard.id, name)}]"
+        started, clock = time.time(), time.perf_counter()
+        outcome, longrepr, wasxfail = _run_case(
+            pyfuncitem, lambda: pyfuncitem.obj(**dict(funcargs, **{argname: case})), xfailed
+        )
+        duration = time.perf_counter() - clock
+        hook = pyfuncitem.ihook
+        hook.pytest_runtest_logreport(report=_report(pyfuncitem, nodeid, 'setup', start=started))
+        hook.pytest_runtest_logreport(report=_report(
+            pyfuncitem, nodeid, 'call', outcome, longrepr, started, duration, [('lazy_case', name)], wasxfail
+        ))
+        hook.pytest_runtest_logreport(report=_report(pyfuncitem, nodeid, 'teardown', start=started + duration))
+        progress.discard(nodeid)
+        if session.shouldfail or session.shouldstop:
+            break
+    pyfuncitem.user_properties.append(('lazy_cases', ran))
+    return True
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', f"{MARKER}(argname, source, ids=None): parametrize lazily from a "
+                                       "CaseSource (harness.cases)")
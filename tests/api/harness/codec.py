@@ -0,0 +1,104 @@
+"""
+Pluggable JSON codec for api_session
+response.json() decodes the raw body bytes directly with the fastest available
+parser (orjson when installed) instead of decoding to text first. Anything the
+fast codec cannot handle exactly like requests + stdlib json (non-UTF-8
+charsets, BOMs, NaN, integers beyond 64 bits, json() keyword arguments,
+malformed bodies) falls back to the stock requests code path, so results and
+exceptions are identical. The one difference: bodies nested deeper than the
+interpreter recursion limit decode instead of raising RecursionError.
+
+`json=` request bodies are left to requests: orjson writes compact separators
+and raw UTF-8 where json.dumps writes ', ' and \\uXXXX escapes, so its bytes
+would differ from what the stdlib sends.
+"""
+
+import json
+from functools import partial
+from typing import Any, Callable, Optional
+
+import requests
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_UTF8 = (None, 'utf-8', 'utf8', 'UTF-8')
+
+# orjson parses integers outside [-2**63, 2**64) as floats; any run of 19 digits
+# (in a number or a string) sends the body to the stdlib parser instead. Bodies
+# are scanned in windows overlapping by 18 bytes, so the scan copies at most one
+# window at a time (a regex search is several times slower on numeric bodies)
+_DIGITS = bytes(0x30 if 0x30 <= byte <= 0x39 else 0x20 for byte in range(256))
+_LONG_RUN = b'0' * 19
+_WINDOW = 1 << 16
+
+
+def _has_long_digit_run(data: bytes) -> bool:
+    step = _WINDOW - len(_LONG_RUN) + 1
+    return any(_LONG_RUN in data[start:start + _WINDOW].translate(_DIGITS) for start in range(0, len(data), step))
+
+
+class StdlibCodec:
+    """The stock requests behaviour; installing it adds no overhead"""
+
+    name = 'stdlib'
+    fast = False
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class OrjsonCodec:
+    """orjson: parses bytes without an intermediate str"""
+
+    name = 'orjson'
+    fast = True
+
+    def loads(self, data: bytes) -> Any:
+        if _has_long_digit_run(data):
+            raise ValueError('integer may exceed 64 bits')
+        return orjson.loads(data)
+
+
+CODECS = {'stdlib': StdlibCodec, 'orjson': OrjsonCodec}
+
+
+def get_codec(name: str = 'auto'):
+    """'auto' picks orjson when installed, otherwise the stdlib codec"""
+    if name == 'auto':
+        name = 'orjson' if orjson is not None else 'stdlib'
+    if name not in CODECS:
+        raise ValueError(f"Unknown JSON codec '{name}' (choose from auto, {', '.join(CODECS)})")
+    if name == 'orjson' and orjson is None:
+        raise ValueError("JSON codec 'orjson' requested but orjson is not installed")
+    return CODECS[name]()
+
+
+def _decode(codec, response: requests.Response, **kwargs) -> Any:
+    if not kwargs and response.encoding in _UTF8:
+        try:
+            return codec.loads(response.content)
+        except ValueError:
+            pass
+    # Let requests produce the exact result or exception
+    return requests.Response.json(response, **kwargs)
+
+
+def _attach(session: requests.Session, response: requests.Response, *args, **kwargs) -> None:
+    codec = session.json_codec
+    if codec.fast:
+        response.json = partial(_decode, codec, response)
+
+
+def install(session: requests.Session, codec) -> Callable[[], None]:
+    """Use codec for response.json() on this session; returns an undo callable"""
+    previous: Optional[object] = getattr(session, 'json_codec', None)
+    session.json_codec = codec
+    if previous is None:
+        session.hooks['response'].append(partial(_attach, session))
+
+    def undo():
+        session.json_codec = previous or StdlibCodec()
+    return undo
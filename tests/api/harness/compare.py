@@ -0,0 +1,297 @@
+"""
+A/B comparison of api_session configurations
+Runs the selected tests repeatedly under two or more named session variants,
+interleaved per test and rotated per round so drift in the network or the
+target affects every variant equally, then reports per-endpoint latency and
+per-test CPU ratios against the first (reference) variant with bootstrap
+confidence intervals
+
+Usage:
+    pytest -m smoke --compare baseline,no-keepalive --compare-rounds 10
+    pytest --compare baseline,pool-1,no-compression --compare-file comparison.json
+    pytest --compare baseline,tuned --compare-variant tuned=mypkg.variants:tuned
+"""
+
+import copy
+import importlib
+import json
+import logging
+import random
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+
+from harness import codec
+from harness.standin import route_template
+
+logger = logging.getLogger(__name__)
+
+NO_DIFFERENCE = 'no significant difference'
+
+# A variant applies itself to the session and returns a callable undoing it.
+# Variants that change connection behaviour should use their own pool, or they
+# leave closed or differently configured connections behind for the others.
+Variant = Callable[[requests.Session], Optional[Callable[[], None]]]
+
+
+def _mount_copies(session: requests.Session, copies: Dict[str, HTTPAdapter],
+                  maxsize: Optional[int] = None) -> Callable[[], None]:
+    """
+    Mount the variant's own copies of the session adapters (keeping their
+    retry and pool settings) so its connections never mix with other variants' pools
+    """
+    previous = dict(session.adapters)
+    for prefix, adapter in previous.items():
+        if prefix not in copies:
+            size = adapter._pool_maxsize if maxsize is None else maxsize
+            clone = copy.copy(adapter)
+            clone.init_poolmanager(adapter._pool_connections, size, adapter._pool_block)
+            clone.proxy_manager = {}
+            clone._pool_maxsize = size
+            copies[prefix] = clone
+        session.mount(prefix, copies[prefix])
+
+    def undo():
+        for prefix, adapter in previous.items():
+            session.mount(prefix, adapter)
+    return undo
+
+
+def set_header(name: str, value: str) -> Variant:
+    """Send an extra header, on a separate connection pool"""
+    copies: Dict[str, HTTPAdapter] = {}
+
+    def apply(session):
+        previous = session.headers.get(name)
+        session.headers[name] = value
+        unmount = _mount_copies(session, copies)
+
+        def undo():
+            unmount()
+            if previous is None:
+                session.headers.pop(name, None)
+            else:
+                session.headers[name] = previous
+        return undo
+    return apply
+
+
+def pool_size(maxsize: int) -> Variant:
+    """Connection pool of another size"""
+    copies: Dict[str, HTTPAdapter] = {}
+    return lambda session: _mount_copies(session, copies, maxsize)
+
+
+VARIANTS: Dict[str, Variant] = {
+    'baseline': lambda session: None,
+    'no-keepalive': set_header('Connection', 'close'),
+    'no-compression': set_header('Accept-Encoding', 'identity'),
+    'json-stdlib': lambda session: codec.install(session, codec.StdlibCodec()),
+}
+if codec.orjson is not None:
+    VARIANTS['json-orjson'] = lambda session: codec.install(session, codec.OrjsonCodec())
+
+
+def resolve_variant(name: str, custom: Dict[str, str]) -> Variant:
+    """Built-in variant, pool-<N>, or NAME=module:function from --compare-variant"""
+    if name in custom:
+        module, _, attribute = custom[name].partition(':')
+        return getattr(importlib.import_module(module), attribute)
+    if name in VARIANTS:
+        return VARIANTS[name]
+    if name.startswith('pool-') and name[5:].isdigit():
+        return pool_size(int(name[5:]))
+    raise pytest.UsageError(
+        f"Unknown comparison variant '{name}' (built-in: {', '.join(VARIANTS)}, pool-<N>; "
+        f"or define it with --compare-variant {name}=module:function)"
+    )
+
+
+def _median(values: Sequence[float]) -> float:
+    ordered = sorted(values)
+    mid = len(ordered) // 2
+    return ordered[mid] if len(ordered) % 2 else (ordered[mid - 1] + ordered[mid]) / 2
+
+
+def bootstrap_ratio(reference: Sequence[float], candidate: Sequence[float], confidence: float = 0.95,
+                    resamples: int = 2000, seed: int = 0) -> Tuple[float, float, float]:
+    """Ratio of medians (candidate / reference) with a percentile bootstrap interval"""
+    rng = random.Random(seed)
+    ratios = []
+    for _ in range(resamples):
+        ref = _median(rng.choices(reference, k=len(reference)))
+        cand = _median(rng.choices(candidate, k=len(candidate)))
+        ratios.append(cand / ref if ref else float('inf'))
+    ratios.sort()
+    tail = (1 - confidence) / 2
+    low = ratios[int(tail * (resamples - 1))]
+    high = ratios[int((1 - tail) * (resamples - 1))]
+    reference_median = _median(reference)
+    ratio = _median(candidate) / reference_median if reference_median else float('inf')
+    return ratio, low, high
+
+
+def verdict(low: float, high: float) -> str:
+    if low <= 1.0 <= high:
+        return NO_DIFFERENCE
+    return 'slower' if low > 1.0 else 'faster'
+
+
+def compare(samples: Dict[str, Dict[str, List[float]]], variants: Sequence[str], confidence: float = 0.95,
+            min_samples: int = 3) -> Dict[str, Dict[str, dict]]:
+    """{key: {variant: stats}} for samples[variant][key]; ratios are against variants[0]"""
+    reference = variants[0]
+    keys = sorted({key for per_variant in samples.values() for key in per_variant})
+    results: Dict[str, Dict[str, dict]] = {}
+    for key in keys:
+        baseline = samples.get(reference, {}).get(key, [])
+        for name in variants[1:]:
+            candidate = samples.get(name, {}).get(key, [])
+            if len(baseline) < min_samples or len(candidate) < min_samples:
+                entry = {'verdict': 'insufficient', 'samples': [len(baseline), len(candidate)]}
+            else:
+                ratio, low, high = bootstrap_ratio(baseline, candidate, confidence)
+                entry = {
+                    'verdict': verdict(low, high),
+                    'reference_median': round(_median(baseline), 3),
+                    'median': round(_median(candidate), 3),
+                    'ratio': round(ratio, 3),
+                    'ci': [round(low, 3), round(high, 3)],
+                    'samples': [len(baseline), len(candidate)],
+                }
+            results.setdefault(key, {})[name] = entry
+    return results
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('compare', 'A/B session configuration comparison')
+    group.addoption('--compare', default=None, metavar='A,B[,...]',
+                    help='Run the selected tests under each named api_session variant; the first is the reference')
+    group.addoption('--compare-rounds', type=int, default=5, metavar='N',
+                    help='Interleaved rounds per variant (default: 5)')
+    group.addoption('--compare-warmup', type=int, default=1, metavar='N',
+                    help='Unrecorded rounds run first to warm caches and pools (default: 1)')
+    group.addoption('--compare-variant', action='append', default=[], metavar='NAME=MODULE:FUNCTION',
+                    help='Define a variant: FUNCTION(session) applies it and returns an undo callable')
+    group.addoption('--compare-confidence', type=float, default=0.95,
+                    help='Confidence level of the intervals (default: 0.95)')
+    group.addoption('--compare-file', default='comparison.json',
+                    help='Comparison report output file (default: comparison.json)')
+
+
+class ComparePlugin:
+    """Repeats every test under each variant and records latency and CPU per variant"""
+
+    def __init__(self, config):
+        self.names = [name.strip() for name in config.getoption('compare').split(',') if name.strip()]
+        if len(self.names) < 2:
+            raise pytest.UsageError('--compare needs at least two variants, e.g. baseline,no-keepalive')
+        custom = dict(value.split('=', 1) for value in config.getoption('compare_variant'))
+        self.variants = {name: resolve_variant(name, custom) for name in self.names}
+        self.rounds = config.getoption('compare_rounds')
+        self.warmup = config.getoption('compare_warmup')
+        self.recording = False
+        self.confidence = config.getoption('compare_confidence')
+        self.output = config.getoption('compare_file')
+        self.session: Optional[requests.Session] = None
+        self.active: Optional[str] = None
+        self.applied: Optional[str] = None
+        self.latency: Dict[str, Dict[str, List[float]]] = {name: {} for name in self.names}
+        self.cpu: Dict[str, Dict[str, List[float]]] = {name: {} for name in self.names}
+        self.report: Dict[str, dict] = {}
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_fixture_setup(self, fixturedef, request):
+        outcome = yield
+        if fixturedef.argname == 'api_session' and outcome.excinfo is None:
+            self.session = outcome.get_result()
+            self.session.hooks['response'].append(self._on_response)
+
+    def _on_response(self, response, *args, **kwargs):
+        if self.applied is None:
+            return
+        path = requests.utils.urlparse(response.request.url).path or '/'
+        key = f"{response.request.method} {route_template(path)}"
+        self.latency[self.applied].setdefault(key, []).append(response.elapsed.total_seconds() * 1000)
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_call(self, item):
+        undo = self.variants[self.active](self.session) if self.session is not None else None
+        self.applied = self.active if self.recording else None
+        # Test thread CPU only: an in-process stand-in server's threads are not counted
+        started = time.thread_time()
+        try:
+            yield
+        finally:
+            if self.applied is not None:
+                self.cpu[self.applied].setdefault(item.nodeid, []).append((time.thread_time() - started) * 1000)
+            if undo is not None:
+                undo()
+            self.applied = None
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_runtestloop(self, session):
+        if session.config.option.collectonly or not session.items:
+            return None
+
+        # Round r runs the variants rotated by r, so no variant always goes first
+        # Warm-up rounds fill caches and connection pools and are not recorded
+        runs = []
+        for round_index in range(self.warmup + self.rounds):
+            shift = round_index % len(self.names)
+            order = self.names[shift:] + self.names[:shift]
+            recorded = round_index >= self.warmup
+            for item in session.items:
+                runs.extend((item, name, recorded) for name in order)
+
+        for index, (item, name, recorded) in enumerate(runs):
+            self.active = name
+            self.recording = recorded
+            nextitem = runs[index + 1][0] if index + 1 < len(runs) else None
+            if nextitem is item:
+                # Tear down the function-scoped fixtures but keep module and session ones
+                nextitem = item.parent
+            item.config.hook.pytest_runtest_protocol(item=item, nextitem=nextitem)
+            if session.shouldfail or session.shouldstop:
+                break
+        self.active = None
+        return True
+
+    def pytest_sessionfinish(self, session):
+        self.report = {
+            'variants': self.names,
+            'reference': self.names[0],
+            'rounds': self.rounds,
+            'warmup_rounds': self.warmup,
+            'confidence': self.confidence,
+            'latency_ms': compare(self.latency, self.names, self.confidence),
+            'cpu_ms': compare(self.cpu, self.names, self.confidence),
+        }
+        with open(self.output, 'w') as f:
+            json.dump(self.report, f, indent=2)
+
+    def pytest_terminal_summary(self, terminalreporter):
+        reference = self.names[0]
+        terminalreporter.write_sep('-', f"comparison vs {reference}: {self.output}")
+        for section, unit in (('latency_ms', 'latency'), ('cpu_ms', 'CPU')):
+            for key, per_variant in self.report.get(section, {}).items():
+                for name, entry in per_variant.items():
+                    if entry['verdict'] == 'insufficient':
+                        continue
+                    low, high = entry['ci']
+                    terminalreporter.write_line(
+                        f"{unit:>7} {name:>16}  x{entry['ratio']:<6} [{low}, {high}]  "
+                        f"{entry['verdict'].upper():<26} {key}"
+                    )
+
+
+def pytest_configure(config):
+    if config.getoption('compare'):
+        if config.pluginmanager.hasplugin('xdist') and getattr(config.option, 'numprocesses', None):
+            raise pytest.UsageError('Comparison runs interleave variants in one process; do not combine it with -n')
+        if config.getoption('soak_duration', None) or config.getoption('soak_iterations', None):
+            raise pytest.UsageError('--compare and soak mode both drive the run loop; use one of them')
+        config.pluginmanager.register(ComparePlugin(config), 'api-compare')
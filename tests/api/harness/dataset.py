@@ -0,0 +1,259 @@
+"""
+Deterministic synthetic datasets for the local stand-in API
+Generates users, posts, comments and todos shaped like USER_SCHEMA, POST_SCHEMA
+and the JSONPlaceholder resources at any size (10^3 to 10^7 rows), stored in a
+compact memory-mapped columnar file with precomputed filter indexes
+
+Only the columns that are filtered on (foreign keys, completed flag) and their
+indexes are stored; ids are implicit (row + 1) and text fields are synthesised
+from (seed, table, id) when a row is read, so a file stays a few bytes per row.
+
+Usage:
+    python -m harness.dataset data/bench-1m.qads --posts 1000000 --seed 42
+"""
+
+import argparse
+import json
+import mmap
+import os
+import random
+import sys
+from array import array
+from typing import Dict, Iterator, Optional, Tuple
+
+MAGIC = b'QADS0001'
+ALIGN = 8
+
+# Rows per post, following the JSONPlaceholder proportions (10/100/500/200)
+RATIOS = {'users': 0.1, 'posts': 1, 'comments': 5, 'todos': 2}
+
+WORDS = (
+    'lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt ut '
+    'labore et dolore magna aliqua enim ad minim veniam quis nostrud exercitation ullamco laboris '
+    'nisi aliquip ex ea commodo consequat duis aute irure in reprehenderit voluptate velit esse '
+    'cillum fugiat nulla pariatur excepteur sint occaecat cupidatat non proident sunt culpa qui '
+    'officia deserunt mollit anim id est laborum perspiciatis unde omnis iste natus error '
+    'accusantium doloremque laudantium totam rem aperiam eaque ipsa quae ab illo inventore '
+    'veritatis quasi architecto beatae vitae dicta explicabo nemo ipsam quia voluptas aspernatur '
+    'aut odit fugit consequuntur magni dolores eos ratione sequi nesciunt neque porro quisquam'
+).split()
+
+FIRST_NAMES = (
+    'George Janet Emma Eve Charles Tracey Michael Lindsay Tobias Byron George Rachel Ava Liam '
+    'Noah Olivia Mia Lucas Amelia Ethan Harper Mason Ella Logan Aria James Chloe Henry Grace'
+).split()
+
+LAST_NAMES = (
+    'Bluth Weaver Wong Holt Morris Ramos Lawson Ferguson Funke Fields Edwards Howell Nguyen '
+    'Patel Garcia Kim Novak Silva Fischer Rossi Tanaka Dubois Kowalski Jensen Murphy Costa'
+).split()
+
+_MASK64 = (1 << 64) - 1
+
+
+def _mix(*values: int) -> int:
+    """SplitMix64-style hash of a few integers; deterministic across runs"""
+    z = 0x9E3779B97F4A7C15
+    for value in values:
+        z = (z ^ (value & _MASK64)) * 0xBF58476D1CE4E5B9 & _MASK64
+        z = (z ^ (z >> 27)) * 0x94D049BB133111EB & _MASK64
+        z ^= z >> 31
+    return z
+
+
+def _sentence(seed: int, count: int) -> str:
+    words = []
+    for _ in range(count):
+        seed = _mix(seed, 1)
+        words.append(WORDS[seed % len(WORDS)])
+    return ' '.join(words)
+
+
+_TABLE_IDS = {'users': 1, 'posts': 2, 'comments': 3, 'todos': 4}
+
+
+def _build_index(keys: array, cardinality: int) -> Tuple[array, array]:
+    """CSR index: rows with key k are rows[offsets[k]:offsets[k + 1]]"""
+    offsets = array('i', bytes(4 * (cardinality + 2)))
+    for key in keys:
+        offsets[key + 1] += 1
+    for k in range(1, len(offsets)):
+        offsets[k] += offsets[k - 1]
+    rows = array('i', bytes(4 * len(keys)))
+    cursor = array('i', offsets)
+    for row, key in enumerate(keys):
+        rows[cursor[key]] = row
+        cursor[key] += 1
+    return offsets, rows
+
+
+class Dataset:
+    """Read-only view over a generated dataset file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a stand-in dataset file")
+        header_size = int.from_bytes(self._mmap[8:12], 'little')
+        self.header = json.loads(self._mmap[12:12 + header_size])
+        if self.header['byteorder'] != sys.byteorder:
+            raise ValueError(f"{path} was generated on a {self.header['byteorder']}-endian machine")
+        self.seed = self.header['seed']
+        self.counts: Dict[str, int] = self.header['counts']
+        view = memoryview(self._mmap)
+        self.columns = {
+            name: view[spec['offset']:spec['offset'] + spec['size']].cast(spec['type'])
+            for name, spec in self.header['columns'].items()
+        }
+
+    @classmethod
+    def generate(cls, path: str, posts: int = 100, seed: int = 0, users: Optional[int] = None,
+                 comments: Optional[int] = None, todos: Optional[int] = None) -> 'Dataset':
+        """Generate a dataset file and open it"""
+        counts = {
+            'users': users or max(1, int(posts * RATIOS['users'])),
+            'posts': posts,
+            'comments': comments if comments is not None else int(posts * RATIOS['comments']),
+            'todos': todos if todos is not None else int(posts * RATIOS['todos']),
+        }
+        rng = random.Random(seed)
+
+        def keys(count: int, cardinality: int) -> array:
+            return array('i', (int(rng.random() * cardinality) + 1 for _ in range(count)))
+
+        columns = {
+            'posts.userId': keys(counts['posts'], counts['users']),
+            'comments.postId': keys(counts['comments'], counts['posts']),
+            'todos.userId': keys(counts['todos'], counts['users']),
+            'todos.completed': array('B', (rng.getrandbits(1) for _ in range(counts['todos']))),
+        }
+        indexes = {
+            'posts.userId': counts['users'],
+            'comments.postId': counts['posts'],
+            'todos.userId': counts['users'],
+            'todos.completed': 1,
+        }
+        for name, cardinality in indexes.items():
+            offsets, rows = _build_index(columns[name], cardinality)
+            columns[f"{name}#offsets"] = offsets
+            columns[f"{name}#rows"] = rows
+
+        cls._write(path, seed, counts, columns)
+        return cls(path)
+
+    @staticmethod
+    def _write(path: str, seed: int, counts: Dict[str, int], columns: Dict[str, array]) -> None:
+        specs = {}
+        offset = 0
+        for name, values in columns.items():
+            size = values.itemsize * len(values)
+            specs[name] = {'type': values.typecode, 'offset': offset, 'size': size}
+            offset += size + (-size % ALIGN)
+
+        header = {'seed': seed, 'byteorder': sys.byteorder, 'counts': counts, 'columns': specs}
+        # Reserve room for the offsets growing once they are made absolute
+        reserved = len(json.dumps(header)) + 16 * len(specs)
+        data_start = 12 + reserved + (-(12 + reserved) % ALIGN)
+        for spec in specs.values():
+            spec['offset'] += data_start
+        encoded = json.dumps(header).encode().ljust(data_start - 12)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(MAGIC + len(encoded).to_bytes(4, 'little') + encoded)
+            for name, values in columns.items():
+                values.tofile(f)
+                f.write(bytes(-len(values) * values.itemsize % ALIGN))
+
+    def close(self) -> None:
+        for column in self.columns.values():
+            column.release()
+        self._mmap.close()
+        self._file.close()
+
+    # Index lookups ---------------------------------------------------------
+
+    def rows_for(self, column: str, key: int) -> memoryview:
+        """Row numbers whose column equals key, from the precomputed index"""
+        offsets = self.columns[f"{column}#offsets"]
+        if not 0 <= key < len(offsets) - 1:
+            return memoryview(b'').cast('i')
+        return self.columns[f"{column}#rows"][offsets[key]:offsets[key + 1]]
+
+    # Row materialisation ---------------------------------------------------
+
+    def _text_seed(self, table: str, row_id: int) -> int:
+        return _mix(self.seed, _TABLE_IDS[table], row_id)
+
+    def user(self, row: int) -> dict:
+        user_id = row + 1
+        seed = self._text_seed('users', user_id)
+        first = FIRST_NAMES[seed % len(FIRST_NAMES)]
+        last = LAST_NAMES[(seed >> 16) % len(LAST_NAMES)]
+        return {
+            'id': user_id,
+            'email': f"{first.lower()}.{last.lower()}{user_id}@reqres.in",
+            'first_name': first,
+            'last_name': last,
+            'avatar': f"https://reqres.in/img/faces/{user_id}-image.jpg",
+        }
+
+    def post(self, row: int) -> dict:
+        post_id = row + 1
+        seed = self._text_seed('posts', post_id)
+        return {
+            'userId': self.columns['posts.userId'][row],
+            'id': post_id,
+            'title': _sentence(seed, 3 + seed % 5),
+            'body': _sentence(seed >> 8, 20 + seed % 20),
+        }
+
+    def comment(self, row: int) -> dict:
+        comment_id = row + 1
+        seed = self._text_seed('comments', comment_id)
+        return {
+            'postId': self.columns['comments.postId'][row],
+            'id': comment_id,
+            'name': _sentence(seed, 4),
+            'email': f"{WORDS[seed % len(WORDS)]}.{comment_id}@example.com",
+            'body': _sentence(seed >> 8, 15 + seed % 10),
+        }
+
+    def todo(self, row: int) -> dict:
+        todo_id = row + 1
+        return {
+            'userId': self.columns['todos.userId'][row],
+            'id': todo_id,
+            'title': _sentence(self._text_seed('todos', todo_id), 4),
+            'completed': bool(self.columns['todos.completed'][row]),
+        }
+
+    def rows(self, table: str, rows: Iterator[int]) -> list:
+        build = getattr(self, table[:-1])
+        return [build(row) for row in rows]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Generate a synthetic stand-in API dataset')
+    parser.add_argument('path', help='Output file, e.g. data/bench-1m.qads')
+    parser.add_argument('--posts', type=int, default=1000, help='Number of posts (default: 1000)')
+    parser.add_argument('--users', type=int, default=None, help='Default: posts / 10')
+    parser.add_argument('--comments', type=int, default=None, help='Default: posts * 5')
+    parser.add_argument('--todos', type=int, default=None, help='Default: posts * 2')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    dataset = Dataset.generate(args.path, posts=args.posts, seed=args.seed, users=args.users,
+                               comments=args.comments, todos=args.todos)
+    size = os.path.getsize(args.path)
+    print(f"{args.path}: {dataset.counts} ({size / 1024 / 1024:.1f} MiB)")
+    dataset.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,391 @@
+"""
+Coordinator/worker sharding of the API suite over plain TCP
+The coordinator collects the selected tests and hands out shards on request;
+when the queue runs dry, idle workers steal the unstarted tail of the busiest
+worker's shard. Workers stream each result back as soon as the test finishes
+and keep one warm pytest session (and api_session) across all their shards.
+The merged report uses the results.json (pytest-json-report) schema.
+
+Usage:
+    python -m harness.distributed coordinator --bind 0.0.0.0:7000 -- -m regression
+    python -m harness.distributed worker --connect 10.0.0.5:7000 -- -m regression
+    python -m harness.distributed coordinator --local-workers 4 -- -m regression
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import platform
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+import pytest
+
+logger = logging.getLogger(__name__)
+
+# Workers run without the HTML/JSON report plugins; the coordinator writes the report
+WORKER_PYTEST_ARGS = ['-o', 'addopts=', '--strict-markers', '--tb=short', '-p', 'no:cacheprovider']
+
+# Largest shard handed out in one request
+MAX_SHARD = 32
+
+
+class Coordinator:
+    """
+    Shard bookkeeping shared by all worker connections
+    Each worker's assignment is an ordered list whose first entry may be running
+    and whose second entry may already be the worker's chosen next item, so only
+    entries from index 2 onwards are ever stolen.
+    """
+
+    def __init__(self, nodeids: List[str], max_shard: int = MAX_SHARD):
+        self.order = {nodeid: index for index, nodeid in enumerate(nodeids)}
+        self.pending = deque(nodeids)
+        self.max_shard = max_shard
+        self.assignments: Dict[str, List[str]] = {}
+        self.revoked: Dict[str, List[str]] = {}
+        self.results: Dict[str, dict] = {}
+        # Collected items with a result; lazy cases (harness.cases) report extra
+        # nodeids under their shard item, which count as results but not here
+        self.done = set()
+        self.workers_seen = set()
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+        if not nodeids:
+            self.finished.set()
+
+    def join(self, worker: str) -> None:
+        with self.lock:
+            self.workers_seen.add(worker)
+            self.assignments.setdefault(worker, [])
+            self.revoked.setdefault(worker, [])
+
+    def next_shard(self, worker: str) -> Optional[List[str]]:
+        """Tests for the worker; [] means wait and retry, None means all done"""
+        with self.lock:
+            if self.pending:
+                # Guided self-scheduling: large shards early, small ones near the end
+                active = max(1, len(self.assignments))
+                size = min(self.max_shard, max(1, math.ceil(len(self.pending) / (2 * active))))
+                shard = [self.pending.popleft() for _ in range(min(size, len(self.pending)))]
+            else:
+                shard = self._steal(worker)
+
+            if shard:
+                self.assignments[worker].extend(shard)
+                return shard
+            return None if len(self.done) == len(self.order) else []
+
+    def _steal(self, thief: str) -> List[str]:
+        victim = max(
+            (worker for worker in self.assignments if worker != thief),
+            key=lambda worker: len(self.assignments[worker]),
+            default=None,
+        )
+        if victim is None:
+            return []
+        stealable = self.assignments[victim][2:]
+        if not stealable:
+            return []
+        stolen = stealable[len(stealable) // 2:] if len(stealable) > 1 else stealable
+        del self.assignments[victim][len(self.assignments[victim]) - len(stolen):]
+        self.revoked[victim].extend(stolen)
+        return stolen
+
+    def record(self, worker: str, result: dict) -> List[str]:
+        """Store one streamed result; returns tests revoked from this worker since"""
+        with self.lock:
+            nodeid = result['nodeid']
+            if nodeid in self.assignments.get(worker, []):
+                self.assignments[worker].remove(nodeid)
+            self.results[nodeid] = result
+            if nodeid in self.order:
+                self.done.add(nodeid)
+                if len(self.done) == len(self.order):
+                    self.finished.set()
+            revoked, self.revoked[worker] = self.revoked.get(worker, []), []
+            return revoked
+
+    def drop(self, worker: str) -> None:
+        """Requeue unfinished work of a disconnected worker"""
+        with self.lock:
+            unfinished = [nodeid for nodeid in self.assignments.pop(worker, [])
+                          if nodeid not in self.results]
+            self.pending.extendleft(reversed(unfinished))
+            self.revoked.pop(worker, None)
+
+    def report(self, started: float, root: str) -> dict:
+        """Merged report in the pytest-json-report results.json schema"""
+        # Lazy case results have no collected position and follow in arrival order
+        tests = sorted(self.results.values(), key=lambda test: self.order.get(test['nodeid'], len(self.order)))
+        summary: Dict[str, int] = {}
+        for test in tests:
+            summary[test['outcome']] = summary.get(test['outcome'], 0) + 1
+        summary['total'] = len(tests)
+        summary['collected'] = len(self.order)
+        failed = summary.get('failed', 0) + summary.get('error', 0)
+        incomplete = len(self.done) < len(self.order)
+        return {
+            'created': time.time(),
+            'duration': time.time() - started,
+            'exitcode': int(pytest.ExitCode.TESTS_FAILED if failed or incomplete else pytest.ExitCode.OK),
+            'root': root,
+            'environment': {
+                'Python': platform.python_version(),
+                'Platform': platform.platform(),
+                'Workers': sorted(self.workers_seen),
+            },
+            'summary': summary,
+            'tests': tests,
+        }
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """One connection per worker; newline-delimited JSON request/response"""
+
+    def handle(self):
+        coordinator: Coordinator = self.server.coordinator
+        worker = None
+        try:
+            for line in self.rfile:
+                message = json.loads(line)
+                kind = message['type']
+                if kind == 'hello':
+                    worker = message['worker']
+                    coordinator.join(worker)
+                    reply = {'type': 'ok'}
+                elif kind == 'request':
+                    shard = coordinator.next_shard(worker)
+                    if shard is None:
+                        reply = {'type': 'done'}
+                    elif shard:
+                        reply = {'type': 'shard', 'tests': shard}
+                    else:
+                        reply = {'type': 'wait', 'seconds': 0.5}
+                elif kind == 'result':
+                    reply = {'type': 'ack', 'revoke': coordinator.record(worker, message['result'])}
+                else:
+                    reply = {'type': 'error', 'message': f"unknown message type '{kind}'"}
+                self.wfile.write(json.dumps(reply).encode() + b'\n')
+        except (ConnectionError, ValueError) as e:
+            logger.warning(f"Worker {worker} connection lost: {e}")
+        finally:
+            if worker is not None:
+                coordinator.drop(worker)
+
+
+class CoordinatorServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, coordinator: Coordinator):
+        self.coordinator = coordinator
+        super().__init__(address, _Handler)
+
+
+class CoordinatorClient:
+    """Worker side of the protocol"""
+
+    def __init__(self, host: str, port: int, worker: str, timeout: float = 30.0):
+        self.worker = worker
+        deadline = time.time() + timeout
+        while True:
+            try:
+                self.sock = socket.create_connection((host, port))
+                break
+            except OSError:
+                if time.time() > deadline:
+                    raise
+                time.sleep(0.2)
+        self.rfile = self.sock.makefile('rb')
+        self._call({'type': 'hello', 'worker': worker})
+
+    def _call(self, message: dict) -> dict:
+        self.sock.sendall(json.dumps(message).encode() + b'\n')
+        line = self.rfile.readline()
+        if not line:
+            raise ConnectionError('coordinator closed the connection')
+        return json.loads(line)
+
+    def request(self, block: bool = True) -> List[str]:
+        """Next shard; [] when the run is over (or nothing is ready and block is False)"""
+        while True:
+            reply = self._call({'type': 'request'})
+            if reply['type'] == 'shard':
+                return reply['tests']
+            if reply['type'] == 'done' or not block:
+                return []
+            time.sleep(reply['seconds'])
+
+    def send_result(self, result: dict) -> List[str]:
+        return self._call({'type': 'result', 'result': result})['revoke']
+
+    def close(self) -> None:
+        self.rfile.close()
+        self.sock.close()
+
+
+class WorkerPlugin:
+    """Runs shards from the coordinator inside one long-lived pytest session"""
+
+    def __init__(self, client: CoordinatorClient):
+        self.client = client
+        self.queue: deque = deque()
+        self.partial: Dict[str, dict] = {}
+        self.config = None
+
+    def pytest_configure(self, config):
+        self.config = config
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_runtestloop(self, session):
+        items = {item.nodeid: item for item in session.items}
+        while True:
+            if not self.queue:
+                self.queue.extend(self.client.request(block=True))
+                if not self.queue:
+                    break
+            nodeid = self.queue.popleft()
+            if not self.queue:
+                # Prefetch so nextitem is known and session fixtures stay warm
+                self.queue.extend(self.client.request(block=False))
+
+            item = items.get(nodeid)
+            if item is None:
+                self._apply_revoked(self.client.send_result(_missing_result(nodeid)))
+                continue
+            nextitem = items.get(self.queue[0]) if self.queue else None
+            item.config.hook.pytest_runtest_protocol(item=item, nextitem=nextitem)
+            if session.shouldstop:
+                break
+        self.client.close()
+        return True
+
+    def pytest_runtest_logreport(self, report):
+        test = self.partial.setdefault(report.nodeid, {
+            'nodeid': report.nodeid,
+            'lineno': report.location[1],
+            'keywords': list(report.keywords),
+            'outcome': 'passed',
+            'worker': self.client.worker,
+        })
+        outcome = self.config.hook.pytest_report_teststatus(report=report, config=self.config)[0]
+        if outcome not in ('passed', ''):
+            test['outcome'] = outcome
+        stage = {'duration': report.duration, 'outcome': report.outcome}
+        crash = getattr(report.longrepr, 'reprcrash', None)
+        if crash is not None:
+            stage['crash'] = {'path': crash.path, 'lineno': crash.lineno, 'message': crash.message}
+        if report.longrepr:
+            stage['longrepr'] = str(report.longrepr)
+        test[report.when] = stage
+
+        if report.when == 'teardown':
+            self._apply_revoked(self.client.send_result(self.partial.pop(report.nodeid)))
+
+    def _apply_revoked(self, revoked: List[str]) -> None:
+        if revoked:
+            revoked = set(revoked)
+            self.queue = deque(nodeid for nodeid in self.queue if nodeid not in revoked)
+
+
+def _missing_result(nodeid: str) -> dict:
+    message = 'test was not collected on this worker'
+    return {
+        'nodeid': nodeid, 'lineno': None, 'keywords': [], 'outcome': 'error',
+        'setup': {'duration': 0.0, 'outcome': 'failed', 'longrepr': message},
+    }
+
+
+class _CollectPlugin:
+    def __init__(self):
+        self.nodeids: List[str] = []
+
+    def pytest_collection_finish(self, session):
+        self.nodeids = [item.nodeid for item in session.items]
+
+
+def collect(pytest_args: List[str]) -> List[str]:
+    """Node ids selected by the given pytest arguments"""
+    plugin = _CollectPlugin()
+    pytest.main(WORKER_PYTEST_ARGS + ['--collect-only', '-q'] + pytest_args, plugins=[plugin])
+    return plugin.nodeids
+
+
+def run_worker(host: str, port: int, pytest_args: List[str]) -> int:
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    client = CoordinatorClient(host, port, worker)
+    return int(pytest.main(WORKER_PYTEST_ARGS + pytest_args, plugins=[WorkerPlugin(client)]))
+
+
+def run_coordinator(bind: str, pytest_args: List[str], report_file: str,
+                    local_workers: int = 0, max_shard: int = MAX_SHARD) -> int:
+    started = time.time()
+    nodeids = collect(pytest_args)
+    coordinator = Coordinator(nodeids, max_shard=max_shard)
+    host, port = _address(bind)
+    server = CoordinatorServer((host, port), coordinator)
+    port = server.server_address[1]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f"Coordinating {len(nodeids)} tests on {host}:{port}")
+
+    processes = [
+        subprocess.Popen([sys.executable, '-m', 'harness.distributed', 'worker',
+                          '--connect', f"127.0.0.1:{port}", '--'] + pytest_args)
+        for _ in range(local_workers)
+    ]
+    try:
+        while not coordinator.finished.wait(1.0):
+            if processes and all(process.poll() is not None for process in processes):
+                logger.error('All local workers exited before the run finished')
+                break
+    finally:
+        server.shutdown()
+        for process in processes:
+            process.wait()
+
+    report = coordinator.report(started, os.getcwd())
+    with open(report_file, 'w') as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Merged report for {report['summary']['total']} tests written to {report_file}")
+    return report['exitcode']
+
+
+def _address(value: str):
+    host, _, port = value.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    modes = parser.add_subparsers(dest='mode', required=True)
+
+    coordinator = modes.add_parser('coordinator', help='Collect tests, hand out shards, merge results')
+    coordinator.add_argument('--bind', default='127.0.0.1:7000', help='host:port to listen on (port 0 = any)')
+    coordinator.add_argument('--report', default='results.json', help='Merged report file')
+    coordinator.add_argument('--local-workers', type=int, default=0, help='Spawn N workers on this machine')
+    coordinator.add_argument('--max-shard', type=int, default=MAX_SHARD, help='Largest shard size')
+
+    worker = modes.add_parser('worker', help='Run shards handed out by a coordinator')
+    worker.add_argument('--connect', default='127.0.0.1:7000', help='Coordinator host:port')
+
+    args, pytest_args = parser.parse_known_args(argv)
+    pytest_args = [arg for arg in pytest_args if arg != '--']
+    logging.basicConfig(level=logging.INFO)
+
+    if args.mode == 'coordinator':
+        return run_coordinator(args.bind, pytest_args, args.report, args.local_workers, args.max_shard)
+    host, port = _address(args.connect)
+    return run_worker(host, port, pytest_args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
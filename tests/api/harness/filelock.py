@@ -0,0 +1,57 @@
+"""
+Exclusive advisory file locks shared by harness modules
+Serialises processes on one machine (pytest-xdist workers, distributed workers
+sharing a rootdir) around small state files: fcntl.flock on POSIX, a one-byte
+msvcrt lock on Windows.
+
+Usage:
+    with locked('.api-impact.json.lock'):
+        merge_index()
+
+    lock(fd)
+    try:
+        update_state(fd)
+    finally:
+        unlock(fd)
+"""
+
+import os
+from contextlib import contextmanager
+from typing import Iterator
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+    import msvcrt
+
+
+def lock(fd: int) -> None:
+    """Block until this process holds the exclusive lock on fd"""
+    if fcntl:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+    else:  # pragma: no cover - Windows
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+
+
+def unlock(fd: int) -> None:
+    if fcntl:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:  # pragma: no cover - Windows
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def locked(path: str) -> Iterator[int]:
+    """Hold the lock on path (created if missing) for the with block; yields its fd"""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        lock(fd)
+        try:
+            yield fd
+        finally:
+            unlock(fd)
+    finally:
+        os.close(fd)
@@ -0,0 +1,372 @@
+"""
+Generative negative-payload fuzzing
+Derives invalid, boundary and malformed request bodies from a JSON schema and
+a valid seed payload (e.g. POST_SCHEMA and valid_post_payload), sends them
+concurrently over persistent connections, de-duplicates failures by response
+signature and shrinks each distinct failure to a minimal set of mutations.
+
+A case is the seed payload plus one to three mutations. Mutations either set
+or delete one field, or rewrite the encoded body (truncation, invalid UTF-8,
+deep nesting, ...), so a failure can be shrunk by dropping mutations and
+unrelated seed fields one at a time.
+"""
+
+import hashlib
+import http.client
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+# Type confusion and boundary values tried for every field
+FIELD_VALUES = (
+    None, True, False, 0, -1, 2 ** 31, 2 ** 63, -2 ** 63 - 1, 1.5, 1e308, -0.0,
+    '', ' ', 'a' * 10000, '\u0000', '😀' * 100, '‮', '<script>alert(1)</script>',
+    "' OR 1=1 --", '../../etc/passwd', '{{7*7}}', '%s%s%s', [], [None], {}, {'$gt': ''},
+)
+
+EXTRA_FIELDS = (
+    ('__proto__', {'admin': True}),
+    ('constructor', {'prototype': {}}),
+    ('x' * 256, 1),
+    ('', ''),
+)
+
+
+def _add_member(body: bytes, member: bytes) -> bytes:
+    """Append a member to an encoded object, keeping the rest of it valid JSON"""
+    if body[:-1].rstrip().endswith(b'{'):
+        return body[:-1] + member + b'}'
+    return body[:-1] + b',' + member + b'}'
+
+
+# Rewrites of the encoded body: name -> bytes transform
+RAW_MUTATIONS: Dict[str, Callable[[bytes], bytes]] = {
+    'empty': lambda body: b'',
+    'truncated': lambda body: body[:max(1, len(body) // 2)],
+    'trailing-comma': lambda body: body[:-1] + b',}' if body.endswith(b'}') else body + b',',
+    'single-quotes': lambda body: body.replace(b'"', b"'"),
+    'invalid-utf8': lambda body: _add_member(body, b'"\xff\xfe":1') if body.endswith(b'}') else body + b'\xff',
+    'bom': lambda body: b'\xef\xbb\xbf' + body,
+    'null': lambda body: b'null',
+    'array': lambda body: b'[' + body + b']',
+    'string': lambda body: json.dumps(body.decode('utf-8', 'replace')).encode(),
+    'number-overflow': lambda body: b'1e999999',
+    'nan': lambda body: b'{"value": NaN}',
+    'deep-nesting': lambda body: b'[' * 100000 + b']' * 100000,
+    'duplicate-keys': lambda body: body[:-1] + b',' + body[1:] if body.startswith(b'{') else body,
+    'large': lambda body: b'{"padding": "' + b'x' * (1 << 20) + b'"}',
+}
+
+# Content-Type overrides
+CONTENT_TYPES = ('text/plain', 'application/x-www-form-urlencoded', 'application/xml')
+
+
+@dataclass(frozen=True)
+class Mutation:
+    """op is 'set', 'delete', 'raw' or 'content-type'"""
+
+    op: str
+    key: str = ''
+    value: Any = None
+
+    def describe(self) -> str:
+        if self.op == 'set':
+            shown = repr(self.value)
+            return f"{self.key} = {shown[:40] + '...' if len(shown) > 40 else shown}"
+        if self.op == 'delete':
+            return f"del {self.key}"
+        return f"{self.op}: {self.key}"
+
+
+@dataclass
+class Case:
+    seed: dict
+    mutations: Tuple[Mutation, ...]
+
+    def payload(self) -> dict:
+        payload = dict(self.seed)
+        for mutation in self.mutations:
+            if mutation.op == 'set':
+                payload[mutation.key] = mutation.value
+            elif mutation.op == 'delete':
+                payload.pop(mutation.key, None)
+        return payload
+
+    def encode(self) -> Tuple[bytes, str]:
+        """Request body and Content-Type"""
+        body = json.dumps(self.payload()).encode()
+        content_type = 'application/json'
+        for mutation in self.mutations:
+            if mutation.op == 'raw':
+                body = RAW_MUTATIONS[mutation.key](body)
+            elif mutation.op == 'content-type':
+                content_type = mutation.key
+        return body, content_type
+
+    def describe(self) -> List[str]:
+        return [mutation.describe() for mutation in self.mutations]
+
+
+def candidate_mutations(schema: dict, seed: dict) -> List[Mutation]:
+    """Every single mutation derived from the schema properties and the seed payload"""
+    keys = list(dict.fromkeys(list(seed) + list(schema.get('properties', {}))))
+    mutations = []
+    for key in keys:
+        if key in seed:
+            mutations.append(Mutation('delete', key))
+        mutations.extend(Mutation('set', key, value) for value in FIELD_VALUES)
+        # The seed itself nested where a scalar is expected
+        mutations.append(Mutation('set', key, dict(seed)))
+    mutations.extend(Mutation('set', key, value) for key, value in EXTRA_FIELDS)
+    mutations.extend(Mutation('raw', name) for name in RAW_MUTATIONS)
+    mutations.extend(Mutation('content-type', content_type) for content_type in CONTENT_TYPES)
+    return mutations
+
+
+def generate_cases(schema: dict, seed: dict, count: int, rng_seed: int = 0,
+                   max_mutations: int = 3) -> Iterator[Case]:
+    """
+    Every single mutation first, then random combinations until `count`
+    distinct bodies have been produced (or the combinations run out)
+    """
+    rng = random.Random(rng_seed)
+    pool = candidate_mutations(schema, seed)
+    raw = [mutation for mutation in pool if mutation.op in ('raw', 'content-type')]
+    fields = [mutation for mutation in pool if mutation.op not in ('raw', 'content-type')]
+    seen = set()
+    produced = 0
+    attempts = 0
+    singles = iter(pool)
+    while produced < count and attempts < count * 20:
+        attempts += 1
+        single = next(singles, None)
+        if single is not None:
+            mutations = (single,)
+        else:
+            chosen = rng.sample(fields, min(len(fields), rng.randint(1, max_mutations)))
+            if rng.random() < 0.25:
+                chosen.append(rng.choice(raw))
+            # At most one mutation per field; later ones win
+            by_key = {}
+            for mutation in chosen:
+                by_key[(mutation.op in ('raw', 'content-type'), mutation.key)] = mutation
+            mutations = tuple(by_key.values())
+        case = Case(seed, mutations)
+        body, content_type = case.encode()
+        digest = hashlib.blake2b(body + content_type.encode(), digest_size=16).digest()
+        if digest in seen:
+            continue
+        seen.add(digest)
+        produced += 1
+        yield case
+
+
+@dataclass
+class Outcome:
+    status: Optional[int]
+    body: bytes = b''
+    error: Optional[str] = None
+    elapsed_ms: float = 0.0
+
+
+def default_oracle(outcome: Outcome) -> bool:
+    """A negative case fails when the server errors (5xx) or the transport breaks"""
+    return outcome.error is not None or (outcome.status is not None and outcome.status >= 500)
+
+
+_VOLATILE = re.compile(r"\d+|'[^']*'|\"[^\"]*\"|0x[0-9a-f]+")
+
+
+def signature(outcome: Outcome) -> str:
+    """Failure identity: status or transport error plus the normalised error text"""
+    if outcome.error is not None:
+        return f"transport {_VOLATILE.sub('#', outcome.error)}"
+    text = outcome.body[:500].decode('utf-8', 'replace')
+    try:
+        data = json.loads(text)
+        if isinstance(data, dict):
+            text = str(data.get('error') or data.get('message') or sorted(data))
+    except ValueError:
+        pass
+    return f"{outcome.status} {_VOLATILE.sub('#', text)[:160]}"
+
+
+class Sender:
+    """Sends raw request bodies over one persistent connection per thread"""
+
+    def __init__(self, url: str, method: str = 'POST', timeout: float = 10.0, headers: Optional[dict] = None):
+        parts = urlsplit(url)
+        self.method = method
+        self.https = parts.scheme == 'https'
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+        self.timeout = timeout
+        self.headers = dict(headers or {})
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            factory = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            connection = self._local.connection = factory(self.host, self.port, timeout=self.timeout)
+        return connection
+
+    def send(self, body: bytes, content_type: str) -> Outcome:
+        headers = dict(self.headers, **{'Content-Type': content_type, 'Content-Length': str(len(body))})
+        started = time.perf_counter()
+        for attempt in (1, 2):
+            connection = self._connection()
+            try:
+                connection.request(self.method, self.path, body=body, headers=headers)
+                response = connection.getresponse()
+                data = response.read()
+                if response.will_close:
+                    self.close()
+                return Outcome(response.status, data, elapsed_ms=(time.perf_counter() - started) * 1000)
+            except (http.client.HTTPException, OSError) as e:
+                self.close()
+                # A kept-alive connection closed by the server is retried once on a new one
+                if attempt == 2 or not isinstance(e, (http.client.RemoteDisconnected, BrokenPipeError,
+                                                      ConnectionResetError)):
+                    return Outcome(None, error=f"{type(e).__name__}: {e}",
+                                   elapsed_ms=(time.perf_counter() - started) * 1000)
+
+    def close(self) -> None:
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+@dataclass
+class Failure:
+    signature: str
+    count: int
+    case: Case
+    outcome: Outcome
+    minimal: Optional[Case] = None
+
+    def describe(self) -> str:
+        case = self.minimal or self.case
+        body, content_type = case.encode()
+        shown = body[:120].decode('utf-8', 'replace') + ('...' if len(body) > 120 else '')
+        return (f"{self.signature} (x{self.count})\n"
+                f"    mutations: {'; '.join(case.describe()) or '(none)'}\n"
+                f"    body [{content_type}]: {shown}")
+
+
+@dataclass
+class FuzzReport:
+    target: str
+    cases: int = 0
+    wall_s: float = 0.0
+    statuses: Dict[str, int] = field(default_factory=dict)
+    failures: Dict[str, Failure] = field(default_factory=dict)
+
+    @property
+    def throughput(self) -> float:
+        return self.cases / self.wall_s if self.wall_s else 0.0
+
+    def summary(self) -> str:
+        lines = [f"{self.target}: {self.cases} cases in {self.wall_s:.2f}s ({self.throughput:.0f}/s), "
+                 f"statuses {dict(sorted(self.statuses.items()))}, {len(self.failures)} distinct failure(s)"]
+        lines.extend(failure.describe() for failure in self.failures.values())
+        return '\n'.join(lines)
+
+
+class Fuzzer:
+    """Runs generated cases against one endpoint with bounded concurrency"""
+
+    def __init__(self, url: str, method: str = 'POST', concurrency: int = 8, timeout: float = 10.0,
+                 oracle: Callable[[Outcome], bool] = default_oracle, headers: Optional[dict] = None):
+        self.sender = Sender(url, method, timeout, headers)
+        self.target = f"{method} {url}"
+        self.concurrency = concurrency
+        self.oracle = oracle
+
+    def run(self, cases: Iterator[Case], shrink: bool = True) -> FuzzReport:
+        report = FuzzReport(self.target)
+        lock = threading.Lock()
+        cases = iter(cases)
+
+        def worker():
+            statuses: Dict[str, int] = {}
+            while True:
+                with lock:
+                    case = next(cases, None)
+                if case is None:
+                    break
+                outcome = self.sender.send(*case.encode())
+                status = str(outcome.status) if outcome.status is not None else 'error'
+                statuses[status] = statuses.get(status, 0) + 1
+                if self.oracle(outcome):
+                    key = signature(outcome)
+                    with lock:
+                        failure = report.failures.get(key)
+                        if failure is None:
+                            report.failures[key] = Failure(key, 1, case, outcome)
+                        else:
+                            failure.count += 1
+            self.sender.close()
+            with lock:
+                for status, count in statuses.items():
+                    report.statuses[status] = report.statuses.get(status, 0) + count
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker, name=f"fuzz-{index}", daemon=True)
+                   for index in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        report.wall_s = time.perf_counter() - started
+        report.cases = sum(report.statuses.values())
+
+        if shrink:
+            for failure in report.failures.values():
+                failure.minimal = self.shrink(failure.case, failure.signature)
+        self.sender.close()
+        return report
+
+    def reproduces(self, case: Case, expected: str) -> bool:
+        outcome = self.sender.send(*case.encode())
+        return self.oracle(outcome) and signature(outcome) == expected
+
+    def shrink(self, case: Case, expected: str) -> Case:
+        """Drop mutations, then seed fields, while the failure signature stays the same"""
+        current = case
+        changed = True
+        while changed and len(current.mutations) > 1:
+            changed = False
+            for index in range(len(current.mutations)):
+                candidate = Case(current.seed, current.mutations[:index] + current.mutations[index + 1:])
+                if self.reproduces(candidate, expected):
+                    current, changed = candidate, True
+                    break
+        touched = {mutation.key for mutation in current.mutations}
+        for key in list(current.seed):
+            if key in touched:
+                continue
+            seed = {name: value for name, value in current.seed.items() if name != key}
+            candidate = Case(seed, current.mutations)
+            if self.reproduces(candidate, expected):
+                current = candidate
+        return current
+
+
+def example_from_schema(schema: dict) -> dict:
+    """Minimal valid object for a flat schema like USER_SCHEMA"""
+    samples = {'integer': 1, 'number': 1.0, 'string': 'text', 'boolean': True, 'array': [], 'object': {}}
+    example = {}
+    for name, spec in schema.get('properties', {}).items():
+        if spec.get('format') == 'email':
+            example[name] = 'janet.weaver@reqres.in'
+        else:
+            example[name] = samples.get(spec.get('type'), None)
+    return example
@@ -0,0 +1,415 @@
+"""
+Local run history for trend queries
+Every run is appended to a SQLite database: one row per test (outcome,
+duration, markers) and one row per endpoint (requests, errors, latency
+percentiles), indexed by nodeid, commit, marker and timestamp. Rows are
+buffered in memory and written in batches of BATCH_SIZE, each batch in a single
+transaction, so recording adds only a few milliseconds to a run.
+
+Usage:
+    pytest --history-db=history.db
+    python -m harness.history --db history.db slowest --since 7d
+    python -m harness.history --db history.db trend /users --since 30d
+    python -m harness.history --db history.db flaky --since 30d --marker smoke
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+import pytest
+import requests
+
+from harness.soak import parse_duration, percentile
+from harness.standin import route_template
+
+logger = logging.getLogger(__name__)
+
+# Buffered rows written per transaction
+BATCH_SIZE = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    run_key TEXT NOT NULL UNIQUE,
+    started REAL NOT NULL,
+    finished REAL,
+    git_commit TEXT,
+    branch TEXT,
+    host TEXT,
+    args TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_started ON runs (started);
+CREATE INDEX IF NOT EXISTS runs_commit ON runs (git_commit);
+
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    nodeid TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    duration_s REAL NOT NULL,
+    call_s REAL,
+    started REAL NOT NULL,
+    worker TEXT
+);
+CREATE INDEX IF NOT EXISTS results_nodeid ON results (nodeid, started);
+CREATE INDEX IF NOT EXISTS results_started ON results (started);
+CREATE INDEX IF NOT EXISTS results_run ON results (run_id);
+
+CREATE TABLE IF NOT EXISTS markers (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    nodeid TEXT NOT NULL,
+    marker TEXT NOT NULL,
+    PRIMARY KEY (marker, nodeid, run_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS latency (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    endpoint TEXT NOT NULL,
+    requests INTEGER NOT NULL,
+    errors INTEGER NOT NULL,
+    p50_ms REAL,
+    p95_ms REAL,
+    p99_ms REAL,
+    started REAL NOT NULL,
+    worker TEXT
+);
+CREATE INDEX IF NOT EXISTS latency_endpoint ON latency (endpoint, started);
+CREATE INDEX IF NOT EXISTS latency_run ON latency (run_id);
+"""
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Open (and create) the history database; xdist workers share it through WAL"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    db = sqlite3.connect(path, timeout=30)
+    db.row_factory = sqlite3.Row
+    db.execute('PRAGMA journal_mode=WAL')
+    db.execute('PRAGMA synchronous=NORMAL')
+    db.executescript(SCHEMA)
+    return db
+
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        completed = subprocess.run(['git', *args], capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    if completed.returncode != 0:
+        return None
+    return completed.stdout.strip() or None
+
+
+def current_commit() -> Tuple[Optional[str], Optional[str]]:
+    """(commit, branch) from the CI environment, else from git"""
+    commit = os.environ.get('GITHUB_SHA') or os.environ.get('CI_COMMIT_SHA') or _git('rev-parse', 'HEAD')
+    branch = (os.environ.get('GITHUB_HEAD_REF') or os.environ.get('GITHUB_REF_NAME')
+              or os.environ.get('CI_COMMIT_REF_NAME') or _git('rev-parse', '--abbrev-ref', 'HEAD'))
+    return commit, branch
+
+
+class RunHistory:
+    """Buffers one run's rows and appends them to the database in batches"""
+
+    def __init__(self, path: str, run_key: Optional[str] = None, commit: Optional[str] = None,
+                 branch: Optional[str] = None, args: str = '', worker: Optional[str] = None,
+                 batch_size: int = BATCH_SIZE):
+        self.path = path
+        self.run_key = run_key or uuid.uuid4().hex
+        self.commit = commit
+        self.branch = branch
+        self.args = args
+        self.worker = worker
+        self.batch_size = batch_size
+        self.started = time.time()
+        self.run_id: Optional[int] = None
+        self.results: List[tuple] = []
+        self.markers: List[tuple] = []
+        self.latency: List[tuple] = []
+        self.written = 0
+        self.write_s = 0.0
+
+    def add_result(self, nodeid: str, outcome: str, duration_s: float, call_s: Optional[float],
+                   started: float, markers: Tuple[str, ...] = ()) -> None:
+        self.results.append((nodeid, outcome, duration_s, call_s, started, self.worker))
+        self.markers.extend((nodeid, marker) for marker in markers)
+        if len(self.results) >= self.batch_size:
+            self.flush()
+
+    def add_latency(self, endpoint: str, latencies_ms: List[float], errors: int) -> None:
+        self.latency.append((
+            endpoint, len(latencies_ms), errors, _round(percentile(latencies_ms, 50)),
+            _round(percentile(latencies_ms, 95)), _round(percentile(latencies_ms, 99)), self.started, self.worker,
+        ))
+
+    def flush(self, finished: Optional[float] = None) -> None:
+        """Write the buffered rows in one transaction"""
+        started = time.perf_counter()
+        db = connect(self.path)
+        try:
+            with db:
+                if self.run_id is None:
+                    db.execute(
+                        'INSERT OR IGNORE INTO runs (run_key, started, git_commit, branch, host, args) '
+                        'VALUES (?, ?, ?, ?, ?, ?)',
+                        (self.run_key, self.started, self.commit, self.branch, platform.node(), self.args)
+                    )
+                    self.run_id = db.execute('SELECT id FROM runs WHERE run_key = ?', (self.run_key,)).fetchone()[0]
+                db.executemany(
+                    'INSERT INTO results (run_id, nodeid, outcome, duration_s, call_s, started, worker) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)', [(self.run_id, *row) for row in self.results]
+                )
+                db.executemany(
+                    'INSERT OR IGNORE INTO markers (run_id, nodeid, marker) VALUES (?, ?, ?)',
+                    [(self.run_id, *row) for row in self.markers]
+                )
+                db.executemany(
+                    'INSERT INTO latency (run_id, endpoint, requests, errors, p50_ms, p95_ms, p99_ms, started, '
+                    'worker) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', [(self.run_id, *row) for row in self.latency]
+                )
+                if finished is not None:
+                    db.execute('UPDATE runs SET finished = MAX(COALESCE(finished, 0), ?) WHERE id = ?',
+                               (finished, self.run_id))
+        finally:
+            db.close()
+        self.written += len(self.results)
+        self.results, self.markers, self.latency = [], [], []
+        self.write_s += time.perf_counter() - started
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 2)
+
+
+def _since(value: str) -> float:
+    return time.time() - parse_duration(value)
+
+
+def slowest(db: sqlite3.Connection, since: str = '7d', marker: Optional[str] = None,
+            limit: int = 20) -> List[dict]:
+    """Tests with the highest mean duration since the given age"""
+    query = (
+        'SELECT r.nodeid, COUNT(*) AS runs, AVG(r.duration_s) AS mean_s, MAX(r.duration_s) AS max_s '
+        'FROM results r {join} WHERE r.started >= ? {where} '
+        'GROUP BY r.nodeid ORDER BY mean_s DESC LIMIT ?'
+    )
+    params: list = [_since(since)]
+    join = where = ''
+    if marker:
+        join = 'JOIN markers m ON m.run_id = r.run_id AND m.nodeid = r.nodeid'
+        where = 'AND m.marker = ?'
+        params.append(marker)
+    rows = db.execute(query.format(join=join, where=where), params + [limit])
+    return [dict(row, mean_s=round(row['mean_s'], 4), max_s=round(row['max_s'], 4)) for row in rows]
+
+
+def trend(db: sqlite3.Connection, endpoint: str, since: str = '30d') -> List[dict]:
+    """
+    Per-run latency of an endpoint, oldest first
+    A route template selects every route ending in it, so '/users' matches
+    'GET /api/users' and 'POST /api/users'; 'GET /users/{id}' also fixes the
+    method. Percentiles of several xdist workers in one run are averaged,
+    weighted by their request counts.
+    """
+    method, _, path = endpoint.strip().rpartition(' ')
+    escaped = path.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    pattern = f"{method.upper() or '%'} %{escaped}"
+    rows = db.execute(
+        'SELECT runs.started, runs.git_commit, l.endpoint, SUM(l.requests) AS requests, '
+        'SUM(l.errors) AS errors, SUM(l.p50_ms * l.requests) / SUM(l.requests) AS p50_ms, '
+        'SUM(l.p95_ms * l.requests) / SUM(l.requests) AS p95_ms, '
+        'SUM(l.p99_ms * l.requests) / SUM(l.requests) AS p99_ms '
+        "FROM latency l JOIN runs ON runs.id = l.run_id WHERE l.endpoint LIKE ? ESCAPE '\\' AND l.started >= ? "
+        'GROUP BY l.run_id, l.endpoint ORDER BY runs.started, l.endpoint',
+        (pattern, _since(since))
+    )
+    return [dict(row, p50_ms=_round(row['p50_ms']), p95_ms=_round(row['p95_ms']), p99_ms=_round(row['p99_ms']))
+            for row in rows]
+
+
+def flaky(db: sqlite3.Connection, since: str = '30d', marker: Optional[str] = None,
+          limit: int = 20) -> List[dict]:
+    """
+    Tests that both passed and failed since the given age, most flips first
+    A flip is a pass followed by a failure or the reverse, in run order; skips
+    are ignored. The flip rate is flips per consecutive pair of runs.
+    """
+    params: list = [_since(since)]
+    where = ''
+    if marker:
+        where = 'AND EXISTS (SELECT 1 FROM markers m WHERE m.run_id = r.run_id AND m.nodeid = r.nodeid AND m.marker = ?)'
+        params.append(marker)
+    rows = db.execute(
+        'WITH ordered AS ('
+        '    SELECT r.nodeid, r.outcome = \'passed\' AS passed, '
+        '           LAG(r.outcome = \'passed\') OVER (PARTITION BY r.nodeid ORDER BY r.started) AS previous '
+        f'    FROM results r WHERE r.started >= ? AND r.outcome IN (\'passed\', \'failed\', \'error\') {where}) '
+        'SELECT nodeid, COUNT(*) AS runs, SUM(NOT passed) AS failures, SUM(previous != passed) AS flips '
+        'FROM ordered GROUP BY nodeid HAVING failures > 0 AND failures < runs '
+        'ORDER BY CAST(flips AS REAL) / (runs - 1) DESC, runs DESC LIMIT ?',
+        params + [limit]
+    )
+    return [dict(row, flip_rate=round(row['flips'] / (row['runs'] - 1), 3)) for row in rows]
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('history', 'Run history')
+    group.addoption('--history-db', default=None, metavar='PATH',
+                    help='Append test outcomes, durations and endpoint latency to a SQLite database')
+    group.addoption('--history-commit', default=None, metavar='SHA',
+                    help='Commit recorded with the run (default: CI environment or git HEAD)')
+
+
+class HistoryPlugin:
+    """Buffers one row per executed test and per endpoint, written at session end"""
+
+    def __init__(self, config):
+        commit, branch = current_commit()
+        workerinput = getattr(config, 'workerinput', None)
+        self.history = RunHistory(
+            config.getoption('history_db'),
+            run_key=workerinput['testrunuid'] if workerinput else None,
+            commit=config.getoption('history_commit') or commit,
+            branch=branch,
+            args=' '.join(config.invocation_params.args),
+            worker=os.environ.get('PYTEST_XDIST_WORKER'),
+        )
+        # Only markers registered in pytest.ini, not parametrize, usefixtures, ...
+        self.registered = {line.split(':')[0].strip() for line in config.getini('markers')}
+        self.markers: Dict[str, Tuple[str, ...]] = {}
+        self.reports: Dict[str, list] = {}
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def pytest_collection_finish(self, session):
+        for item in session.items:
+            names = {marker.name for marker in item.iter_markers()} & self.registered
+            self.markers[item.nodeid] = tuple(sorted(names))
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_fixture_setup(self, fixturedef, request):
+        outcome = yield
+        if fixturedef.argname == 'api_session' and outcome.excinfo is None:
+            outcome.get_result().hooks['response'].append(self._on_response)
+
+    def _on_response(self, response, *args, **kwargs):
+        path = requests.utils.urlparse(response.request.url).path or '/'
+        key = f"{response.request.method} {route_template(path)}"
+        self.latencies.setdefault(key, []).append(response.elapsed.total_seconds() * 1000)
+        if response.status_code >= 500:
+            self.errors[key] = self.errors.get(key, 0) + 1
+
+    def pytest_runtest_logreport(self, report):
+        reports = self.reports.setdefault(report.nodeid, [])
+        reports.append(report)
+        if report.when == 'teardown':
+            del self.reports[report.nodeid]
+            self.history.add_result(
+                report.nodeid, _outcome(reports), sum(phase.duration for phase in reports),
+                next((phase.duration for phase in reports if phase.when == 'call'), None),
+                getattr(reports[0], 'start', time.time()), self.markers.get(report.nodeid, ()),
+            )
+
+    def pytest_sessionfinish(self, session):
+        for endpoint, latencies in self.latencies.items():
+            self.history.add_latency(endpoint, latencies, self.errors.get(endpoint, 0))
+        try:
+            self.history.flush(finished=time.time())
+        except sqlite3.Error as e:
+            logger.error(f"Run history not written to {self.history.path}: {e}")
+            return
+        logger.info(f"Run history: {self.history.written} results written to {self.history.path} "
+                    f"in {self.history.write_s * 1000:.1f} ms")
+
+
+def _outcome(reports: list) -> str:
+    """Outcome of a test from its setup/call/teardown reports"""
+    for report in reports:
+        if report.failed:
+            return 'failed' if report.when == 'call' else 'error'
+    for report in reports:
+        if hasattr(report, 'wasxfail'):
+            return 'xfailed' if report.skipped else 'xpassed'
+        if report.skipped:
+            return 'skipped'
+    return 'passed'
+
+
+QUERIES = {
+    'slowest': ('Slowest tests by mean duration', ('nodeid', 'runs', 'mean_s', 'max_s')),
+    'trend': ('Per-run latency percentiles of an endpoint',
+              ('started', 'git_commit', 'endpoint', 'requests', 'errors', 'p50_ms', 'p95_ms', 'p99_ms')),
+    'flaky': ('Tests that both passed and failed, most flips first',
+              ('nodeid', 'runs', 'failures', 'flips', 'flip_rate')),
+}
+
+
+def _table(rows: List[dict], columns: Tuple[str, ...]) -> str:
+    cells = [[str(column) for column in columns]]
+    for row in rows:
+        cells.append([
+            time.strftime('%Y-%m-%d %H:%M', time.localtime(row[column])) if column == 'started'
+            else (row[column] or '-')[:12] if column == 'git_commit' else str(row[column])
+            for column in columns
+        ])
+    widths = [max(len(line[index]) for line in cells) for index in range(len(columns))]
+    # Left-align the first column (nodeid or timestamp), right-align the numbers
+    return '\n'.join(
+        '  '.join(cell.ljust(width) if index == 0 or not cell[:1].isdigit() else cell.rjust(width)
+                  for index, (cell, width) in enumerate(zip(line, widths))).rstrip()
+        for line in cells
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Query the local run history')
+    parser.add_argument('--db', default='history.db', help='History database (default: history.db)')
+    parser.add_argument('--json', action='store_true', help='Print JSON instead of a table')
+    commands = parser.add_subparsers(dest='query', required=True)
+    for name, (description, _) in QUERIES.items():
+        command = commands.add_parser(name, help=description, description=description)
+        if name == 'trend':
+            command.add_argument('endpoint', help="Route template, e.g. '/users' or 'GET /users/{id}'")
+        command.add_argument('--since', default='7d' if name == 'slowest' else '30d',
+                             help='Age window, e.g. 24h, 7d (default: %(default)s)')
+        if name != 'trend':
+            command.add_argument('--marker', default=None, help='Only tests with this marker')
+            command.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        parser.error(f"no history database at {args.db} (record one with pytest --history-db={args.db})")
+    db = connect(args.db)
+    try:
+        if args.query == 'slowest':
+            rows = slowest(db, args.since, args.marker, args.limit)
+        elif args.query == 'trend':
+            rows = trend(db, args.endpoint, args.since)
+        else:
+            rows = flaky(db, args.since, args.marker, args.limit)
+    finally:
+        db.close()
+    print(json.dumps(rows, indent=2) if args.json else _table(rows, QUERIES[args.query][1]))
+    return 0
+
+
+def pytest_configure(config):
+    if config.getoption('history_db'):
+        # With -n the workers record; the controller only relays their reports
+        if config.pluginmanager.hasplugin('xdist') and getattr(config.option, 'numprocesses', None) \
+                and not hasattr(config, 'workerinput'):
+            return
+        config.pluginmanager.register(HistoryPlugin(config), 'api-history')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
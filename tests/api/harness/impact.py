@@ -0,0 +1,423 @@
+"""
+Endpoint coverage index and change-based test selection
+Every run records, per test, the route templates it requested (from any
+HTTP client built on http.client, worker threads included), the JSON schemas it validated and
+the fixtures it used. Each entry also stores digests of the source the test
+depends on: the test function, the rest of its module, the conftest fixtures
+and constants it reaches, and the stand-in handlers of its routes. Everything
+else under the rootdir (harness modules, conftest hooks, pytest.ini) shares one
+digest. Digests are taken over the AST, so comment and formatting edits do not
+count as changes.
+
+With --impact only the affected tests run: tests whose recorded digests differ
+from the current source, and tests touching an --impact-route, --impact-schema
+or --impact-file. New tests and tests that did not pass last time always run.
+A missing or stale index (the shared digest changed) runs the full suite.
+
+Usage:
+    pytest --standin=data/bench-1m.qads                 # records .api-impact.json
+    pytest --impact                                     # only tests affected by source changes
+    pytest --impact --impact-schema post_schema --impact-route "GET /posts/{id}"
+    pytest --impact --impact-file test_reqres.py
+"""
+
+import ast
+import fnmatch
+import hashlib
+import http.client
+import json
+import logging
+import os
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+import pytest
+
+from harness import standin
+from harness.filelock import locked
+from harness.standin import route_template
+
+_PUTREQUEST = http.client.HTTPConnection.putrequest
+
+logger = logging.getLogger(__name__)
+
+VERSION = 1
+
+# Part holding everything no single test can be attributed to
+GLOBAL = '<global>'
+# Part holding a test module's code outside its test functions
+MODULE = '<module>'
+
+# Files covered by the digests, besides *.py
+TRACKED_FILES = ('pytest.ini', 'requirements.txt')
+SKIPPED_DIRS = ('__pycache__', '.*', '*.egg-info', 'venv')
+
+# Stand-in handler method per (method, route template)
+HANDLERS = {(method, template): handler for _, method, template, handler in standin.ROUTES}
+
+
+def _digest(data: str) -> str:
+    return hashlib.sha256(data.encode()).hexdigest()[:16]
+
+
+def _references(node: ast.AST) -> Set[str]:
+    """Names and attribute names used in node (self.echo counts as echo)"""
+    names = set()
+    for child in ast.walk(node):
+        if isinstance(child, ast.Name):
+            names.add(child.id)
+        elif isinstance(child, ast.Attribute):
+            names.add(child.attr)
+    return names
+
+
+def _is_fixture(node: ast.AST) -> bool:
+    for decorator in getattr(node, 'decorator_list', ()):
+        target = decorator.func if isinstance(decorator, ast.Call) else decorator
+        if isinstance(target, ast.Attribute) and target.attr == 'fixture':
+            return True
+        if isinstance(target, ast.Name) and target.id == 'fixture':
+            return True
+    return False
+
+
+class SourceIndex:
+    """
+    Digests of the attributable parts of the rootdir sources, keyed
+    'file::name', and one digest of everything else
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.parts: Dict[str, str] = {}
+        self.refs: Dict[str, Set[str]] = {}
+        self._shared: List[Tuple[str, str]] = []
+        self.conftest = 'conftest.py'
+        standin_path = os.path.relpath(os.path.abspath(standin.__file__), root)
+        self.standin = None if standin_path.startswith('..') else standin_path.replace(os.sep, '/')
+        for path in self.files():
+            self._add(path)
+        self.global_digest = _digest(repr(sorted(self._shared)))
+
+    def files(self) -> Iterator[str]:
+        """Rootdir-relative paths of the tracked files"""
+        for directory, dirs, files in os.walk(self.root):
+            dirs[:] = sorted(d for d in dirs if not any(fnmatch.fnmatch(d, pattern) for pattern in SKIPPED_DIRS))
+            for name in sorted(files):
+                path = os.path.relpath(os.path.join(directory, name), self.root).replace(os.sep, '/')
+                if name.endswith('.py') or path in TRACKED_FILES:
+                    yield path
+
+    def _add(self, path: str) -> None:
+        with open(os.path.join(self.root, path), 'rb') as f:
+            source = f.read()
+        try:
+            tree = ast.parse(source, path)
+        except (SyntaxError, ValueError):
+            self._shared.append((path, hashlib.sha256(source).hexdigest()))
+            return
+        if path == self.conftest:
+            parts, rest = self._split(tree.body, self._conftest_part)
+            # A constant is attributable only while fixtures alone use it
+            shared = set().union(*map(_references, rest))
+            used = set().union(*(_references(node) for node in parts.values() if not isinstance(node, ast.Assign)))
+            for name, node in list(parts.items()):
+                if isinstance(node, ast.Assign) and (name in shared or name not in used):
+                    rest.append(parts.pop(name))
+        elif fnmatch.fnmatch(os.path.basename(path), 'test_*.py'):
+            parts, rest = self._split(tree.body, self._test_part)
+            parts[MODULE] = ast.Module(body=rest, type_ignores=[])
+            rest = []
+        elif path == self.standin:
+            handlers = set(HANDLERS.values())
+            parts, rest = {}, []
+            for node in tree.body:
+                if isinstance(node, ast.ClassDef) and node.name == 'StandInAPI':
+                    methods, members = self._split(node.body, lambda member: (
+                        member.name if isinstance(member, ast.FunctionDef) and member.name in handlers else None
+                    ))
+                    parts.update((f"StandInAPI.{name}", method) for name, method in methods.items())
+                    rest.extend(members)
+                else:
+                    rest.append(node)
+        else:
+            parts, rest = {}, tree.body
+        for name, node in parts.items():
+            self.parts[f"{path}::{name}"] = _digest(ast.dump(node))
+            self.refs[f"{path}::{name}"] = _references(node)
+        self._shared.append((path, _digest(''.join(map(ast.dump, rest)))))
+
+    @staticmethod
+    def _split(body: List[ast.stmt], name_of) -> Tuple[Dict[str, ast.stmt], List[ast.stmt]]:
+        """Statements name_of names, by name, and the others"""
+        parts, rest = {}, []
+        for node in body:
+            name = name_of(node)
+            if name is None:
+                rest.append(node)
+            else:
+                parts[name] = node
+        return parts, rest
+
+    @staticmethod
+    def _test_part(node: ast.stmt) -> Optional[str]:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name.startswith('test'):
+            return node.name
+        return None
+
+    @staticmethod
+    def _conftest_part(node: ast.stmt) -> Optional[str]:
+        """Fixtures and module-level constants (schemas, payloads); hooks and imports are shared"""
+        if isinstance(node, ast.FunctionDef) and _is_fixture(node):
+            return node.name
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            return node.targets[0].id
+        return None
+
+    def dependencies(self, nodeid: str, fixtures: Iterable[str], routes: Iterable[str]) -> Set[str]:
+        """Part keys a test depends on, following references between parts of the same file"""
+        path, _, name = nodeid.partition('::')
+        function = f"{path}::{name.split('::')[-1].split('[')[0]}"
+        keys = {function, f"{path}::{MODULE}"}
+        pending = [function] + [f"{self.conftest}::{fixture}" for fixture in fixtures]
+        for route in routes:
+            method, _, template = route.partition(' ')
+            handler = HANDLERS.get((method, template))
+            if handler is not None and self.standin is not None:
+                pending.append(f"{self.standin}::StandInAPI.{handler}")
+        while pending:
+            key = pending.pop()
+            if key not in self.parts:
+                continue
+            keys.add(key)
+            file, _, member = key.partition('::')
+            scopes = [f"{file}::{member.rpartition('.')[0]}.", f"{file}::"] if '.' in member else [f"{file}::"]
+            for ref in self.refs[key]:
+                target = next((scope + ref for scope in scopes if scope + ref in self.parts), None)
+                if target is not None and target not in keys:
+                    pending.append(target)
+        return keys
+
+    def snapshot(self, keys: Iterable[str]) -> Dict[str, Optional[str]]:
+        digests = {key: self.parts.get(key) for key in sorted(keys)}
+        digests[GLOBAL] = self.global_digest
+        return digests
+
+    def changed(self, digests: Dict[str, Optional[str]]) -> List[str]:
+        current = dict(self.parts, **{GLOBAL: self.global_digest})
+        return [key for key, digest in digests.items() if current.get(key) != digest]
+
+
+def load_index(path: str) -> Optional[dict]:
+    """The index at path, or None when it is missing, unreadable or of another version"""
+    try:
+        with open(path) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(index, dict) or index.get('version') != VERSION:
+        return None
+    return index
+
+
+def _matches_route(wanted: str, routes: Iterable[str]) -> bool:
+    """wanted is 'METHOD /template', '/template' or a concrete path such as /posts/1"""
+    method, _, path = wanted.strip().rpartition(' ')
+    template = route_template(path)
+    return any(
+        route.partition(' ')[2] == template and (not method or route.partition(' ')[0] == method.upper())
+        for route in routes
+    )
+
+
+def record_schema(config, schema: dict) -> None:
+    """Record a validated schema on the running test; no-op when the index is off"""
+    plugin = config.pluginmanager.get_plugin('api-impact')
+    if plugin is not None:
+        plugin.record_schema(schema)
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('impact', 'Endpoint coverage index and change-based selection')
+    group.addoption('--impact-index', default='.api-impact.json', metavar='PATH',
+                    help='Coverage index recorded by every run, relative to the rootdir (default: .api-impact.json)')
+    group.addoption('--no-impact-index', action='store_true', default=False,
+                    help='Do not record the coverage index in this run')
+    group.addoption('--impact', action='store_true', default=False,
+                    help='Run only the tests affected by source changes since they were indexed, '
+                         'plus those matching --impact-route/-schema/-file')
+    group.addoption('--impact-route', action='append', default=[], metavar='ROUTE',
+                    help="Also run the tests requesting ROUTE, e.g. 'GET /posts/{id}' or /posts/{id} (repeatable)")
+    group.addoption('--impact-schema', action='append', default=[], metavar='NAME',
+                    help='Also run the tests validating or using schema NAME, e.g. post_schema (repeatable)')
+    group.addoption('--impact-file', action='append', default=[], metavar='PATH',
+                    help='Also run the tests of test module PATH; any other file runs the full suite (repeatable)')
+
+
+class ImpactPlugin:
+    """Records routes, schemas and fixtures per test and selects the affected tests"""
+
+    def __init__(self, config):
+        self.config = config
+        self.path = os.path.join(str(config.rootpath), config.getoption('impact_index'))
+        self.recording = not config.getoption('no_impact_index') and not hasattr(config, 'workerinput')
+        self.item: Optional[pytest.Item] = None
+        self.routes: Dict[str, Set[str]] = {}
+        self.schemas: Dict[str, Set[str]] = {}
+        self.outcomes: Dict[str, str] = {}
+        self.entries: Dict[str, dict] = {}
+        self.summary: Optional[str] = None
+        self.unaffected = False
+        self._sources: Optional[SourceIndex] = None
+
+    @property
+    def sources(self) -> SourceIndex:
+        if self._sources is None:
+            self._sources = SourceIndex(str(self.config.rootpath))
+        return self._sources
+
+    # Recording -------------------------------------------------------------
+
+    def pytest_sessionstart(self, session):
+        plugin = self
+
+        # Patched below requests and urllib3, so the fuzzer's raw connections
+        # and the scenario and load generator threads are recorded too
+        def putrequest(connection, method, url, *args, **kwargs):
+            item = plugin.item
+            if item is not None:
+                path = urlsplit(url).path or '/'
+                plugin.routes.setdefault(item.nodeid, set()).add(f"{method} {route_template(path)}")
+            return _PUTREQUEST(connection, method, url, *args, **kwargs)
+
+        http.client.HTTPConnection.putrequest = putrequest
+
+    def record_schema(self, schema: dict) -> None:
+        item = self.item
+        if item is None:
+            return
+        funcargs = getattr(item, 'funcargs', {})
+        name = next((name for name, value in funcargs.items() if value is schema), None)
+        if name is None:
+            name = schema.get('title') or f"schema-{_digest(json.dumps(schema, sort_keys=True, default=str))[:8]}"
+        self.schemas.setdefault(item.nodeid, set()).add(name)
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_protocol(self, item, nextitem):
+        self.item = item
+        yield
+        self.item = None
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_makereport(self, item, call):
+        outcome = yield
+        report = outcome.get_result()
+        if report.when == 'teardown':
+            # Travels with the report, so with -n the controller gets the workers' records
+            report.api_impact = {
+                'routes': sorted(self.routes.pop(item.nodeid, ())),
+                'schemas': sorted(self.schemas.pop(item.nodeid, ())),
+                'fixtures': sorted(item.fixturenames),
+            }
+
+    def pytest_runtest_logreport(self, report):
+        outcome = self.outcomes.get(report.nodeid, 'passed')
+        if report.failed:
+            outcome = 'failed'
+        elif report.skipped and outcome == 'passed':
+            outcome = 'skipped'
+        if report.when != 'teardown':
+            self.outcomes[report.nodeid] = outcome
+            return
+        self.outcomes.pop(report.nodeid, None)
+        impact = getattr(report, 'api_impact', None)
+        if impact is not None:
+            self.entries[report.nodeid] = dict(impact, outcome=outcome)
+
+    def pytest_sessionfinish(self, session):
+        http.client.HTTPConnection.putrequest = _PUTREQUEST
+        if self.unaffected and session.exitstatus == pytest.ExitCode.NO_TESTS_COLLECTED:
+            # Nothing was affected: a passing run, not an empty collection
+            session.exitstatus = pytest.ExitCode.OK
+        if not self.recording or not self.entries:
+            return
+        # Distributed workers share the rootdir; merge under a lock so none loses its entries
+        with locked(f"{self.path}.lock"):
+            self._merge()
+
+    def _merge(self) -> None:
+        index = load_index(self.path) or {'version': VERSION, 'tests': {}}
+        tests = index['tests']
+        for nodeid, entry in self.entries.items():
+            keys = self.sources.dependencies(nodeid, entry['fixtures'], entry['routes'])
+            tests[nodeid] = dict(entry, parts=self.sources.snapshot(keys))
+        root = str(self.config.rootpath)
+        for nodeid in [nodeid for nodeid in tests if not os.path.exists(os.path.join(root, nodeid.split('::')[0]))]:
+            del tests[nodeid]
+        index.update(updated=round(time.time(), 3), global_digest=self.sources.global_digest)
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary, 'w') as f:
+            json.dump(index, f, indent=1, sort_keys=True)
+        os.replace(temporary, self.path)
+
+    # Selection -------------------------------------------------------------
+
+    def _full_suite_reason(self, index: Optional[dict]) -> Optional[str]:
+        if index is None:
+            return f"no coverage index at {self.path}"
+        if index.get('global_digest') != self.sources.global_digest:
+            return 'the index is stale (code outside tests, fixtures and stand-in handlers changed)'
+        for path in self.config.getoption('impact_file'):
+            relative = os.path.relpath(os.path.abspath(path), str(self.config.rootpath)).replace(os.sep, '/')
+            if not fnmatch.fnmatch(os.path.basename(relative), 'test_*.py'):
+                return f"{path} is not a test module"
+        return None
+
+    def _affected(self, nodeid: str, entry: Optional[dict]) -> bool:
+        if entry is None or entry.get('outcome') != 'passed':
+            return True
+        if self.sources.changed(entry.get('parts', {})):
+            return True
+        options = self.config.getoption
+        if any(_matches_route(route, entry['routes']) for route in options('impact_route')):
+            return True
+        for name in options('impact_schema'):
+            constant = f"{self.sources.conftest}::{name}"
+            if name in entry['schemas'] or name in entry['fixtures'] or constant in entry['parts']:
+                return True
+        path = nodeid.split('::')[0]
+        root = str(self.config.rootpath)
+        return any(os.path.relpath(os.path.abspath(file), root).replace(os.sep, '/') == path
+                   for file in options('impact_file'))
+
+    @pytest.hookimpl(trylast=True)
+    def pytest_collection_modifyitems(self, session, config, items):
+        if not config.getoption('impact') or not items:
+            return
+        index = load_index(self.path)
+        reason = self._full_suite_reason(index)
+        if reason is not None:
+            self.summary = f"impact: running all {len(items)} tests, {reason}"
+            logger.warning(self.summary)
+            return
+        tests = index['tests']
+        selected = [item for item in items if self._affected(item.nodeid, tests.get(item.nodeid))]
+        kept = set(selected)
+        deselected = [item for item in items if item not in kept]
+        if deselected:
+            config.hook.pytest_deselected(items=deselected)
+            items[:] = selected
+            self.unaffected = not selected
+        self.summary = f"impact: running {len(selected)} of {len(selected) + len(deselected)} tests"
+        logger.info(self.summary)
+
+    def pytest_terminal_summary(self, terminalreporter):
+        if self.summary:
+            terminalreporter.write_sep('-', self.summary)
+
+
+def pytest_configure(config):
+    recording = not config.getoption('no_impact_index')
+    if recording or config.getoption('impact'):
+        config.pluginmanager.register(ImpactPlugin(config), 'api-impact')
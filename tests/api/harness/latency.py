@@ -0,0 +1,143 @@
+"""
+Sequential latency SLO assertions
+Replaces single-sample response-time thresholds with a truncated sequential
+test on log-latency: clear passes and failures are decided after two samples
+(the response already received plus one resend), borderline endpoints are
+sampled further instead of producing a flaky verdict
+
+Model: latencies are log-normal, so the SLO "p<pct> < threshold" holds iff the
+pct quantile of ln(latency), mean + z(pct) * sigma, is below ln(threshold).
+Mean and spread are both estimated from the samples. After each sample the
+quantile gets one-sided normal tolerance bounds, mean + k * stdev with exact
+noncentral-t factors k; the test stops when the upper bound is below the
+threshold ("meets", wrong with probability beta) or the lower bound is above it
+("violates", wrong with probability alpha). Steady endpoints have a small
+spread and are decided at once however close they are to the threshold; noisy
+ones need more samples.
+"""
+
+import math
+from dataclasses import dataclass, field
+from functools import lru_cache
+from statistics import NormalDist, mean, stdev
+from typing import Callable, List, Optional
+
+MEETS = 'meets'
+VIOLATES = 'violates'
+
+# Error rates are split over the looks at the data: each confidence bound is
+# checked at the rate divided by this factor, which keeps the overall error
+# within alpha/beta for up to the default max_samples looks
+LOOK_FACTOR = 4
+
+
+@dataclass
+class LatencyVerdict:
+    """Outcome of a sequential latency test"""
+
+    verdict: str
+    samples: List[float] = field(default_factory=list)
+    # Estimated percentile latency (ms) at the last look
+    estimate_ms: Optional[float] = None
+    truncated: bool = False
+
+    @property
+    def passed(self) -> bool:
+        return self.verdict == MEETS
+
+    def describe(self, threshold_ms: float, pct: float) -> str:
+        observed = ', '.join(f"{sample:.0f}" for sample in self.samples)
+        estimate = f"estimated {self.estimate_ms:.0f}ms " if self.estimate_ms is not None else ''
+        cut = ' (max samples reached, decided by the estimate)' if self.truncated else ''
+        return (f"p{pct:g} < {threshold_ms:g}ms {self.verdict.upper()} after "
+                f"{len(self.samples)} sample(s){cut}; {estimate}observed ms: [{observed}]")
+
+
+class SequentialLatencyTest:
+    """Truncated sequential test of whether a latency percentile meets a threshold"""
+
+    def __init__(self, threshold_ms: float, pct: float = 95, alpha: float = 0.05, beta: float = 0.05,
+                 min_samples: int = 2, max_samples: int = 50):
+        if not 0 < pct < 100:
+            raise ValueError(f"Percentile must be between 0 and 100, got {pct}")
+        if min_samples < 2:
+            raise ValueError(f"The spread needs at least 2 samples, got min_samples={min_samples}")
+        self.threshold_ms = threshold_ms
+        self.pct = pct
+        self.alpha = alpha
+        self.beta = beta
+        self.min_samples = min_samples
+        self.max_samples = max(max_samples, min_samples)
+        self.z = NormalDist().inv_cdf(pct / 100.0)
+        self.boundary = math.log(threshold_ms)
+
+    def run(self, sample: Callable[[], float], first_ms: float = None) -> LatencyVerdict:
+        """Draw latency samples (ms) until a decision is reached"""
+        result = LatencyVerdict(verdict='')
+        logs = []
+        value = first_ms
+        while True:
+            if value is None:
+                value = sample()
+            result.samples.append(value)
+            logs.append(math.log(max(value, 1e-3)))
+            value = None
+            n = len(logs)
+            if n < self.min_samples:
+                continue
+
+            center, spread = mean(logs), stdev(logs)
+            estimate = center + self.z * spread
+            result.estimate_ms = math.exp(estimate)
+            if center + tolerance_factor(n, self.z, 1 - self.beta / LOOK_FACTOR) * spread < self.boundary:
+                result.verdict = MEETS
+                return result
+            if center + tolerance_factor(n, self.z, self.alpha / LOOK_FACTOR) * spread > self.boundary:
+                result.verdict = VIOLATES
+                return result
+            if n >= self.max_samples:
+                result.verdict = VIOLATES if estimate > self.boundary else MEETS
+                result.truncated = True
+                return result
+
+
+@lru_cache(maxsize=None)
+def tolerance_factor(n: int, z: float, confidence: float) -> float:
+    """
+    k such that mean + k * stdev of n normal samples bounds the quantile
+    mean + z * sigma from above with the given confidence (from below when
+    confidence < 0.5): the confidence quantile of a noncentral t with n - 1
+    degrees of freedom and noncentrality z * sqrt(n), divided by sqrt(n)
+    """
+    df, delta, tail = n - 1, z * math.sqrt(n), 1 - confidence
+    low, high = -1.0, 1.0
+    while _nct_sf(low, df, delta) < tail:
+        low *= 2
+    while _nct_sf(high, df, delta) > tail:
+        high *= 2
+    for _ in range(50):
+        middle = (low + high) / 2
+        if _nct_sf(middle, df, delta) > tail:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2 / math.sqrt(n)
+
+
+def _nct_sf(t: float, df: int, delta: float, steps: int = 400) -> float:
+    """
+    P(T > t) for a noncentral t: the normal tail Q(t * u - delta) averaged over
+    u = sqrt(chi2(df) / df), integrated with Simpson's rule over ln(u)
+    """
+    log_norm = math.log(2 * df) - (df / 2) * math.log(2) - math.lgamma(df / 2)
+    low, high = math.log(1e-9), math.log(1 + 12 / math.sqrt(df))
+    width = (high - low) / steps
+    total = 0.0
+    for index in range(steps + 1):
+        u = math.exp(low + index * width)
+        v = df * u * u
+        # Density of u times du/d(ln u) = u
+        density = math.exp(log_norm + 2 * math.log(u) + (df / 2 - 1) * math.log(v) - v / 2)
+        weight = 1 if index in (0, steps) else (4 if index % 2 else 2)
+        total += weight * density * 0.5 * math.erfc((t * u - delta) / math.sqrt(2))
+    return total * width / 3
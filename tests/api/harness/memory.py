@@ -0,0 +1,188 @@
+"""
+Opt-in per-test memory tracking plugin
+Uses tracemalloc to record peak and retained allocations per test, flags tests
+whose retained memory exceeds a threshold and writes a per-run summary
+
+Usage:
+    pytest --memprofile
+    pytest --memprofile --memprofile-threshold 256 --memprofile-file memory.json
+"""
+
+import gc
+import json
+import logging
+import sys
+import tracemalloc
+from typing import List, Optional
+
+import pytest
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# tracemalloc.reset_peak() is new in Python 3.9; without it the traced peak is
+# the session's, so per-test peaks are reported as unavailable (None)
+HAS_RESET_PEAK = hasattr(tracemalloc, 'reset_peak')
+
+
+def _max_rss_kb() -> Optional[int]:
+    """Peak resident set size of this process in KiB, where available"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux reports KiB
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+class MemoryTracker:
+    """
+    Tracks traced memory between start() and stop() calls
+    Snapshots are only taken when a measurement exceeds the threshold, so the
+    steady-state cost is two get_traced_memory() calls per test.
+    """
+
+    def __init__(self, threshold_kb: float = 1024, top: int = 10, frames: int = 1):
+        self.threshold = threshold_kb * 1024
+        self.top = top
+        self.frames = frames
+        self.records: List[dict] = []
+        self._baseline = 0
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+        self._started_tracing = False
+        self.rss_start_kb = None
+
+    def begin_session(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+        self.rss_start_kb = _max_rss_kb()
+        self._snapshot = self._take_snapshot()
+
+    def end_session(self) -> None:
+        if self._started_tracing:
+            tracemalloc.stop()
+
+    def _take_snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+        ])
+
+    def start(self) -> None:
+        self._baseline = tracemalloc.get_traced_memory()[0]
+        if HAS_RESET_PEAK:
+            tracemalloc.reset_peak()
+
+    def stop(self, nodeid: str) -> dict:
+        current, peak = tracemalloc.get_traced_memory()
+        retained = current - self._baseline
+        if retained > self.threshold:
+            # Confirm the growth survives a full collection before flagging
+            gc.collect()
+            current = tracemalloc.get_traced_memory()[0]
+            retained = current - self._baseline
+
+        record = {
+            'nodeid': nodeid,
+            'peak_kb': round((peak - self._baseline) / 1024, 1) if HAS_RESET_PEAK else None,
+            'retained_kb': round(retained / 1024, 1),
+            'flagged': retained > self.threshold,
+        }
+        if record['flagged']:
+            # Growth since the previous snapshot; may include small amounts
+            # retained by earlier, unflagged tests
+            snapshot = self._take_snapshot()
+            stats = snapshot.compare_to(self._snapshot, 'lineno')
+            record['top_sites'] = [
+                {'site': str(stat.traceback), 'size_kb': round(stat.size_diff / 1024, 1),
+                 'count': stat.count_diff}
+                for stat in stats[:self.top] if stat.size_diff > 0
+            ]
+            self._snapshot = snapshot
+        self.records.append(record)
+        return record
+
+    def summary(self) -> dict:
+        current, _ = tracemalloc.get_traced_memory()
+        flagged = [record for record in self.records if record['flagged']]
+        by_retained = sorted(self.records, key=lambda record: record['retained_kb'], reverse=True)
+        return {
+            'tests': len(self.records),
+            'threshold_kb': self.threshold / 1024,
+            'traced_end_kb': round(current / 1024, 1),
+            'retained_total_kb': round(sum(record['retained_kb'] for record in self.records), 1),
+            'max_rss_start_kb': self.rss_start_kb,
+            'max_rss_end_kb': _max_rss_kb(),
+            'flagged': flagged,
+            'top_retainers': by_retained[:self.top],
+            'tests_detail': self.records,
+        }
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('memprofile', 'Per-test memory tracking')
+    group.addoption('--memprofile', action='store_true', default=False,
+                    help='Track peak and retained allocations per test with tracemalloc')
+    group.addoption('--memprofile-threshold', type=float, default=1024, metavar='KB',
+                    help='Flag tests retaining more than KB KiB (default: 1024)')
+    group.addoption('--memprofile-top', type=int, default=10,
+                    help='Allocation sites / tests listed per finding (default: 10)')
+    group.addoption('--memprofile-frames', type=int, default=1,
+                    help='Traceback depth stored per allocation (default: 1, cheapest)')
+    group.addoption('--memprofile-file', default='memory-profile.json',
+                    help='Run summary output file (default: memory-profile.json)')
+
+
+class MemoryPlugin:
+    """Wraps each test's setup-to-teardown span in a MemoryTracker measurement"""
+
+    def __init__(self, config):
+        self.tracker = MemoryTracker(
+            threshold_kb=config.getoption('memprofile_threshold'),
+            top=config.getoption('memprofile_top'),
+            frames=config.getoption('memprofile_frames'),
+        )
+        self.output = config.getoption('memprofile_file')
+
+    def pytest_sessionstart(self, session):
+        self.tracker.begin_session()
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_setup(self, item):
+        self.tracker.start()
+        yield
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_teardown(self, item):
+        yield
+        record = self.tracker.stop(item.nodeid)
+        if record['peak_kb'] is not None:
+            item.user_properties.append(('memory_peak_kb', record['peak_kb']))
+        item.user_properties.append(('memory_retained_kb', record['retained_kb']))
+        if record['flagged']:
+            logger.warning(f"⚠ MEMORY: {item.nodeid} retained {record['retained_kb']} KiB")
+
+    def pytest_sessionfinish(self, session):
+        summary = self.tracker.summary()
+        self.tracker.end_session()
+        with open(self.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+    def pytest_terminal_summary(self, terminalreporter):
+        flagged = [record for record in self.tracker.records if record['flagged']]
+        terminalreporter.write_sep('-', f"memory profile: {self.output}")
+        terminalreporter.write_line(
+            f"{len(flagged)} of {len(self.tracker.records)} test(s) retained more than "
+            f"{self.tracker.threshold / 1024:g} KiB"
+        )
+        for record in flagged:
+            terminalreporter.write_line(f"  {record['retained_kb']:>10.1f} KiB  {record['nodeid']}")
+
+
+def pytest_configure(config):
+    if config.getoption('memprofile'):
+        config.pluginmanager.register(MemoryPlugin(config), 'api-memprofile')
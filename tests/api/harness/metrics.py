@@ -0,0 +1,292 @@
+"""
+OpenMetrics exposition of suite performance metrics
+Counts requests sent through api_session, their latency, bytes transferred and
+test durations, labelled by API key (API_ENDPOINTS), method, route template
+and status class, and exposes them in OpenMetrics text format
+
+Usage:
+    pytest --metrics-file=metrics.txt              # written at session end
+    pytest -m smoke --soak-duration 4h --metrics-port 9464   # scraped at /metrics
+"""
+
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+import pytest
+import requests
+
+from harness.standin import ROUTE_APIS, route_template
+from harness.upload import StreamedBody
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+# Latency buckets in seconds, covering cached GETs up to /delay endpoints
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# name: (type, unit, help)
+FAMILIES = {
+    'api_requests': ('counter', '', 'Requests sent through api_session'),
+    'api_request_duration_seconds': ('histogram', 'seconds', 'Time until the response headers were received'),
+    'api_request_sent_bytes': ('counter', 'bytes', 'Request body bytes sent'),
+    'api_response_received_bytes': ('counter', 'bytes', 'Response body bytes received'),
+    'pytest_test_duration_seconds': ('histogram', 'seconds', 'Test call durations (setup durations for errors and skips)'),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def status_class(response: Optional[requests.Response]) -> str:
+    """'2xx', '4xx', ... or 'error' when no response was received"""
+    return 'error' if response is None else f"{response.status_code // 100}xx"
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.sum += value
+        self.count += 1
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms rendered as OpenMetrics text"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, _Histogram]] = {}
+
+    def inc(self, name: str, labels: Labels, value: float = 1) -> None:
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[labels] = series.get(labels, 0) + value
+
+    def observe(self, name: str, labels: Labels, value: float, buckets: Sequence[float]) -> None:
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(labels)
+            if histogram is None:
+                histogram = series[labels] = _Histogram(buckets)
+            histogram.observe(value)
+
+    def value(self, name: str, **labels) -> float:
+        """Sum of a counter (or histogram count) over series matching the given labels"""
+        wanted = set(labels.items())
+        with self._lock:
+            if name in self._counters:
+                return sum(v for key, v in self._counters[name].items() if wanted <= set(key))
+            return sum(h.count for key, h in self._histograms.get(name, {}).items() if wanted <= set(key))
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name, (kind, unit, help_text) in FAMILIES.items():
+                lines.append(f"# TYPE {name} {kind}")
+                if unit:
+                    lines.append(f"# UNIT {name} {unit}")
+                lines.append(f"# HELP {name} {help_text}")
+                if kind == 'counter':
+                    for labels, value in sorted(self._counters.get(name, {}).items()):
+                        lines.append(f"{name}_total{_format_labels(labels)} {_format_value(value)}")
+                    continue
+                for labels, histogram in sorted(self._histograms.get(name, {}).items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        bucket = labels + (('le', repr(float(bound))),)
+                        lines.append(f"{name}_bucket{_format_labels(bucket)} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(histogram.sum)}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+
+class RequestMetrics:
+    """Records api_session traffic into a registry with low-cardinality labels"""
+
+    def __init__(self, registry: MetricsRegistry, endpoints: Optional[Dict[str, str]] = None):
+        self.registry = registry
+        self.endpoints: Dict[str, str] = {}
+        if endpoints:
+            self.set_endpoints(endpoints)
+
+    def set_endpoints(self, endpoints: Dict[str, str]) -> None:
+        """API keys per base URL, longest first; keys sharing a base URL (a stand-in) are split by route"""
+        bases: Dict[str, List[str]] = {}
+        for key, url in endpoints.items():
+            bases.setdefault(url.rstrip('/'), []).append(key)
+        self.endpoints = dict(sorted(bases.items(), key=lambda item: -len(item[0])))
+
+    def labels(self, method: str, url: str) -> Tuple[str, str, str]:
+        """(api, method, route) for a request URL"""
+        parts = urlsplit(url)
+        route = route_template(parts.path or '/')
+        api = parts.hostname or ''
+        for base, keys in self.endpoints.items():
+            if url.startswith(base) and url[len(base):len(base) + 1] in ('', '/', '?'):
+                api = ROUTE_APIS.get(route) if ROUTE_APIS.get(route) in keys else keys[0]
+                break
+        return api, method, route
+
+    def record(self, request: requests.PreparedRequest, response: Optional[requests.Response],
+               seconds: float, streamed: bool = False) -> None:
+        api, method, route = self.labels(request.method, request.url)
+        base = (('api', api), ('method', method), ('route', route))
+        self.registry.inc('api_requests', base + (('status_class', status_class(response)),))
+        self.registry.observe('api_request_duration_seconds', base, seconds, LATENCY_BUCKETS)
+
+        body = request.body
+        if isinstance(body, str):
+            body = body.encode()
+        if isinstance(body, bytes):
+            self.registry.inc('api_request_sent_bytes', base, len(body))
+        elif isinstance(body, StreamedBody):
+            # Streamed bodies count the bytes they have sent
+            self.registry.inc('api_request_sent_bytes', base, body.sent)
+        if response is not None:
+            if streamed:
+                received = int(response.headers.get('Content-Length') or 0)
+            else:
+                received = len(response.content)
+            self.registry.inc('api_response_received_bytes', base, received)
+
+    def instrument(self, session: requests.Session) -> requests.Session:
+        """Wrap session.send so every request, including failed ones, is recorded"""
+        send = session.send
+
+        def measured_send(request, **kwargs):
+            started = time.perf_counter()
+            try:
+                response = send(request, **kwargs)
+            except requests.RequestException:
+                self.record(request, None, time.perf_counter() - started)
+                raise
+            self.record(request, response, response.elapsed.total_seconds(), kwargs.get('stream', False))
+            return response
+
+        session.send = measured_send
+        return session
+
+
+class _ScrapeHandler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry = None
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+def serve(registry: MetricsRegistry, port: int, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+    """Expose the registry at http://host:port/metrics from a daemon thread"""
+    handler = type('ScrapeHandler', (_ScrapeHandler,), {'registry': registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-scrape', daemon=True).start()
+    return server
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('metrics', 'OpenMetrics exposition')
+    group.addoption('--metrics-file', default=None, metavar='PATH',
+                    help='Write OpenMetrics text to PATH at session end')
+    group.addoption('--metrics-port', type=int, default=None, metavar='PORT',
+                    help='Serve OpenMetrics text at http://127.0.0.1:PORT/metrics during the run')
+
+
+class MetricsPlugin:
+    """Collects request and test metrics for the whole session"""
+
+    def __init__(self, config):
+        self.registry = MetricsRegistry()
+        self.requests = RequestMetrics(self.registry)
+        self.path = config.getoption('metrics_file')
+        self.server = None
+        worker = os.environ.get('PYTEST_XDIST_WORKER')
+        if self.path and worker:
+            root, ext = os.path.splitext(self.path)
+            self.path = f"{root}-{worker}{ext}"
+        port = config.getoption('metrics_port')
+        if port is not None:
+            # One scrape target per xdist worker: gw0 -> PORT, gw1 -> PORT + 1, ...
+            if port and worker:
+                port += int(worker.lstrip('gw') or 0)
+            self.server = serve(self.registry, port)
+            logger.info(f"Metrics served on http://127.0.0.1:{self.server.server_port}/metrics")
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_fixture_setup(self, fixturedef, request):
+        outcome = yield
+        if outcome.excinfo is not None:
+            return
+        if fixturedef.argname == 'api_session':
+            self.requests.instrument(outcome.get_result())
+        elif fixturedef.argname == 'api_endpoints':
+            self.requests.set_endpoints(outcome.get_result())
+
+    def pytest_runtest_logreport(self, report):
+        if report.when == 'call' or (report.when == 'setup' and not report.passed):
+            module = report.nodeid.split('::')[0]
+            self.registry.observe(
+                'pytest_test_duration_seconds', (('module', module), ('outcome', report.outcome)),
+                report.duration, DURATION_BUCKETS
+            )
+
+    def pytest_sessionfinish(self, session):
+        if self.path:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'w') as f:
+                f.write(self.registry.render())
+            logger.info(f"Metrics written to {self.path}")
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+def pytest_configure(config):
+    if config.getoption('metrics_file') or config.getoption('metrics_port') is not None:
+        config.pluginmanager.register(MetricsPlugin(config), 'api-metrics')
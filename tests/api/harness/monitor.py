@@ -0,0 +1,274 @@
+"""
+Resident synthetic monitoring
+Collects the selected tests (normally -m smoke) once and re-runs them on a
+fixed schedule with jitter, reusing one warm api_session. The last N results
+per test and the last N latencies per endpoint are kept in fixed-size deques,
+and a JSON Lines alert record is written only when a check changes state.
+Between cycles the process blocks on an Event, so it uses no CPU while idle.
+
+Usage:
+    pytest -m smoke --monitor 60 --monitor-file alerts.jsonl
+    pytest -m smoke --monitor 300 --monitor-jitter 0.2 --monitor-p95-ms 800 --monitor-cycles 288
+"""
+
+import json
+import logging
+import random
+import signal
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import pytest
+import requests
+
+from harness.soak import percentile
+from harness.standin import route_template
+
+logger = logging.getLogger(__name__)
+
+# p95 threshold from performance/load-test.js (http_req_duration p(95)<500)
+DEFAULT_P95_MS = 500.0
+
+UP, DOWN = 'up', 'down'
+OK, SLOW = 'ok', 'slow'
+
+# Failure text kept per alert
+MAX_DETAIL = 300
+
+
+class Monitor:
+    """
+    Rolling windows and check states
+    A test check goes down after `fail_after` consecutive failures and back up
+    after as many consecutive passes. A latency check is slow while the p95 of
+    its endpoint's last `window` responses exceeds p95_ms.
+    """
+
+    def __init__(self, window: int = 20, fail_after: int = 2, p95_ms: float = DEFAULT_P95_MS):
+        self.window = window
+        self.fail_after = fail_after
+        self.p95_ms = p95_ms
+        # Latency checks need this many samples before they are judged
+        self.min_samples = min(5, window)
+        self.results: Dict[str, Deque[bool]] = {}
+        self.details: Dict[str, str] = {}
+        self.latencies: Dict[str, Deque[float]] = {}
+        self.states: Dict[Tuple[str, str], str] = {}
+
+    def record_test(self, nodeid: str, passed: bool, detail: str = '') -> None:
+        self.results.setdefault(nodeid, deque(maxlen=self.window)).append(passed)
+        if not passed:
+            self.details[nodeid] = detail[:MAX_DETAIL]
+
+    def record_latency(self, endpoint: str, latency_ms: float) -> None:
+        self.latencies.setdefault(endpoint, deque(maxlen=self.window)).append(latency_ms)
+
+    def availability(self, nodeid: str) -> Optional[float]:
+        results = self.results.get(nodeid)
+        return sum(results) / len(results) if results else None
+
+    def p95(self, endpoint: str) -> Optional[float]:
+        return percentile(list(self.latencies.get(endpoint, ())), 95)
+
+    def _test_state(self, nodeid: str) -> str:
+        current = self.states.get(('test', nodeid), UP)
+        recent = list(self.results[nodeid])[-self.fail_after:]
+        if len(recent) < self.fail_after:
+            return current
+        if current == UP and not any(recent):
+            return DOWN
+        if current == DOWN and all(recent):
+            return UP
+        return current
+
+    def _latency_state(self, endpoint: str) -> str:
+        if len(self.latencies[endpoint]) < self.min_samples:
+            return self.states.get(('latency', endpoint), OK)
+        return SLOW if self.p95(endpoint) > self.p95_ms else OK
+
+    def evaluate(self, cycle: int) -> List[dict]:
+        """Update every check; returns one alert record per state change"""
+        alerts = []
+        now = time.time()
+        for nodeid in self.results:
+            state = self._test_state(nodeid)
+            previous = self.states.get(('test', nodeid), UP)
+            self.states[('test', nodeid)] = state
+            if state != previous:
+                alert = {
+                    'timestamp': round(now, 3), 'cycle': cycle, 'check': 'test', 'name': nodeid,
+                    'from': previous, 'to': state, 'availability': round(self.availability(nodeid), 3),
+                }
+                if state == DOWN:
+                    alert['detail'] = self.details.get(nodeid, '')
+                alerts.append(alert)
+        for endpoint in self.latencies:
+            state = self._latency_state(endpoint)
+            previous = self.states.get(('latency', endpoint), OK)
+            self.states[('latency', endpoint)] = state
+            if state != previous:
+                alerts.append({
+                    'timestamp': round(now, 3), 'cycle': cycle, 'check': 'latency', 'name': endpoint,
+                    'from': previous, 'to': state, 'p95_ms': round(self.p95(endpoint), 2),
+                    'threshold_ms': self.p95_ms,
+                })
+        return alerts
+
+    def failing(self) -> List[str]:
+        return [name for (_, name), state in self.states.items() if state in (DOWN, SLOW)]
+
+
+def next_start(origin: float, interval: float, jitter: float, now: float,
+               rng: Optional[random.Random] = None) -> float:
+    """
+    Start of the next schedule slot after now, shifted by up to jitter * interval
+    Slots stay anchored to origin, so delays never accumulate and slots missed
+    by an overrunning cycle are skipped.
+    """
+    slot = int((now - origin) // interval) + 1
+    return origin + slot * interval + (rng or random).uniform(0, jitter * interval)
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('monitor', 'Synthetic monitoring')
+    group.addoption('--monitor', type=float, default=None, metavar='SECONDS',
+                    help='Re-run the selected tests every SECONDS on one warm session until interrupted')
+    group.addoption('--monitor-jitter', type=float, default=0.1, metavar='FRACTION',
+                    help='Random delay of each cycle, as a fraction of the interval (default: 0.1)')
+    group.addoption('--monitor-cycles', type=int, default=None, metavar='N',
+                    help='Stop after N cycles (default: run until interrupted)')
+    group.addoption('--monitor-window', type=int, default=20, metavar='N',
+                    help='Results per test and latencies per endpoint kept for the checks (default: 20)')
+    group.addoption('--monitor-fail-after', type=int, default=2, metavar='N',
+                    help='Consecutive failures before a test is down, passes before it is up (default: 2)')
+    group.addoption('--monitor-p95-ms', type=float, default=DEFAULT_P95_MS,
+                    help=f'Endpoint p95 latency above which it is slow (default: {DEFAULT_P95_MS:g})')
+    group.addoption('--monitor-file', default='monitor-alerts.jsonl',
+                    help='State change records, one JSON object per line (default: monitor-alerts.jsonl)')
+
+
+class MonitorPlugin:
+    """Replaces the run loop with a scheduled one that keeps session fixtures alive"""
+
+    def __init__(self, config):
+        self.interval = config.getoption('monitor')
+        if self.interval <= 0:
+            raise pytest.UsageError('--monitor needs a positive interval in seconds')
+        self.jitter = config.getoption('monitor_jitter')
+        self.cycles = config.getoption('monitor_cycles')
+        self.path = config.getoption('monitor_file')
+        self.monitor = Monitor(config.getoption('monitor_window'), config.getoption('monitor_fail_after'),
+                               config.getoption('monitor_p95_ms'))
+        self.stop = threading.Event()
+        self.cycle = 0
+        self.alerts = 0
+        self.failures: Dict[str, str] = {}
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_fixture_setup(self, fixturedef, request):
+        outcome = yield
+        if fixturedef.argname == 'api_session' and outcome.excinfo is None:
+            outcome.get_result().hooks['response'].append(self._on_response)
+
+    def _on_response(self, response, *args, **kwargs):
+        path = requests.utils.urlparse(response.request.url).path or '/'
+        key = f"{response.request.method} {route_template(path)}"
+        self.monitor.record_latency(key, response.elapsed.total_seconds() * 1000)
+
+    def pytest_runtest_logreport(self, report):
+        if report.failed:
+            crash = getattr(report.longrepr, 'reprcrash', None)
+            self.failures.setdefault(report.nodeid, crash.message if crash else report.longreprtext)
+        if report.when == 'teardown':
+            detail = self.failures.pop(report.nodeid, None)
+            if not report.skipped:
+                self.monitor.record_test(report.nodeid, detail is None, detail or '')
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_runtestloop(self, session):
+        if session.config.option.collectonly or not session.items:
+            return None
+
+        items = session.items
+        reporter = session.config.pluginmanager.get_plugin('terminalreporter')
+        origin = time.time()
+        # SIGTERM (e.g. a container stop) ends the monitor after the current cycle
+        previous_handler = signal.signal(signal.SIGTERM, lambda signum, frame: self.stop.set())
+        try:
+            self._loop(session, items, reporter, origin)
+        finally:
+            signal.signal(signal.SIGTERM, previous_handler)
+        return True
+
+    def _loop(self, session, items, reporter, origin: float) -> None:
+        with open(self.path, 'a') as alerts:
+            while True:
+                self.cycle += 1
+                last_cycle = self.stop.is_set() or (self.cycles is not None and self.cycle >= self.cycles)
+                if reporter is not None:
+                    # Keep only the current cycle's reports, so memory stays flat
+                    reporter.stats.clear()
+                started = time.perf_counter()
+                for index, item in enumerate(items):
+                    if index + 1 < len(items):
+                        nextitem = items[index + 1]
+                    else:
+                        # Wrapping to the first item keeps session fixtures set up
+                        nextitem = None if last_cycle else items[0]
+                    if nextitem is item:
+                        nextitem = item.parent
+                    item.config.hook.pytest_runtest_protocol(item=item, nextitem=nextitem)
+                    if session.shouldfail or session.shouldstop:
+                        last_cycle = True
+                self._emit(alerts, self.monitor.evaluate(self.cycle))
+                logger.info(f"Monitor cycle {self.cycle} took {time.perf_counter() - started:.2f} s")
+                if last_cycle:
+                    break
+                # Block until the next slot; no polling, so an idle monitor uses no CPU
+                self.stop.wait(max(0.0, next_start(origin, self.interval, self.jitter, time.time()) - time.time()))
+                if self.stop.is_set():
+                    break
+
+    def _emit(self, alerts, records: List[dict]) -> None:
+        for record in records:
+            self.alerts += 1
+            alerts.write(json.dumps(record) + '\n')
+            log = logger.warning if record['to'] in (DOWN, SLOW) else logger.info
+            log(f"Monitor: {record['check']} {record['name']} is {record['to'].upper()} (was {record['from']})")
+        if records:
+            alerts.flush()
+
+    def pytest_sessionfinish(self, session):
+        if session.exitstatus != pytest.ExitCode.INTERRUPTED:
+            # The exit status reflects the final state, not every failure seen since start
+            failing = self.monitor.failing()
+            session.exitstatus = pytest.ExitCode.TESTS_FAILED if failing else pytest.ExitCode.OK
+
+    def pytest_terminal_summary(self, terminalreporter):
+        terminalreporter.write_sep('-', f"monitor: {self.cycle} cycle(s), {self.alerts} alert(s) in {self.path}")
+        for (check, name), state in sorted(self.monitor.states.items()):
+            if check == 'test':
+                figure = f"availability {self.monitor.availability(name):.1%}"
+            else:
+                figure = f"p95 {self.monitor.p95(name):.1f} ms"
+            terminalreporter.write_line(f"{state.upper():>5}  {figure:<22} {name}")
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    if config.getoption('monitor') is None:
+        return
+    if config.pluginmanager.hasplugin('xdist') and getattr(config.option, 'numprocesses', None):
+        raise pytest.UsageError('The monitor runs on a single warm session; do not combine it with -n')
+    for option in ('soak_duration', 'soak_iterations', 'compare'):
+        if config.getoption(option, None):
+            raise pytest.UsageError('--monitor drives the run loop; do not combine it with soak or compare mode')
+    # The HTML and JSON reports hold every result in memory until exit; the
+    # alert file is the monitor's output
+    if getattr(config.option, 'htmlpath', None):
+        config.option.htmlpath = None
+    if getattr(config.option, 'json_report', False):
+        config.option.json_report = False
+    config.pluginmanager.register(MonitorPlugin(config), 'api-monitor')
@@ -0,0 +1,222 @@
+"""
+Opt-in per-test CPU profiling plugin
+Samples the test thread's Python stack while it is on-CPU and writes a
+collapsed-stack file (flamegraph.pl / speedscope input) plus a top-N table per test
+
+Usage:
+    pytest --profile -m performance
+    pytest --profile --profile-match test_response_headers --profile-dir profiles
+"""
+
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+import pytest
+
+logger = logging.getLogger(__name__)
+
+# Leaf frames that mean the thread is blocked rather than running, used when
+# the platform has no per-thread CPU clock
+BLOCKING_LEAVES = {
+    ('socket.py', 'readinto'),
+    ('socket.py', 'create_connection'),
+    ('socket.py', 'getaddrinfo'),
+    ('ssl.py', 'read'),
+    ('ssl.py', 'recv_into'),
+    ('ssl.py', 'do_handshake'),
+    ('selectors.py', 'select'),
+    ('connection.py', 'create_connection'),
+    ('rate_limit.py', 'acquire'),
+}
+
+PHASES = ('setup', 'call', 'teardown')
+
+
+def _frame_label(code) -> str:
+    path = code.co_filename.replace('\\', '/').split('/')
+    return f"{code.co_name} ({'/'.join(path[-2:])}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Periodically samples one thread's stack from a background thread
+    Each sample is weighted by the CPU time the target thread consumed since
+    the previous sample, so time blocked on sockets or sleeps is not counted.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.phase = 'call'
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        try:
+            self._clock_id = time.pthread_getcpuclockid(thread_id)
+        except (AttributeError, OSError):
+            self._clock_id = None
+        self._last_cpu = self._cpu_time()
+
+    def _cpu_time(self) -> float:
+        return time.clock_gettime(self._clock_id) if self._clock_id is not None else 0.0
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self) -> None:
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return
+
+        if self._clock_id is not None:
+            cpu = self._cpu_time()
+            weight, self._last_cpu = cpu - self._last_cpu, cpu
+            if weight <= 0:
+                return
+        else:
+            code = frame.f_code
+            if (os.path.basename(code.co_filename), code.co_name) in BLOCKING_LEAVES:
+                return
+            weight = self.interval
+
+        codes = []
+        while frame is not None:
+            codes.append(frame.f_code)
+            frame = frame.f_back
+        codes.reverse()
+
+        # Drop the pytest runner frames above the hook for the current phase
+        hook = f"pytest_runtest_{self.phase}"
+        for index, code in enumerate(codes):
+            if code.co_name == hook and '_pytest' in code.co_filename:
+                codes = codes[index + 1:]
+                break
+
+        stack = (self.phase,) + tuple(_frame_label(code) for code in codes)
+        self.stacks[stack] += weight
+
+
+def hot_functions(stacks: Dict[Tuple[str, ...], float], top: int) -> list:
+    """Return [(label, self_seconds, total_seconds)] sorted by self time"""
+    own: Counter = Counter()
+    total: Counter = Counter()
+    for stack, weight in stacks.items():
+        own[stack[-1]] += weight
+        for label in set(stack[1:]):
+            total[label] += weight
+    return [(label, own[label], total[label]) for label, _ in own.most_common(top)]
+
+
+def write_profile(directory: str, nodeid: str, stacks: Dict[Tuple[str, ...], float],
+                  interval: float, top: int) -> str:
+    """Write <nodeid>.collapsed and <nodeid>.top.txt; returns the path stem"""
+    os.makedirs(directory, exist_ok=True)
+    stem = os.path.join(directory, re.sub(r'[^\w.-]+', '_', nodeid))
+
+    # Collapsed stacks weighted in microseconds of CPU time
+    with open(f"{stem}.collapsed", 'w') as f:
+        for stack, weight in sorted(stacks.items()):
+            f.write(f"{';'.join(stack)} {max(1, int(weight * 1e6))}\n")
+
+    with open(f"{stem}.top.txt", 'w') as f:
+        f.write(f"CPU profile: {nodeid}\n")
+        f.write(f"Sampled CPU time: {sum(stacks.values()) * 1000:.1f} ms "
+                f"(interval {interval * 1000:g} ms, off-CPU time excluded)\n\n")
+        f.write(f"{'self ms':>10} {'total ms':>10}  function\n")
+        for label, own, total in hot_functions(stacks, top):
+            f.write(f"{own * 1000:>10.2f} {total * 1000:>10.2f}  {label}\n")
+    return stem
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('profiling', 'Per-test CPU profiling')
+    group.addoption('--profile', action='store_true', default=False,
+                    help='Sample CPU stacks of selected tests (default: performance marker)')
+    group.addoption('--profile-marker', action='append', default=[], metavar='NAME',
+                    help='Profile tests carrying this marker (repeatable)')
+    group.addoption('--profile-match', action='append', default=[], metavar='SUBSTR',
+                    help='Profile tests whose node id contains SUBSTR (repeatable)')
+    group.addoption('--profile-dir', default='profiles',
+                    help='Directory for .collapsed and .top.txt files (default: profiles)')
+    group.addoption('--profile-interval', type=float, default=5.0, metavar='MS',
+                    help='Sampling interval in milliseconds (default: 5)')
+    group.addoption('--profile-top', type=int, default=25,
+                    help='Number of rows in the hot-function table (default: 25)')
+
+
+class ProfilingPlugin:
+    """Starts a sampler for selected tests and writes its output after teardown"""
+
+    def __init__(self, config):
+        self.markers = config.getoption('profile_marker')
+        self.matches = config.getoption('profile_match')
+        if not self.markers and not self.matches:
+            self.markers = ['performance']
+        self.directory = config.getoption('profile_dir')
+        self.interval = config.getoption('profile_interval') / 1000.0
+        self.top = config.getoption('profile_top')
+        self.samplers: Dict[str, StackSampler] = {}
+        self.written = 0
+
+    def selected(self, item) -> bool:
+        return (any(item.get_closest_marker(name) for name in self.markers)
+                or any(match in item.nodeid for match in self.matches))
+
+    def _phase(self, item, phase):
+        sampler = self.samplers.get(item.nodeid)
+        if sampler is None and phase == 'setup' and self.selected(item):
+            sampler = StackSampler(threading.get_ident(), self.interval)
+            self.samplers[item.nodeid] = sampler
+            sampler.start()
+        if sampler is not None:
+            sampler.phase = phase
+        return sampler
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_setup(self, item):
+        self._phase(item, 'setup')
+        yield
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_call(self, item):
+        self._phase(item, 'call')
+        yield
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_teardown(self, item):
+        sampler = self._phase(item, 'teardown')
+        yield
+        if sampler is None:
+            return
+        sampler.stop()
+        del self.samplers[item.nodeid]
+        stem = write_profile(self.directory, item.nodeid, sampler.stacks, self.interval, self.top)
+        self.written += 1
+        logger.info(f"Profile written: {stem}.collapsed")
+
+    def pytest_terminal_summary(self, terminalreporter):
+        if self.written:
+            terminalreporter.write_line(
+                f"CPU profiles for {self.written} test(s) written to {self.directory}/"
+            )
+
+
+def pytest_configure(config):
+    if config.getoption('profile'):
+        config.pluginmanager.register(ProfilingPlugin(config), 'api-profiling')
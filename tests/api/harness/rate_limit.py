@@ -0,0 +1,166 @@
+"""
+Token-bucket rate limiting for the shared API session
+Enforces the per-host request ceilings from perf-plan.md across threads,
+asyncio tasks and pytest worker processes
+"""
+
+import asyncio
+import os
+import struct
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+from harness.filelock import lock, unlock
+
+# Public APIs must not see more than 1 request per second (see load-test.js)
+DEFAULT_RATE = 1.0
+
+DEFAULT_STATE_DIR = os.path.join(tempfile.gettempdir(), 'qa-api-ratelimit')
+
+# Bucket state on disk: available tokens, timestamp of last update
+_STATE = struct.Struct('<dd')
+
+
+class TokenBucket:
+    """
+    Token bucket whose state lives in a small file-locked file
+    Every process that opens the same file shares the same bucket.
+    Callers reserve a slot and wait exactly until it is due, so concurrent
+    callers are served in arrival order instead of polling with sleeps.
+    """
+
+    def __init__(self, name: str, rate: float, capacity: Optional[float] = None,
+                 state_dir: str = DEFAULT_STATE_DIR):
+        if rate <= 0:
+            raise ValueError(f"Rate for '{name}' must be positive, got {rate}")
+        self.name = name
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else 1.0
+        os.makedirs(state_dir, exist_ok=True)
+        self.path = os.path.join(state_dir, f"{name}.bucket")
+        self._thread_lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take one token and return the number of seconds to wait before using it"""
+        with self._thread_lock:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                lock(fd)
+                try:
+                    now = time.time()
+                    raw = _read(fd)
+                    if len(raw) == _STATE.size:
+                        tokens, stamp = _STATE.unpack(raw)
+                        tokens = min(self.capacity, tokens + max(0.0, now - stamp) * self.rate)
+                    else:
+                        tokens = self.capacity
+
+                    # Tokens may go negative: the debt is the queue of callers
+                    # already waiting for their slot
+                    tokens -= 1.0
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    os.write(fd, _STATE.pack(tokens, now))
+                finally:
+                    unlock(fd)
+            finally:
+                os.close(fd)
+
+        return 0.0 if tokens >= 0 else -tokens / self.rate
+
+    def acquire(self) -> float:
+        """Block the calling thread until a token is available; returns time waited"""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self) -> float:
+        """Asyncio variant of acquire() that yields to the event loop while queued"""
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+
+class RateLimiter:
+    """Routes requests to the token bucket configured for their host"""
+
+    def __init__(self, buckets: Dict[str, TokenBucket]):
+        # Keyed by network location, e.g. 'reqres.in'
+        self.buckets = buckets
+
+    @classmethod
+    def from_endpoints(cls, endpoints: Dict[str, str], limits: Dict[str, float],
+                       state_dir: str = DEFAULT_STATE_DIR) -> 'RateLimiter':
+        """
+        Build one bucket per API_ENDPOINTS key that has a configured limit
+        Hosts without a limit are not throttled.
+        """
+        buckets = {}
+        for key, base_url in endpoints.items():
+            rate = limits.get(key)
+            if rate is not None:
+                buckets[urlsplit(base_url).netloc] = TokenBucket(key, rate, state_dir=state_dir)
+        return cls(buckets)
+
+    def bucket_for(self, url: str) -> Optional[TokenBucket]:
+        return self.buckets.get(urlsplit(url).netloc)
+
+    def acquire(self, url: str) -> float:
+        bucket = self.bucket_for(url)
+        return bucket.acquire() if bucket else 0.0
+
+    async def acquire_async(self, url: str) -> float:
+        bucket = self.bucket_for(url)
+        return await bucket.acquire_async() if bucket else 0.0
+
+
+def throttle(session: requests.Session, limiter: RateLimiter) -> requests.Session:
+    """
+    Wrap session.send so every request, redirects included, waits for its token
+    The wait happens before requests starts timing the exchange, so
+    response.elapsed never includes time spent queued for the limiter. Its
+    perf_counter_ns() bounds are left on request.rate_limit_wait_ns (None when
+    the request went straight through) for wrappers timing the whole send.
+    """
+    send = session.send
+
+    def throttled_send(request, **kwargs):
+        started = time.perf_counter_ns()
+        waited = limiter.acquire(request.url)
+        request.rate_limit_wait_ns = (started, time.perf_counter_ns()) if waited > 0 else None
+        return send(request, **kwargs)
+
+    session.send = throttled_send
+    return session
+
+
+def parse_limits(values, known: Optional[Iterable[str]] = None) -> Dict[str, float]:
+    """
+    Parse '--rate-limit key=rps' option values into a dict
+    With known, keys outside it are rejected (a typo would silently not throttle);
+    rates must be positive (use --no-rate-limit to disable throttling).
+    """
+    limits = {}
+    for value in values or []:
+        key, sep, rate = value.partition('=')
+        if not sep:
+            raise ValueError(f"Expected KEY=RPS, got '{value}'")
+        key = key.strip()
+        if known is not None and key not in known:
+            raise ValueError(f"Unknown rate limit key '{key}', expected one of: {', '.join(sorted(known))}")
+        limits[key] = float(rate)
+        if not limits[key] > 0:
+            raise ValueError(f"Rate for '{key}' must be positive, got {rate.strip()}")
+    return limits
+
+
+def _read(fd: int) -> bytes:
+    os.lseek(fd, 0, os.SEEK_SET)
+    return os.read(fd, _STATE.size)
+
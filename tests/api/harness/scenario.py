@@ -0,0 +1,269 @@
+"""
+Declarative multi-step CRUD scenarios
+A scenario is an ordered list of steps (e.g. POST user, PUT, PATCH, DELETE) whose
+paths and payloads are templates filled from the workflow context; values
+extracted from one response (such as the created id) flow into later steps.
+Many workflow instances run concurrently with a bounded number in flight,
+recording per-step and end-to-end latency.
+
+Usage:
+    python -m harness.scenario user-lifecycle --standin=data/bench-1m.qads --instances 5000 --concurrency 64
+    python -m harness.scenario post-lifecycle --base-url http://127.0.0.1:8080 --instances 1000
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from harness.soak import percentile
+
+# Error messages kept per result; the failure counts are always complete
+MAX_ERRORS = 20
+
+
+@dataclass
+class Step:
+    """One request of a scenario; '{name}' placeholders are filled from the context"""
+
+    name: str
+    method: str
+    path: str
+    json: Any = None
+    expect: Union[int, Tuple[int, ...]] = 200
+    # context variable -> dotted path in the response JSON, e.g. {'id': 'id'}
+    extract: Dict[str, str] = field(default_factory=dict)
+    check: Optional[Callable[[requests.Response, dict], None]] = None
+
+
+@dataclass
+class Scenario:
+    """Named workflow against one API_ENDPOINTS key"""
+
+    name: str
+    api: str
+    steps: Sequence[Step]
+
+
+USER_LIFECYCLE = Scenario('user-lifecycle', 'reqres', [
+    Step('create', 'POST', '/users', json={'name': 'QA User {instance}', 'job': 'Test Engineer'},
+         expect=201, extract={'id': 'id'}),
+    Step('update', 'PUT', '/users/{id}', json={'name': 'QA User {instance}', 'job': 'Senior Test Engineer'}),
+    Step('patch', 'PATCH', '/users/{id}', json={'job': 'QA Lead'}),
+    Step('delete', 'DELETE', '/users/{id}', expect=204),
+])
+
+# JSONPlaceholder does not persist created posts, so the workflow continues on
+# an existing post of the same user
+POST_LIFECYCLE = Scenario('post-lifecycle', 'jsonplaceholder', [
+    Step('create', 'POST', '/posts', json={'userId': 1, 'title': 'Post {instance}', 'body': 'Scenario body'},
+         expect=201, extract={'userId': 'userId'}),
+    Step('list', 'GET', '/posts?userId={userId}', extract={'id': '0.id'}),
+    Step('update', 'PUT', '/posts/{id}', json={'id': '{id}', 'userId': '{userId}', 'title': 'Updated {instance}',
+                                               'body': 'Scenario body'}),
+    Step('patch', 'PATCH', '/posts/{id}', json={'title': 'Patched {instance}'}),
+    Step('delete', 'DELETE', '/posts/{id}'),
+])
+
+SCENARIOS = {scenario.name: scenario for scenario in (USER_LIFECYCLE, POST_LIFECYCLE)}
+
+
+class StepFailed(Exception):
+    pass
+
+
+def render(template: Any, context: dict) -> Any:
+    """Fill '{name}' placeholders; a value that is a single placeholder keeps its type"""
+    if isinstance(template, str):
+        if template.startswith('{') and template.endswith('}') and template[1:-1] in context:
+            return context[template[1:-1]]
+        return template.format_map(context)
+    if isinstance(template, dict):
+        return {key: render(value, context) for key, value in template.items()}
+    if isinstance(template, list):
+        return [render(value, context) for value in template]
+    return template
+
+
+def extract(data: Any, path: str) -> Any:
+    for part in path.split('.'):
+        data = data[int(part)] if isinstance(data, list) else data[part]
+    return data
+
+
+@dataclass
+class ScenarioResult:
+    """Latencies (ms) of completed workflows and their steps, plus failure counts per step"""
+
+    scenario: str
+    instances: int
+    concurrency: int
+    wall_s: float = 0.0
+    workflow_ms: List[float] = field(default_factory=list)
+    step_ms: Dict[str, List[float]] = field(default_factory=dict)
+    failures: Dict[str, int] = field(default_factory=dict)
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def completed(self) -> int:
+        return len(self.workflow_ms)
+
+    @property
+    def failed(self) -> int:
+        return sum(self.failures.values())
+
+    @property
+    def throughput(self) -> float:
+        """Completed workflows per second"""
+        return self.completed / self.wall_s if self.wall_s else 0.0
+
+    def merge(self, other: 'ScenarioResult') -> None:
+        self.workflow_ms.extend(other.workflow_ms)
+        for name, latencies in other.step_ms.items():
+            self.step_ms.setdefault(name, []).extend(latencies)
+        for name, count in other.failures.items():
+            self.failures[name] = self.failures.get(name, 0) + count
+        self.errors.extend(other.errors[:MAX_ERRORS - len(self.errors)])
+
+    def summary(self) -> dict:
+        def stats(values: List[float]) -> dict:
+            return {
+                'count': len(values),
+                'p50_ms': _round(percentile(values, 50)),
+                'p95_ms': _round(percentile(values, 95)),
+                'p99_ms': _round(percentile(values, 99)),
+            }
+
+        return {
+            'scenario': self.scenario,
+            'instances': self.instances,
+            'concurrency': self.concurrency,
+            'completed': self.completed,
+            'failed': self.failed,
+            'wall_s': round(self.wall_s, 3),
+            'workflows_per_s': round(self.throughput, 2),
+            'workflow': stats(self.workflow_ms),
+            'steps': {name: stats(values) for name, values in self.step_ms.items()},
+            'failures': self.failures,
+            'errors': self.errors,
+        }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 2)
+
+
+class ScenarioRunner:
+    """Runs workflow instances on `concurrency` threads sharing one session"""
+
+    def __init__(self, session: requests.Session, base_url: str, timeout: float = 30.0):
+        self.session = session
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def run_once(self, scenario: Scenario, context: dict, result: ScenarioResult) -> bool:
+        """Run one workflow instance; stops at the first failing step"""
+        started = time.perf_counter()
+        for step in scenario.steps:
+            step_started = time.perf_counter()
+            try:
+                response = self.session.request(
+                    step.method, self.base_url + render(step.path, context),
+                    json=render(step.json, context), timeout=self.timeout
+                )
+                expected = step.expect if isinstance(step.expect, tuple) else (step.expect,)
+                if response.status_code not in expected:
+                    raise StepFailed(f"expected {step.expect}, got {response.status_code}")
+                for name, path in step.extract.items():
+                    context[name] = extract(response.json(), path)
+                if step.check is not None:
+                    step.check(response, context)
+            except (requests.RequestException, StepFailed, AssertionError, KeyError, IndexError, ValueError) as e:
+                result.failures[step.name] = result.failures.get(step.name, 0) + 1
+                if len(result.errors) < MAX_ERRORS:
+                    result.errors.append(f"{scenario.name}#{context['instance']} {step.name}: {e}")
+                return False
+            result.step_ms.setdefault(step.name, []).append((time.perf_counter() - step_started) * 1000)
+        result.workflow_ms.append((time.perf_counter() - started) * 1000)
+        return True
+
+    def run(self, scenario: Scenario, instances: int = 1, concurrency: int = 1, **context) -> ScenarioResult:
+        """Run `instances` workflows with at most `concurrency` in flight"""
+        total = ScenarioResult(scenario.name, instances, concurrency)
+        partials = []
+        lock = threading.Lock()
+        next_instance = iter(range(instances))
+
+        def worker():
+            partial = ScenarioResult(scenario.name, instances, concurrency)
+            partials.append(partial)
+            while True:
+                with lock:
+                    instance = next(next_instance, None)
+                if instance is None:
+                    return
+                self.run_once(scenario, dict(context, instance=instance), partial)
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker, name=f"scenario-{index}", daemon=True)
+                   for index in range(max(1, min(concurrency, instances)))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        total.wall_s = time.perf_counter() - started
+        for partial in partials:
+            total.merge(partial)
+        return total
+
+
+def pooled_session(concurrency: int) -> requests.Session:
+    """Session whose connection pool holds one connection per in-flight workflow"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=concurrency)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({'User-Agent': 'QA-Test-Suite/1.0', 'Accept': 'application/json'})
+    return session
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Run a CRUD workflow scenario at volume')
+    parser.add_argument('scenario', choices=sorted(SCENARIOS))
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--base-url', help="Base URL of the scenario's API")
+    target.add_argument('--standin', metavar='DATASET', help='Serve a generated dataset locally and run against it')
+    parser.add_argument('--instances', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=32, help='Workflows in flight (default: 32)')
+    args = parser.parse_args(argv)
+
+    scenario = SCENARIOS[args.scenario]
+    server = dataset = None
+    base_url = args.base_url
+    if args.standin:
+        from harness.dataset import Dataset
+        from harness.standin import StandInServer
+        dataset = Dataset(args.standin)
+        server = StandInServer(dataset).start()
+        base_url = server.endpoints()[scenario.api]
+
+    session = pooled_session(args.concurrency)
+    try:
+        result = ScenarioRunner(session, base_url).run(scenario, args.instances, args.concurrency)
+    finally:
+        session.close()
+        if server is not None:
+            server.stop()
+            dataset.close()
+    print(json.dumps(result.summary(), indent=2))
+    return 0 if result.failed == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,199 @@
+"""
+Normalised JSON response snapshots compared by structural hash
+A snapshot file stores only digests and the masking spec: the root digest is
+checked on every run, per-path digests are used to build a diff on mismatch
+
+Usage:
+    assert_snapshot(response.json())                        # default mask
+    assert_snapshot(data, name='page-2', mask=['data.*.avatar'])
+    pytest --snapshot-update                                # record new and changed snapshots
+"""
+
+import hashlib
+import json
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Volatile fields masked anywhere in the document unless a test overrides it
+DEFAULT_MASK = ('**.createdAt', '**.updatedAt', '**.uuid', '**.origin')
+
+MASKED = '<masked>'
+
+# Depth and node budget of the per-path digest tree stored for diffs
+DEFAULT_DEPTH = 3
+DEFAULT_BUDGET = 256
+
+
+class SnapshotMismatch(AssertionError):
+    """Raised when a response no longer matches its stored snapshot"""
+
+
+def _canonical(data) -> bytes:
+    return json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def digest(data) -> str:
+    """Structural hash of already-normalised data"""
+    return hashlib.blake2b(_canonical(data), digest_size=16).hexdigest()
+
+
+def _segments_match(pattern: Tuple[str, ...], path: Tuple[str, ...]) -> bool:
+    if not pattern:
+        return not path
+    head = pattern[0]
+    if head == '**':
+        return any(_segments_match(pattern[1:], path[i:]) for i in range(len(path) + 1))
+    if not path:
+        return False
+    return (head == '*' or head == path[0]) and _segments_match(pattern[1:], path[1:])
+
+
+class Mask:
+    """Compiled set of dotted path patterns ('*' = one segment, '**' = any depth)"""
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns = list(patterns)
+        # '**.key' is by far the common case and is matched with a set lookup
+        self.anywhere = set()
+        self.paths = []
+        for pattern in self.patterns:
+            segments = tuple(pattern.split('.'))
+            if len(segments) == 2 and segments[0] == '**' and '*' not in segments[1]:
+                self.anywhere.add(segments[1])
+            else:
+                self.paths.append(segments)
+
+    def matches(self, path: Tuple[str, ...]) -> bool:
+        if path and path[-1] in self.anywhere:
+            return True
+        return any(_segments_match(pattern, path) for pattern in self.paths)
+
+
+def normalise(data, mask: Mask, path: Tuple[str, ...] = ()):
+    """Return a copy of data with masked paths replaced by MASKED"""
+    if isinstance(data, dict):
+        return {
+            key: MASKED if mask.matches(path + (key,)) else normalise(value, mask, path + (key,))
+            for key, value in data.items()
+        }
+    if isinstance(data, list):
+        return [
+            MASKED if mask.matches(path + (str(index),)) else normalise(value, mask, path + (str(index),))
+            for index, value in enumerate(data)
+        ]
+    return data
+
+
+def digest_tree(data, depth: int = DEFAULT_DEPTH, budget: Optional[int] = None) -> Tuple[Dict[str, str], int]:
+    """
+    Digest of every node down to the given depth, keyed by dotted path ('' = root)
+    Levels are added breadth-first; a level that would exceed the node budget is
+    left out entirely so the tree stays complete. Returns (tree, depth reached).
+    """
+    tree = {'': digest(data)}
+    level = [((), data)]
+    reached = 0
+    while level and reached < depth:
+        children = []
+        for path, node in level:
+            if isinstance(node, dict):
+                children.extend((path + (str(key),), value) for key, value in node.items())
+            elif isinstance(node, list):
+                children.extend((path + (str(index),), value) for index, value in enumerate(node))
+        if not children or (budget is not None and len(tree) + len(children) > budget):
+            break
+        for path, node in children:
+            tree['.'.join(path)] = digest(node)
+        level = children
+        reached += 1
+    return tree, reached
+
+
+def _lookup(data, path: str):
+    for segment in path.split('.') if path else []:
+        data = data[int(segment)] if isinstance(data, list) else data[segment]
+    return data
+
+
+def structural_diff(expected: Dict[str, str], actual: Dict[str, str], data=None,
+                    limit: int = 20) -> List[str]:
+    """Describe the most specific differing paths between two digest trees"""
+    changed = [path for path in expected if path in actual and expected[path] != actual[path]]
+    removed = [path for path in expected if path not in actual]
+    added = [path for path in actual if path not in expected]
+
+    # A changed parent is implied by any changed, added or removed child
+    differing = set(changed) | set(removed) | set(added)
+    leaves = [
+        path for path in changed
+        if not any(other != path and (path == '' or other.startswith(path + '.')) for other in differing)
+    ]
+
+    lines = []
+    for kind, paths in (('changed', leaves), ('removed', removed), ('added', added)):
+        for path in sorted(paths):
+            line = f"{kind}: {path or '<root>'}"
+            if data is not None and kind != 'removed':
+                preview = json.dumps(_lookup(data, path), sort_keys=True)
+                line += f" (now {preview[:80]}{'...' if len(preview) > 80 else ''})"
+            lines.append(line)
+    if len(lines) > limit:
+        lines = lines[:limit] + [f"... {len(lines) - limit} more difference(s)"]
+    return lines
+
+
+class SnapshotStore:
+    """Reads and writes one small JSON file per snapshot under a directory"""
+
+    def __init__(self, directory: str, update: bool = False, depth: int = DEFAULT_DEPTH,
+                 budget: int = DEFAULT_BUDGET):
+        self.directory = directory
+        self.update = update
+        self.depth = depth
+        self.budget = budget
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, re.sub(r'[^\w./-]+', '_', key) + '.json')
+
+    def _write(self, path: str, normalised, mask: Mask) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tree, depth = digest_tree(normalised, self.depth, self.budget)
+        record = {
+            'digest': tree[''],
+            'mask': mask.patterns,
+            'depth': depth,
+            'tree': tree,
+        }
+        with open(path, 'w') as f:
+            json.dump(record, f, indent=1, sort_keys=True)
+
+    def check(self, key: str, data, mask: Optional[Iterable[str]] = None) -> str:
+        """Compare data against the stored snapshot; returns the current digest"""
+        path = self.path_for(key)
+        stored = None
+        if os.path.exists(path):
+            with open(path) as f:
+                stored = json.load(f)
+
+        if stored is None and not self.update:
+            raise SnapshotMismatch(f"No snapshot stored for '{key}'; run pytest --snapshot-update")
+
+        if self.update:
+            compiled = Mask(DEFAULT_MASK if mask is None else mask)
+            normalised = normalise(data, compiled)
+            current = digest(normalised)
+            # Matching snapshots are left untouched, so updates only show real changes
+            if stored is None or stored['digest'] != current or stored['mask'] != compiled.patterns:
+                self._write(path, normalised, compiled)
+            return current
+
+        # The stored masking spec is authoritative when verifying
+        normalised = normalise(data, Mask(stored['mask']))
+        current = digest(normalised)
+        if current != stored['digest']:
+            actual, _ = digest_tree(normalised, stored['depth'])
+            lines = structural_diff(stored['tree'], actual, normalised)
+            raise SnapshotMismatch(f"Snapshot '{key}' does not match:\n  " + '\n  '.join(lines))
+        return current
+
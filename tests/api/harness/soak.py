@@ -0,0 +1,283 @@
+"""
+Soak mode: repeat the selected tests on one long-lived api_session
+Samples latency percentiles, open sockets, file descriptors and RSS per interval,
+writes them to a CSV time series and fails the run on sustained upward drift
+
+Usage:
+    pytest -m smoke --soak-duration 4h --soak-interval 60
+    pytest -m smoke --soak-iterations 500 --soak-file soak.csv
+"""
+
+import csv
+import logging
+import math
+import os
+import re
+import time
+from typing import Dict, List, Optional, Sequence
+
+import pytest
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+# Series checked for upward drift at the end of the soak
+TREND_SERIES = ('p95_ms', 'open_sockets', 'open_fds', 'rss_kb')
+
+_DURATION = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([smhd]?)\s*$')
+_UNITS = {'': 1, 's': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_duration(value: str) -> float:
+    """Parse '90', '90s', '30m', '4h' or '1d' into seconds"""
+    match = _DURATION.match(value)
+    if not match:
+        raise ValueError(f"Invalid duration '{value}' (expected e.g. 90s, 30m, 4h)")
+    return float(match.group(1)) * _UNITS[match.group(2)]
+
+
+def percentile(values: Sequence[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile; None for an empty sequence"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def mann_kendall(series: Sequence[float]) -> Dict[str, float]:
+    """
+    One-sided Mann-Kendall test for an increasing monotonic trend
+    Returns the S statistic, z score and p-value (normal approximation).
+    """
+    n = len(series)
+    s = 0
+    for i in range(n - 1):
+        for j in range(i + 1, n):
+            diff = series[j] - series[i]
+            s += (diff > 0) - (diff < 0)
+    variance = n * (n - 1) * (2 * n + 5) / 18.0
+    if s > 0:
+        z = (s - 1) / math.sqrt(variance)
+    elif s < 0:
+        z = (s + 1) / math.sqrt(variance)
+    else:
+        z = 0.0
+    p_value = 0.5 * math.erfc(z / math.sqrt(2))
+    return {'s': s, 'z': z, 'p': p_value}
+
+
+def sens_slope(series: Sequence[float]) -> float:
+    """Median of pairwise slopes per sample; robust to outliers"""
+    slopes = [
+        (series[j] - series[i]) / (j - i)
+        for i in range(len(series) - 1) for j in range(i + 1, len(series))
+    ]
+    ordered = sorted(slopes)
+    mid = len(ordered) // 2
+    if not ordered:
+        return 0.0
+    return ordered[mid] if len(ordered) % 2 else (ordered[mid - 1] + ordered[mid]) / 2
+
+
+def detect_drift(series: Sequence[float], alpha: float = 0.01, tolerance: float = 0.10,
+                 min_samples: int = 8) -> Dict[str, object]:
+    """
+    Flag sustained upward drift: significant Mann-Kendall trend whose Sen's-slope
+    growth over the whole window exceeds `tolerance` relative to the median level
+    """
+    values = [value for value in series if value is not None]
+    if len(values) < min_samples:
+        return {'verdict': 'insufficient', 'samples': len(values)}
+    test = mann_kendall(values)
+    slope = sens_slope(values)
+    level = sorted(values)[len(values) // 2] or 1.0
+    growth = slope * (len(values) - 1) / abs(level)
+    drifting = test['p'] < alpha and growth > tolerance
+    return {
+        'verdict': 'drift' if drifting else 'stable',
+        'samples': len(values),
+        'p_value': round(test['p'], 6),
+        'relative_growth': round(growth, 4),
+    }
+
+
+def resource_usage() -> Dict[str, Optional[int]]:
+    """Open sockets, open file descriptors and RSS (KiB) of this process"""
+    if psutil is not None:
+        process = psutil.Process()
+        fds = process.num_fds() if hasattr(process, 'num_fds') else process.num_handles()
+        connections = getattr(process, 'net_connections', None) or process.connections
+        return {
+            'open_sockets': len(connections(kind='inet')),
+            'open_fds': fds,
+            'rss_kb': process.memory_info().rss // 1024,
+        }
+
+    usage = {'open_sockets': None, 'open_fds': None, 'rss_kb': None}
+    if os.path.isdir('/proc/self/fd'):
+        targets = []
+        for fd in os.listdir('/proc/self/fd'):
+            try:
+                targets.append(os.readlink(f'/proc/self/fd/{fd}'))
+            except OSError:
+                continue
+        usage['open_fds'] = len(targets)
+        usage['open_sockets'] = sum(target.startswith('socket:') for target in targets)
+    if os.path.exists('/proc/self/statm'):
+        with open('/proc/self/statm') as f:
+            usage['rss_kb'] = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    return usage
+
+
+class SoakRecorder:
+    """Collects request latencies and writes one time-series row per interval"""
+
+    COLUMNS = ('timestamp', 'elapsed_s', 'iteration', 'requests', 'errors',
+               'p50_ms', 'p95_ms', 'p99_ms', 'open_sockets', 'open_fds', 'rss_kb')
+
+    def __init__(self, path: str, interval: float):
+        self.path = path
+        self.interval = interval
+        self.rows: List[dict] = []
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.started = time.time()
+        self.next_sample = self.started + interval
+        self._file = open(path, 'w', newline='')
+        self._writer = csv.DictWriter(self._file, fieldnames=self.COLUMNS)
+        self._writer.writeheader()
+
+    def on_response(self, response, *args, **kwargs):
+        """requests response hook"""
+        self.latencies.append(response.elapsed.total_seconds() * 1000)
+        if response.status_code >= 500:
+            self.errors += 1
+
+    def maybe_sample(self, iteration: int, force: bool = False) -> None:
+        now = time.time()
+        if not force and now < self.next_sample:
+            return
+        self.next_sample = now + self.interval
+        latencies, self.latencies = self.latencies, []
+        row = {
+            'timestamp': round(now, 3),
+            'elapsed_s': round(now - self.started, 1),
+            'iteration': iteration,
+            'requests': len(latencies),
+            'errors': self.errors,
+            'p50_ms': _round(percentile(latencies, 50)),
+            'p95_ms': _round(percentile(latencies, 95)),
+            'p99_ms': _round(percentile(latencies, 99)),
+        }
+        row.update(resource_usage())
+        self.errors = 0
+        self.rows.append(row)
+        self._writer.writerow(row)
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 2)
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('soak', 'Soak testing')
+    group.addoption('--soak-duration', default=None, metavar='DURATION',
+                    help='Repeat the selected tests for this long (e.g. 30m, 4h)')
+    group.addoption('--soak-iterations', type=int, default=None, metavar='N',
+                    help='Repeat the selected tests N times')
+    group.addoption('--soak-interval', type=float, default=60.0, metavar='SECONDS',
+                    help='Sampling interval for the time series (default: 60)')
+    group.addoption('--soak-file', default='soak-timeseries.csv',
+                    help='Time series output file (default: soak-timeseries.csv)')
+    group.addoption('--soak-alpha', type=float, default=0.01,
+                    help='Significance level of the drift trend test (default: 0.01)')
+    group.addoption('--soak-tolerance', type=float, default=0.10,
+                    help='Relative growth over the run tolerated before failing (default: 0.10)')
+
+
+class SoakPlugin:
+    """Replaces the run loop with a repeating one that keeps session fixtures alive"""
+
+    def __init__(self, config):
+        duration = config.getoption('soak_duration')
+        self.deadline = time.time() + parse_duration(duration) if duration else None
+        self.iterations = config.getoption('soak_iterations')
+        self.alpha = config.getoption('soak_alpha')
+        self.tolerance = config.getoption('soak_tolerance')
+        self.recorder = SoakRecorder(config.getoption('soak_file'), config.getoption('soak_interval'))
+        self.trends: Dict[str, dict] = {}
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_fixture_setup(self, fixturedef, request):
+        outcome = yield
+        if fixturedef.argname == 'api_session':
+            session = outcome.get_result()
+            session.hooks['response'].append(self.recorder.on_response)
+
+    def _more(self, iteration: int) -> bool:
+        if self.iterations is not None and iteration >= self.iterations:
+            return False
+        return self.deadline is None or time.time() < self.deadline
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_runtestloop(self, session):
+        if session.config.option.collectonly or not session.items:
+            return None
+
+        items = session.items
+        iteration = 0
+        while True:
+            iteration += 1
+            last_round = not self._more(iteration)
+            for index, item in enumerate(items):
+                if index + 1 < len(items):
+                    nextitem = items[index + 1]
+                else:
+                    # Wrapping to the first item keeps session fixtures set up
+                    nextitem = None if last_round else items[0]
+                if nextitem is item:
+                    # A single selected test: keep module and session fixtures only
+                    nextitem = item.parent
+                item.config.hook.pytest_runtest_protocol(item=item, nextitem=nextitem)
+                if session.shouldfail or session.shouldstop:
+                    last_round = True
+                    break
+                self.recorder.maybe_sample(iteration)
+            if last_round:
+                break
+
+        self.recorder.maybe_sample(iteration, force=True)
+        self.recorder.close()
+        logger.info(f"Soak finished after {iteration} iteration(s), "
+                    f"{len(self.recorder.rows)} samples in {self.recorder.path}")
+        return True
+
+    def pytest_sessionfinish(self, session):
+        for name in TREND_SERIES:
+            self.trends[name] = detect_drift(
+                [row[name] for row in self.recorder.rows], self.alpha, self.tolerance
+            )
+        if any(trend['verdict'] == 'drift' for trend in self.trends.values()):
+            session.exitstatus = pytest.ExitCode.TESTS_FAILED
+
+    def pytest_terminal_summary(self, terminalreporter):
+        terminalreporter.write_sep('-', f"soak trends: {self.recorder.path}")
+        for name, trend in self.trends.items():
+            details = ', '.join(f"{key}={value}" for key, value in trend.items() if key != 'verdict')
+            terminalreporter.write_line(f"{name:>14}: {trend['verdict'].upper()} ({details})")
+
+
+def pytest_configure(config):
+    if config.getoption('soak_duration') or config.getoption('soak_iterations'):
+        if config.pluginmanager.hasplugin('xdist') and getattr(config.option, 'numprocesses', None):
+            raise pytest.UsageError("Soak mode runs on a single long-lived session; do not combine it with -n")
+        config.pluginmanager.register(SoakPlugin(config), 'api-soak')
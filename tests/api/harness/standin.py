@@ -0,0 +1,482 @@
+"""
+Local stand-in for the public APIs under test
+Serves a generated dataset (harness.dataset) with JSONPlaceholder-style routes,
+reqres-style routes under /api and a small httpbin-compatible echo subset, so
+the suite can be benchmarked at realistic data sizes without a network
+
+Usage:
+    python -m harness.standin data/bench-1m.qads --port 8080
+    pytest --standin=data/bench-1m.qads          # point the base URL fixtures at it
+"""
+
+import argparse
+import base64
+import gzip
+import json
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import islice
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from harness.dataset import Dataset
+
+# Unpaginated list responses are capped to keep a 10^7-row table from
+# producing gigabyte responses
+MAX_LIST = 10000
+
+# reqres default page size
+PER_PAGE = 6
+
+# httpbin caps /delay at 10 seconds
+MAX_DELAY = 10
+
+# Longest chunk-size or trailer line accepted in a chunked request body
+MAX_LINE = 1024
+
+# Handlers that echo any body, like httpbin: a body that is not JSON gives json: null
+ECHO_HANDLERS = ('echo', 'delay')
+
+
+# Endpoints served by the stand-in: (API key, method, route template, StandInAPI handler)
+ROUTES = (
+    ('jsonplaceholder', 'GET', '/posts', 'list_posts'),
+    ('jsonplaceholder', 'GET', '/posts/{id}', 'get_post'),
+    ('jsonplaceholder', 'GET', '/posts/{id}/comments', 'post_comments'),
+    ('jsonplaceholder', 'POST', '/posts', 'create_post'),
+    ('jsonplaceholder', 'PUT', '/posts/{id}', 'replace_post'),
+    ('jsonplaceholder', 'PATCH', '/posts/{id}', 'patch_post'),
+    ('jsonplaceholder', 'DELETE', '/posts/{id}', 'delete_post'),
+    ('jsonplaceholder', 'GET', '/comments', 'list_comments'),
+    ('jsonplaceholder', 'GET', '/todos', 'list_todos'),
+    ('jsonplaceholder', 'GET', '/todos/{id}', 'get_todo'),
+    ('reqres', 'GET', '/api/users', 'list_users'),
+    ('reqres', 'GET', '/api/users/{id}', 'get_user'),
+    ('reqres', 'POST', '/api/users', 'create_user'),
+    ('reqres', 'PUT', '/api/users/{id}', 'update_user'),
+    ('reqres', 'PATCH', '/api/users/{id}', 'update_user'),
+    ('reqres', 'DELETE', '/api/users/{id}', 'delete_user'),
+    ('reqres', 'POST', '/api/register', 'register'),
+    ('reqres', 'POST', '/api/login', 'login'),
+    ('httpbin', 'GET', '/get', 'echo'),
+    ('httpbin', 'POST', '/post', 'echo'),
+    ('httpbin', 'PUT', '/put', 'echo'),
+    ('httpbin', 'PATCH', '/patch', 'echo'),
+    ('httpbin', 'DELETE', '/delete', 'echo'),
+    ('httpbin', 'GET', '/status/{code}', 'status'),
+    ('httpbin', 'GET', '/headers', 'echo_headers'),
+    ('httpbin', 'GET', '/user-agent', 'user_agent'),
+    ('httpbin', 'GET', '/delay/{seconds}', 'delay'),
+    ('httpbin', 'GET', '/basic-auth/{user}/{passwd}', 'basic_auth'),
+    ('httpbin', 'GET', '/gzip', 'gzipped'),
+    ('httpbin', 'GET', '/json', 'sample_json'),
+    ('httpbin', 'GET', '/uuid', 'new_uuid'),
+)
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, body=None):
+        super().__init__(status)
+        self.status = status
+        self.body = body if body is not None else {}
+
+
+class Request:
+    """Parsed request handed to StandInAPI handlers"""
+
+    def __init__(self, method: str, url: str, params: Dict[str, str], query: Dict[str, str],
+                 body, headers: Dict[str, str], client: str = '127.0.0.1',
+                 form: Optional[Dict[str, str]] = None, data: str = ''):
+        self.method = method
+        self.url = url
+        self.params = params
+        self.query = query
+        self.body = body
+        self.headers = headers
+        self.client = client
+        self.form = form or {}
+        self.data = data
+
+
+class Route:
+    """One endpoint: HTTP method, route template and handler"""
+
+    def __init__(self, method: str, template: str, handler: Callable):
+        self.method = method
+        self.template = template
+        pattern = re.sub(r'\{(\w+)\}', r'(?P<\1>[^/]+)', template)
+        self.regex = re.compile(f"^{pattern}/?$")
+        self.handler = handler
+
+
+_TEMPLATES = [
+    (re.compile('^' + re.sub(r'\{(\w+)\}', r'[^/]+', template) + '/?$'), template)
+    for template in dict.fromkeys(template for _, _, template, _ in ROUTES)
+]
+# API_ENDPOINTS key owning each route template
+ROUTE_APIS = {template: api for api, _, template, _ in ROUTES}
+_ID_SEGMENT = re.compile(r'^(\d+|[0-9a-fA-F-]{16,})$')
+
+
+def route_template(path: str) -> str:
+    """
+    Low-cardinality route template for a request path, e.g. /posts/1/comments ->
+    /posts/{id}/comments; falls back to replacing numeric and hex-id segments
+    """
+    for regex, template in _TEMPLATES:
+        if regex.match(path):
+            return template
+    return '/'.join('{id}' if _ID_SEGMENT.match(segment) else segment for segment in path.split('/'))
+
+
+def _int(value: str, name: str) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise HTTPError(400, {'error': f"'{name}' must be an integer"})
+
+
+def _object(body) -> dict:
+    if body is None:
+        return {}
+    if not isinstance(body, dict):
+        raise HTTPError(400, {'error': 'Request body must be a JSON object'})
+    return body
+
+
+def _flag(value: str) -> int:
+    if value not in ('true', 'false'):
+        raise HTTPError(400, {'error': "'completed' must be true or false"})
+    return int(value == 'true')
+
+
+class StandInAPI:
+    """Request routing and resource logic, independent of the HTTP server"""
+
+    def __init__(self, dataset: Dataset, max_list: int = MAX_LIST):
+        self.dataset = dataset
+        self.max_list = max_list
+        self.routes = [Route(method, template, getattr(self, handler)) for _, method, template, handler in ROUTES]
+
+    def match(self, method: str, path: str) -> Tuple[Optional[Route], Dict[str, str]]:
+        """
+        Route and path parameters for a request
+        Raises 404 when no route matches the path, 405 when only the method differs.
+        """
+        path_matched = False
+        for route in self.routes:
+            found = route.regex.match(path)
+            if found:
+                if route.method == method:
+                    return route, found.groupdict()
+                path_matched = True
+        raise HTTPError(405 if path_matched else 404)
+
+    # Helpers ---------------------------------------------------------------
+
+    def _page(self, rows, count: int, query: Dict[str, str]):
+        """
+        Apply _page/page and _limit to row numbers
+        Sequences (range, index slices) are sliced directly; iterators are skipped through.
+        """
+        limit = _int(query['_limit'], '_limit') if '_limit' in query else None
+        page = query.get('_page', query.get('page'))
+        if page is not None:
+            page = max(1, _int(page, 'page'))
+            limit = limit or 10
+            start = (page - 1) * limit
+        else:
+            start = 0
+        stop = start + max(0, min(limit if limit is not None else count, self.max_list))
+        if hasattr(rows, '__getitem__'):
+            return rows[start:stop]
+        return islice(rows, start, stop)
+
+    def _row(self, table: str, value: str) -> int:
+        row = _int(value, 'id') - 1
+        if not 0 <= row < self.dataset.counts[table]:
+            raise HTTPError(404)
+        return row
+
+    @staticmethod
+    def _intersect(rows, column, value):
+        return (row for row in rows if column[row] == value)
+
+    # JSONPlaceholder-style resources ----------------------------------------
+
+    def list_posts(self, request):
+        count = self.dataset.counts['posts']
+        rows = (self.dataset.rows_for('posts.userId', _int(request.query['userId'], 'userId'))
+                if 'userId' in request.query else range(count))
+        return 200, self.dataset.rows('posts', self._page(rows, len(rows), request.query))
+
+    def get_post(self, request):
+        return 200, self.dataset.post(self._row('posts', request.params['id']))
+
+    def post_comments(self, request):
+        post_id = self._row('posts', request.params['id']) + 1
+        rows = self.dataset.rows_for('comments.postId', post_id)
+        return 200, self.dataset.rows('comments', self._page(rows, len(rows), request.query))
+
+    def list_comments(self, request):
+        rows = (self.dataset.rows_for('comments.postId', _int(request.query['postId'], 'postId'))
+                if 'postId' in request.query else range(self.dataset.counts['comments']))
+        return 200, self.dataset.rows('comments', self._page(rows, len(rows), request.query))
+
+    def list_todos(self, request):
+        completed = self.dataset.columns['todos.completed']
+        if 'userId' in request.query:
+            rows = self.dataset.rows_for('todos.userId', _int(request.query['userId'], 'userId'))
+            count = len(rows)
+            if 'completed' in request.query:
+                rows = self._intersect(rows, completed, _flag(request.query['completed']))
+        elif 'completed' in request.query:
+            rows = self.dataset.rows_for('todos.completed', _flag(request.query['completed']))
+            count = len(rows)
+        else:
+            count = self.dataset.counts['todos']
+            rows = range(count)
+        return 200, self.dataset.rows('todos', self._page(rows, count, request.query))
+
+    def get_todo(self, request):
+        return 200, self.dataset.todo(self._row('todos', request.params['id']))
+
+    def create_post(self, request):
+        return 201, dict(_object(request.body), id=self.dataset.counts['posts'] + 1)
+
+    def replace_post(self, request):
+        return 200, dict(_object(request.body), id=self._row('posts', request.params['id']) + 1)
+
+    def patch_post(self, request):
+        post = self.dataset.post(self._row('posts', request.params['id']))
+        post.update(_object(request.body))
+        return 200, post
+
+    def delete_post(self, request):
+        self._row('posts', request.params['id'])
+        return 200, {}
+
+    # reqres-style resources -------------------------------------------------
+
+    def list_users(self, request):
+        total = self.dataset.counts['users']
+        per_page = _int(request.query.get('per_page', PER_PAGE), 'per_page')
+        page = _int(request.query.get('page', 1), 'page')
+        start = max(0, (page - 1) * per_page)
+        rows = range(start, min(total, start + per_page)) if page > 0 else range(0)
+        return 200, {
+            'page': page,
+            'per_page': per_page,
+            'total': total,
+            'total_pages': -(-total // per_page) if per_page > 0 else 0,
+            'data': self.dataset.rows('users', rows),
+        }
+
+    def get_user(self, request):
+        return 200, {'data': self.dataset.user(self._row('users', request.params['id']))}
+
+    def create_user(self, request):
+        return 201, dict(_object(request.body), id=str(self.dataset.counts['users'] + 1), createdAt=_now())
+
+    def update_user(self, request):
+        return 200, dict(_object(request.body), updatedAt=_now())
+
+    def delete_user(self, request):
+        return 204, None
+
+    def register(self, request):
+        body = _object(request.body)
+        if not body.get('password'):
+            raise HTTPError(400, {'error': 'Missing password'})
+        if not body.get('email'):
+            raise HTTPError(400, {'error': 'Missing email or username'})
+        return 200, {'id': 4, 'token': 'QpwL5tke4Pnpja7X4'}
+
+    def login(self, request):
+        body = _object(request.body)
+        if not body.get('password'):
+            raise HTTPError(400, {'error': 'Missing password'})
+        return 200, {'token': 'QpwL5tke4Pnpja7X4'}
+
+    # httpbin-compatible subset ----------------------------------------------
+
+    def echo(self, request):
+        return 200, {
+            'args': request.query,
+            'data': request.data,
+            'form': request.form,
+            'headers': request.headers,
+            'json': request.body,
+            'origin': request.client,
+            'url': request.url,
+        }
+
+    def status(self, request):
+        return _int(request.params['code'], 'code'), None
+
+    def echo_headers(self, request):
+        return 200, {'headers': request.headers}
+
+    def user_agent(self, request):
+        return 200, {'user-agent': request.headers.get('User-Agent', '')}
+
+    def delay(self, request):
+        seconds = min(float(_int(request.params['seconds'], 'seconds')), MAX_DELAY)
+        time.sleep(seconds)
+        return self.echo(request)
+
+    def basic_auth(self, request):
+        expected = f"{request.params['user']}:{request.params['passwd']}".encode()
+        scheme, _, credentials = request.headers.get('Authorization', '').partition(' ')
+        try:
+            decoded = base64.b64decode(credentials, validate=True)
+        except ValueError:
+            # binascii.Error (bad padding or alphabet) or non-ASCII text:
+            # malformed credentials are a failed login, not a server error
+            decoded = None
+        if scheme != 'Basic' or decoded != expected:
+            raise HTTPError(401, None)
+        return 200, {'authenticated': True, 'user': request.params['user']}
+
+    def gzipped(self, request):
+        return 200, {'gzipped': True, 'headers': request.headers}, {'Content-Encoding': 'gzip'}
+
+    def sample_json(self, request):
+        return 200, {'slideshow': {'author': 'QA Stand-In', 'title': 'Sample Slide Show', 'slides': [
+            {'title': 'Wake up to WonderWidgets!', 'type': 'all'},
+            {'title': 'Overview', 'type': 'all', 'items': ['Why WonderWidgets', 'Who buys']},
+        ]}}
+
+    def new_uuid(self, request):
+        return 200, {'uuid': str(uuid.uuid4())}
+
+
+def _now() -> str:
+    return time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime())
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are separate writes; without TCP_NODELAY each keep-alive
+    # response waits ~40ms for the client's delayed ACK
+    disable_nagle_algorithm = True
+    server_version = 'QA-StandIn/1.0'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _dispatch(self):
+        api: StandInAPI = self.server.api
+        url = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        content_type = self.headers.get('Content-Type', '')
+        try:
+            raw = self._read_body()
+            route, params = api.match(self.command, url.path)
+            body, form = None, {}
+            if content_type.startswith('application/x-www-form-urlencoded'):
+                form = {key: values[-1] for key, values in parse_qs(raw.decode('latin-1')).items()}
+            elif raw:
+                try:
+                    body = json.loads(raw)
+                except (ValueError, RecursionError):
+                    if route.handler.__name__ not in ECHO_HANDLERS:
+                        raise HTTPError(400, {'error': 'Malformed JSON body'})
+            request = Request(self.command, self.path, params, query, body, dict(self.headers),
+                              self.client_address[0], form, raw.decode('utf-8', 'replace'))
+            status, payload, *extra = route.handler(request)
+            headers = extra[0] if extra else {}
+        except HTTPError as e:
+            status, payload, headers = e.status, e.body, {}
+        except Exception as e:
+            status, payload, headers = 500, {'error': f"{type(e).__name__}: {e}"}, {}
+
+        encoded = b'' if payload is None else json.dumps(payload).encode()
+        if headers.get('Content-Encoding') == 'gzip':
+            encoded = gzip.compress(encoded)
+        self.send_response(status)
+        if payload is not None:
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Content-Length', str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def _read_body(self) -> bytes:
+        """Request body, sent with Content-Length or chunked transfer encoding"""
+        if 'chunked' not in self.headers.get('Transfer-Encoding', '').lower():
+            length = int(self.headers.get('Content-Length') or 0)
+            return self.rfile.read(length) if length else b''
+        chunks = []
+        try:
+            while True:
+                size = int(self.rfile.readline(MAX_LINE).split(b';', 1)[0], 16)
+                if not size:
+                    break
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline(MAX_LINE)
+            # The trailer section ends with an empty line
+            while self.rfile.readline(MAX_LINE).strip():
+                pass
+        except ValueError:
+            # The rest of the stream cannot be framed; answer and drop the connection
+            self.close_connection = True
+            raise HTTPError(400, {'error': 'Malformed chunked body'})
+        return b''.join(chunks)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _dispatch
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Threaded HTTP server for a StandInAPI; start() runs it in the background"""
+
+    daemon_threads = True
+
+    def __init__(self, dataset: Dataset, host: str = '127.0.0.1', port: int = 0):
+        self.api = StandInAPI(dataset)
+        super().__init__((host, port), _Handler)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def endpoints(self) -> Dict[str, str]:
+        """Base URLs in the same shape as API_ENDPOINTS"""
+        return {'reqres': f"{self.url}/api", 'jsonplaceholder': self.url, 'httpbin': self.url}
+
+    def start(self) -> 'StandInServer':
+        self._thread = threading.Thread(target=self.serve_forever, name='standin', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Serve a generated dataset as a local stand-in API')
+    parser.add_argument('dataset', help='Dataset file from python -m harness.dataset')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    args = parser.parse_args(argv)
+
+    server = StandInServer(Dataset(args.dataset), args.host, args.port)
+    print(f"Stand-in API on {server.url} ({server.api.dataset.counts})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
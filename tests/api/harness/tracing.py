@@ -0,0 +1,238 @@
+"""
+Per-request trace correlation and span export
+Every api_session request carries a W3C `traceparent` header whose trace id is
+the current test's and whose span id is the request's. Nested spans
+(test -> setup/call/teardown -> fixture -> throttle, request, decode, validate) are
+buffered in memory as tuples and exported at session end as a Chrome trace
+event file, viewable in Perfetto (ui.perfetto.dev) or chrome://tracing
+
+Usage:
+    pytest --trace-file=trace.json
+    pytest -n 4 --trace-file=traces/trace.json    # one file per xdist worker
+"""
+
+import contextlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import pytest
+import requests
+
+from harness.standin import route_template
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT = 'traceparent'
+
+# Spans kept in memory; later spans are counted as dropped (about 200 bytes each)
+DEFAULT_MAX_SPANS = 500000
+
+_random = random.Random()
+
+
+def new_trace_id() -> str:
+    return f"{_random.getrandbits(128):032x}"
+
+
+def new_span_id() -> str:
+    return f"{_random.getrandbits(64):016x}"
+
+
+class Span:
+    __slots__ = ('id', 'parent', 'args', 'start')
+
+    def __init__(self, span_id: str, parent: Optional[str], args: dict):
+        self.id = span_id
+        self.parent = parent
+        self.args = args
+        # perf_counter_ns() at which the span starts; may be moved forward while open
+        self.start = 0
+
+
+class Tracer:
+    """
+    Buffered span recorder; spans nest per thread
+    Recording a span costs two perf_counter_ns() calls and one tuple append.
+    """
+
+    def __init__(self, max_spans: int = DEFAULT_MAX_SPANS):
+        self.max_spans = max_spans
+        # (name, category, start_ns, end_ns, thread id, trace id, span)
+        self.spans: List[Tuple] = []
+        self.dropped = 0
+        self.trace_id = new_trace_id()
+        self.origin_ns = time.perf_counter_ns()
+        self.threads: Dict[int, str] = {}
+        self._local = threading.local()
+
+    def _stack(self) -> List[str]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+            thread = threading.current_thread()
+            self.threads[thread.ident] = thread.name
+        return stack
+
+    def current(self) -> Optional[str]:
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str = 'harness', **args):
+        stack = self._stack()
+        span = Span(new_span_id(), stack[-1] if stack else None, args)
+        trace_id = self.trace_id
+        stack.append(span.id)
+        span.start = time.perf_counter_ns()
+        try:
+            yield span
+        except BaseException as e:
+            span.args['error'] = type(e).__name__
+            raise
+        finally:
+            end = time.perf_counter_ns()
+            stack.pop()
+            self._record(name, category, span.start, end, trace_id, span)
+
+    def _record(self, name: str, category: str, start: int, end: int, trace_id: str, span: Span) -> None:
+        if len(self.spans) < self.max_spans:
+            self.spans.append((name, category, start, end, threading.get_ident(), trace_id, span))
+        else:
+            self.dropped += 1
+
+    def instrument(self, session: requests.Session) -> requests.Session:
+        """
+        Wrap session.send: one request span per attempt, traceparent header, decode span on .json()
+        A rate-limit wait inside send (see rate_limit.throttle) becomes a sibling
+        'throttle' span and the request span starts when it ends.
+        """
+        send = session.send
+
+        def traced_send(request, **kwargs):
+            path = requests.utils.urlparse(request.url).path or '/'
+            with self.span(f"{request.method} {route_template(path)}", 'request', url=request.url) as span:
+                request.headers[TRACEPARENT] = f"00-{self.trace_id}-{span.id}-01"
+                try:
+                    response = send(request, **kwargs)
+                finally:
+                    self._split_wait(request, span)
+                span.args['status'] = response.status_code
+            self._trace_decode(response)
+            return response
+
+        session.send = traced_send
+        return session
+
+    def _split_wait(self, request: requests.PreparedRequest, span: Span) -> None:
+        wait = getattr(request, 'rate_limit_wait_ns', None)
+        if wait is None or wait[1] <= span.start:
+            return
+        start, end = max(wait[0], span.start), wait[1]
+        self._record('throttle', 'throttle', start, end, self.trace_id, Span(new_span_id(), span.parent, {}))
+        span.start = end
+
+    def _trace_decode(self, response: requests.Response) -> None:
+        decode = response.json
+
+        def traced_json(**kwargs):
+            with self.span('decode', 'decode', bytes=len(response.content)):
+                return decode(**kwargs)
+
+        response.json = traced_json
+
+    def chrome_trace(self) -> dict:
+        """Trace Event Format document (complete 'X' events, microseconds)"""
+        pid = os.getpid()
+        events = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': 'pytest'}}]
+        for tid, name in self.threads.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}})
+        for name, category, start, end, tid, trace_id, span in self.spans:
+            args = dict(span.args, trace_id=trace_id, span_id=span.id)
+            if span.parent:
+                args['parent_id'] = span.parent
+            events.append({
+                'name': name, 'cat': category, 'ph': 'X', 'pid': pid, 'tid': tid,
+                'ts': (start - self.origin_ns) / 1000, 'dur': (end - start) / 1000, 'args': args,
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms',
+                'otherData': {'dropped_spans': self.dropped}}
+
+    def write(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f, separators=(',', ':'))
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('tracing', 'Request tracing')
+    group.addoption('--trace-file', default=None, metavar='PATH',
+                    help='Record test, fixture and request spans and write a Chrome trace file to PATH')
+    group.addoption('--trace-max-spans', type=int, default=DEFAULT_MAX_SPANS, metavar='N',
+                    help=f'Spans buffered before further spans are dropped (default: {DEFAULT_MAX_SPANS})')
+
+
+class TracingPlugin:
+    """Opens a trace per test and spans around its phases and fixture setups"""
+
+    def __init__(self, config):
+        self.tracer = Tracer(config.getoption('trace_max_spans'))
+        self.path = config.getoption('trace_file')
+        worker = os.environ.get('PYTEST_XDIST_WORKER')
+        if worker:
+            root, ext = os.path.splitext(self.path)
+            self.path = f"{root}-{worker}{ext}"
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_protocol(self, item, nextitem):
+        self.tracer.trace_id = new_trace_id()
+        item.user_properties.append(('trace_id', self.tracer.trace_id))
+        with self.tracer.span(item.nodeid, 'test'):
+            yield
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_setup(self, item):
+        with self.tracer.span('setup', 'phase'):
+            yield
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_call(self, item):
+        with self.tracer.span('call', 'phase'):
+            yield
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_teardown(self, item):
+        with self.tracer.span('teardown', 'phase'):
+            yield
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_fixture_setup(self, fixturedef, request):
+        with self.tracer.span(f"fixture {fixturedef.argname}", 'fixture', scope=fixturedef.scope):
+            outcome = yield
+        if fixturedef.argname == 'api_session' and outcome.excinfo is None:
+            self.tracer.instrument(outcome.get_result())
+
+    def pytest_sessionfinish(self, session):
+        self.tracer.write(self.path)
+        logger.info(f"Trace with {len(self.tracer.spans)} spans written to {self.path}")
+        if self.tracer.dropped:
+            logger.warning(f"Trace buffer full: {self.tracer.dropped} spans dropped")
+
+
+def span(config, name: str, category: str = 'harness', **args):
+    """Span on the active tracer, or a no-op context when tracing is off"""
+    plugin = config.pluginmanager.get_plugin('api-tracing')
+    if plugin is None:
+        return contextlib.nullcontext()
+    return plugin.tracer.span(name, category, **args)
+
+
+def pytest_configure(config):
+    if config.getoption('trace_file'):
+        config.pluginmanager.register(TracingPlugin(config), 'api-tracing')
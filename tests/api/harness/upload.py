@@ -0,0 +1,306 @@
+"""
+Streaming uploads and upload throughput
+Request bodies are produced chunk by chunk from a generator or a memory-mapped
+file and sent with chunked transfer encoding, so a multi-gigabyte body never
+exists in memory on the client. measure_upload() posts one to an
+httpbin-compatible echo endpoint (POST /post), reports the upload rate in MB/s
+and compares the echoed `data` field with what was sent by hashing both as
+they stream, without buffering the echo either.
+
+Usage:
+    result = measure_upload(api_session, f"{httpbin_base_url}/post", synthetic_ndjson(64 * MB))
+    result = measure_upload(api_session, url, mmap_chunks('data/import.ndjson'), 'application/x-ndjson')
+
+    python -m harness.upload --standin=data/bench-1m.qads --size-mb 256
+    python -m harness.upload --url https://staging.example.com/post --file data/import.ndjson --repeat 3
+"""
+
+import argparse
+import codecs
+import hashlib
+import json
+import mmap
+import os
+import re
+import sys
+import time
+from dataclasses import dataclass
+from json.decoder import scanstring
+from typing import Iterable, Iterator, Optional, Union
+
+import requests
+
+MB = 1000 * 1000
+
+# Chunk size of generated and memory-mapped bodies; each chunk is one
+# chunked-encoding frame and one socket write
+DEFAULT_CHUNK = 256 * 1024
+
+# The echo's "data" key, possibly split across two response chunks
+_DATA_FIELD = re.compile(r'"data"\s*:\s*"')
+_SEEK_TAIL = 32
+
+# A \uXXXX escape for a high surrogate, whose low half may follow in the next chunk
+_HIGH_SURROGATE = re.compile(r'\\u[dD][89abAB][0-9a-fA-F]{2}$')
+
+
+def iter_chunks(pieces: Iterable[Union[bytes, str]], chunk_size: int = DEFAULT_CHUNK) -> Iterator[bytes]:
+    """Regroup pieces of any size into chunks of chunk_size bytes (the last may be shorter)"""
+    buffer = bytearray()
+    for piece in pieces:
+        buffer += piece.encode() if isinstance(piece, str) else piece
+        while len(buffer) >= chunk_size:
+            yield bytes(buffer[:chunk_size])
+            del buffer[:chunk_size]
+    if buffer:
+        yield bytes(buffer)
+
+
+def mmap_chunks(path: str, chunk_size: int = DEFAULT_CHUNK) -> Iterator[bytes]:
+    """
+    Chunks of a file read through a read-only memory map; the pages come from
+    the page cache, so only the chunk being sent is copied into the process
+    """
+    with open(path, 'rb') as f:
+        if not os.fstat(f.fileno()).st_size:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if hasattr(mapped, 'madvise'):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+            for offset in range(0, len(mapped), chunk_size):
+                yield mapped[offset:offset + chunk_size]
+
+
+def synthetic_ndjson(size: int, chunk_size: int = DEFAULT_CHUNK) -> Iterator[bytes]:
+    """
+    About size bytes of bulk-import records, one JSON object per line; the
+    records are deterministic, so repeated runs send identical bodies
+    """
+    def records():
+        sent, index = 0, 0
+        while sent < size:
+            index += 1
+            line = json.dumps({
+                'id': index, 'name': f"Bulk User {index}", 'email': f"bulk.user{index}@example.com",
+                'job': 'Test Engineer', 'tags': ['import', f"batch-{index // 1000}"],
+            }) + '\n'
+            sent += len(line)
+            yield line
+    return iter_chunks(records(), chunk_size)
+
+
+class StreamedBody:
+    """
+    Iterable request body: requests sends it with Transfer-Encoding: chunked
+    (it has no length) and the chunks are counted and hashed as they go out
+    """
+
+    def __init__(self, chunks: Iterable[Union[bytes, str]]):
+        self._chunks = chunks
+        self.sent = 0
+        self.chunks = 0
+        self.digest = hashlib.sha256()
+        self.first: Optional[float] = None
+
+    def __iter__(self) -> Iterator[bytes]:
+        for chunk in self._chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            if not chunk:
+                # A zero-length chunk would end the chunked body early
+                continue
+            if self.first is None:
+                self.first = time.perf_counter()
+            self.digest.update(chunk)
+            self.sent += len(chunk)
+            self.chunks += 1
+            yield chunk
+
+
+class EchoDigest:
+    """
+    Hashes the decoded value of the first "data" string of an httpbin echo
+    response fed in arbitrary pieces (only the query args precede it, so the
+    upload URL must not have a data= parameter). Escapes are decoded by the C scanner of
+    the json module, a piece at a time, cutting only between escape sequences.
+    """
+
+    def __init__(self):
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.found = False
+        self.done = False
+        self._decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        self._pending = ''
+
+    def feed(self, data: bytes) -> None:
+        if self.done:
+            return
+        text = self._pending + self._decoder.decode(data)
+        self._pending = ''
+        if not self.found:
+            match = _DATA_FIELD.search(text)
+            if match is None:
+                self._pending = text[-_SEEK_TAIL:]
+                return
+            self.found = True
+            text = text[match.end():]
+        try:
+            # The string ends in this piece: decode up to its closing quote
+            value, _ = scanstring(text, 0, False)
+            self.done = True
+        except ValueError:
+            cut = _escape_boundary(text)
+            value, _ = scanstring(text[:cut] + '"', 0, False)
+            self._pending = text[cut:]
+        encoded = value.encode('utf-8', 'surrogatepass')
+        self.digest.update(encoded)
+        self.size += len(encoded)
+
+    def hexdigest(self) -> Optional[str]:
+        return self.digest.hexdigest() if self.done else None
+
+
+def _escape_boundary(text: str) -> int:
+    """
+    Index in text before which no escape sequence is cut off: the start of the
+    backslash run holding the last backslash of the final 6 characters (a run
+    always starts an escape), moved before a trailing high surrogate
+    """
+    cut = len(text)
+    index = text.rfind('\\', max(0, cut - 6))
+    if index >= 0:
+        cut = _run_start(text, index)
+    if _HIGH_SURROGATE.search(text, max(0, cut - 6), cut):
+        cut = _run_start(text, cut - 6)
+    return cut
+
+
+def _run_start(text: str, index: int) -> int:
+    while index and text[index - 1] == '\\':
+        index -= 1
+    return index
+
+
+@dataclass
+class UploadResult:
+    """One streamed upload; rates are in MB/s (10^6 bytes per second)"""
+
+    url: str
+    status: int
+    sent_bytes: int
+    chunks: int
+    upload_s: float
+    total_s: float
+    sent_sha256: str
+    echo_bytes: Optional[int] = None
+    echo_sha256: Optional[str] = None
+
+    @property
+    def upload_mb_s(self) -> float:
+        return self.sent_bytes / MB / self.upload_s if self.upload_s else 0.0
+
+    @property
+    def echo_matches(self) -> Optional[bool]:
+        """Whether the echoed data equals the body; None when the echo was not verified"""
+        if self.echo_sha256 is None:
+            return None
+        return self.echo_sha256 == self.sent_sha256
+
+    def summary(self) -> dict:
+        return {
+            'url': self.url,
+            'status': self.status,
+            'sent_bytes': self.sent_bytes,
+            'chunks': self.chunks,
+            'upload_s': round(self.upload_s, 3),
+            'total_s': round(self.total_s, 3),
+            'upload_mb_s': round(self.upload_mb_s, 2),
+            'echo_bytes': self.echo_bytes,
+            'echo_matches': self.echo_matches,
+        }
+
+
+def measure_upload(session: requests.Session, url: str, chunks: Iterable[Union[bytes, str]],
+                   content_type: str = 'application/x-ndjson', verify: bool = True,
+                   read_size: int = DEFAULT_CHUNK, **kwargs) -> UploadResult:
+    """
+    POST chunks to url with chunked transfer encoding. upload_s runs from the
+    first chunk to the response headers, which an echo server sends only after
+    reading the whole body. With verify, the response is streamed through an
+    EchoDigest; otherwise it is drained unread.
+    """
+    body = StreamedBody(chunks)
+    headers = dict(kwargs.pop('headers', None) or {}, **{'Content-Type': content_type})
+    started = time.perf_counter()
+    response = session.post(url, data=body, headers=headers, stream=True, **kwargs)
+    answered = time.perf_counter()
+    echo = EchoDigest() if verify else None
+    with response:
+        for piece in response.iter_content(read_size):
+            if echo is not None:
+                echo.feed(piece)
+    return UploadResult(
+        url=url,
+        status=response.status_code,
+        sent_bytes=body.sent,
+        chunks=body.chunks,
+        upload_s=answered - (body.first or started),
+        total_s=time.perf_counter() - started,
+        sent_sha256=body.digest.hexdigest(),
+        echo_bytes=echo.size if echo is not None and echo.done else None,
+        # An echo without a complete data field does not match
+        echo_sha256=(echo.hexdigest() or '') if echo is not None else None,
+    )
+
+
+def main(argv=None) -> int:
+    from harness.capacity import PUBLIC_HOSTS, serve_standin
+
+    parser = argparse.ArgumentParser(description='Measure streamed upload throughput against an echo endpoint')
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--standin', metavar='DATASET', help='Serve a generated dataset locally and upload to it')
+    target.add_argument('--url', help='Upload endpoint, e.g. an httpbin-compatible POST /post')
+    body = parser.add_mutually_exclusive_group()
+    body.add_argument('--size-mb', type=float, default=64.0, help='Generated NDJSON body size (default: 64)')
+    body.add_argument('--file', help='Upload this file through a memory map instead')
+    parser.add_argument('--content-type', default='application/x-ndjson')
+    parser.add_argument('--chunk-kb', type=int, default=DEFAULT_CHUNK // 1024,
+                        help=f'Chunk size in KiB (default: {DEFAULT_CHUNK // 1024})')
+    parser.add_argument('--repeat', type=int, default=1, help='Uploads to run (default: 1)')
+    parser.add_argument('--no-verify', action='store_true', help='Do not compare the echoed body (non-echo endpoints)')
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.standin:
+        server, base = serve_standin(args.standin)
+        url = f"{base}/post"
+    else:
+        url = args.url
+        host = requests.utils.urlparse(url).hostname or ''
+        if any(host == public or host.endswith('.' + public) for public in PUBLIC_HOSTS):
+            raise SystemExit(f"Refusing to send bulk uploads to public API host {host}; use --standin or a staging URL")
+
+    chunk_size = args.chunk_kb * 1024
+    results = []
+    try:
+        with requests.Session() as session:
+            for _ in range(args.repeat):
+                if args.file:
+                    chunks = mmap_chunks(args.file, chunk_size)
+                else:
+                    chunks = synthetic_ndjson(int(args.size_mb * MB), chunk_size)
+                result = measure_upload(session, url, chunks, args.content_type, verify=not args.no_verify)
+                results.append(result.summary())
+                print(f"{result.sent_bytes / MB:.1f} MB in {result.upload_s:.2f} s: {result.upload_mb_s:.1f} MB/s  "
+                      f"status {result.status}  echo {result.echo_matches}", file=sys.stderr)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    print(json.dumps(results, indent=2))
+    return 0 if all(r['status'] < 400 and r['echo_matches'] is not False for r in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""
+Generative negative-payload tests
+Thousands of invalid, boundary and malformed bodies per endpoint, derived from
+the suite schemas and fixture payloads. Runs only against the local stand-in:
+    pytest -m fuzz --standin=data/bench-1m.qads --fuzz-cases 5000
+"""
+
+import pytest
+
+from harness.fuzz import example_from_schema
+
+
+@pytest.mark.fuzz
+@pytest.mark.negative
+def test_fuzz_create_post(fuzz, post_schema, valid_post_payload):
+    """
+    TC-FUZ-001: POST /posts never fails on invalid, boundary or malformed payloads
+    Verifies: No 5xx or dropped connections; distinct failures shrunk to minimal cases
+    """
+    # Act
+    report = fuzz('jsonplaceholder', 'POST', '/posts', post_schema, valid_post_payload)
+    
+    # Assert
+    assert not report.failures, report.summary()
+
+
+@pytest.mark.fuzz
+@pytest.mark.negative
+def test_fuzz_replace_post(fuzz, post_schema, valid_post_payload):
+    """
+    TC-FUZ-002: PUT /posts/1 never fails on invalid, boundary or malformed payloads
+    Verifies: No 5xx or dropped connections
+    """
+    # Act
+    report = fuzz('jsonplaceholder', 'PUT', '/posts/1', post_schema, dict(valid_post_payload, id=1))
+    
+    # Assert
+    assert not report.failures, report.summary()
+
+
+@pytest.mark.fuzz
+@pytest.mark.negative
+def test_fuzz_create_user(fuzz, user_schema, valid_user_payload):
+    """
+    TC-FUZ-003: POST /api/users never fails on invalid, boundary or malformed payloads
+    Verifies: No 5xx or dropped connections; USER_SCHEMA fields added as unexpected input
+    """
+    # Act
+    report = fuzz('reqres', 'POST', '/users', user_schema, valid_user_payload)
+    
+    # Assert
+    assert not report.failures, report.summary()
+
+
+@pytest.mark.fuzz
+@pytest.mark.negative
+def test_fuzz_update_user(fuzz, user_schema):
+    """
+    TC-FUZ-004: PUT /api/users/2 never fails on invalid, boundary or malformed user objects
+    Verifies: No 5xx or dropped connections
+    """
+    # Act
+    report = fuzz('reqres', 'PUT', '/users/2', user_schema, example_from_schema(user_schema))
+    
+    # Assert
+    assert not report.failures, report.summary()
+
+
+@pytest.mark.fuzz
+@pytest.mark.auth
+@pytest.mark.negative
+def test_fuzz_register(fuzz):
+    """
+    TC-FUZ-005: POST /api/register never fails on invalid, boundary or malformed credentials
+    Verifies: No 5xx or dropped connections
+    """
+    # Arrange
+    schema = {'type': 'object', 'properties': {'email': {'type': 'string'}, 'password': {'type': 'string'}}}
+    
+    # Act
+    report = fuzz('reqres', 'POST', '/register', schema, {'email': 'eve.holt@reqres.in', 'password': 'pistol'})
+    
+    # Assert
+    assert not report.failures, report.summary()
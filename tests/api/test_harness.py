@@ -0,0 +1,1210 @@
+"""
+Offline tests for the test harness (harness/ package)
+These tests never touch the public APIs and can run without network access
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+import requests
+
+from harness.capacity import LoadGenerator, StepResult, Thresholds, report, search
+from harness.codec import OrjsonCodec, install as install_codec
+from harness.compare import NO_DIFFERENCE, compare, resolve_variant
+from harness.dataset import Dataset
+from harness.fuzz import RAW_MUTATIONS, Fuzzer, generate_cases
+from harness.history import RunHistory, connect, flaky, main as history_main, slowest, trend
+from harness.latency import MEETS, VIOLATES, SequentialLatencyTest
+from harness.memory import MemoryTracker
+from harness.monitor import Monitor, next_start
+from harness.metrics import MetricsRegistry, RequestMetrics, serve
+from harness.profiling import StackSampler, hot_functions
+from harness.rate_limit import RateLimiter, TokenBucket, parse_limits, throttle
+from harness.scenario import POST_LIFECYCLE, Scenario, ScenarioRunner, Step
+from harness.snapshot import SnapshotMismatch, SnapshotStore
+from harness.soak import detect_drift, parse_duration
+from harness.standin import StandInServer
+from harness.tracing import Tracer
+from harness.upload import MB, EchoDigest, StreamedBody, iter_chunks, measure_upload, mmap_chunks, synthetic_ndjson
+
+
+def _reserve_from_process(args):
+    """Reserve one token from a bucket opened in a separate process"""
+    state_dir, rate = args
+    return TokenBucket('shared', rate, state_dir=str(state_dir)).reserve()
+
+
+@pytest.mark.harness
+def test_token_bucket_enforces_rate_across_threads(tmp_path):
+    """
+    TC-HRN-001: Token bucket caps throughput for concurrent threads
+    Verifies: N acquisitions at R rps take at least (N - burst) / R seconds
+    """
+    # Arrange
+    bucket = TokenBucket('threads', rate=50, state_dir=str(tmp_path))
+    
+    # Act
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        list(pool.map(lambda _: bucket.acquire(), range(10)))
+    elapsed = time.time() - start
+    
+    # Assert
+    assert elapsed >= (10 - 1) / 50 * 0.95, f"Bucket allowed 10 requests in {elapsed:.3f}s"
+
+
+@pytest.mark.harness
+def test_token_bucket_queues_across_processes(tmp_path):
+    """
+    TC-HRN-002: Token bucket state is shared between worker processes
+    Verifies: Each process gets a distinct, increasing queue slot
+    """
+    # Act
+    with ProcessPoolExecutor(max_workers=4) as pool:
+        waits = sorted(pool.map(_reserve_from_process, [(tmp_path, 1)] * 4))
+    
+    # Assert
+    assert waits[0] == 0.0, "First caller should not wait"
+    for previous, current in zip(waits, waits[1:]):
+        assert current - previous == pytest.approx(1.0, abs=0.1), f"Slots not spaced at 1/rate: {waits}"
+
+
+@pytest.mark.harness
+def test_rate_limiter_async_and_unconfigured_hosts(tmp_path):
+    """
+    TC-HRN-003: Rate limiter throttles configured hosts only
+    Verifies: asyncio acquisition waits; hosts without a limit pass straight through
+    """
+    # Arrange
+    limiter = RateLimiter.from_endpoints(
+        {'slow': 'https://slow.example', 'free': 'http://127.0.0.1:8000'},
+        parse_limits(['slow=20']),
+        state_dir=str(tmp_path)
+    )
+    
+    async def burst(url):
+        return await asyncio.gather(*(limiter.acquire_async(url) for _ in range(3)))
+    
+    # Act
+    slow_waits = asyncio.run(burst('https://slow.example/users'))
+    free_waits = asyncio.run(burst('http://127.0.0.1:8000/posts'))
+    
+    # Assert
+    assert max(slow_waits) == pytest.approx(0.1, abs=0.02)
+    assert free_waits == [0.0, 0.0, 0.0]
+
+
+@pytest.mark.harness
+def test_throttled_session_excludes_wait_from_elapsed(standin, tmp_path):
+    """
+    TC-HRN-026: Rate-limit waits happen before requests times the exchange
+    Verifies: Queued requests are spaced at 1/rate but response.elapsed stays small; bad limits are rejected
+    """
+    # Arrange
+    limiter = RateLimiter.from_endpoints(
+        {'local': standin.url}, parse_limits(['local=4'], known={'local'}), state_dir=str(tmp_path)
+    )
+    session = throttle(requests.Session(), limiter)
+    url = f"{standin.url}/posts/1"
+
+    # Act
+    with session:
+        start = time.perf_counter()
+        responses = [session.get(url) for _ in range(3)]
+        wall = time.perf_counter() - start
+
+    # Assert
+    assert all(r.status_code == 200 for r in responses)
+    assert wall >= 2 / 4 * 0.95, f"3 requests at 4 rps finished in {wall:.3f}s"
+    for response in responses[1:]:
+        assert response.elapsed.total_seconds() < 0.2, f"Limiter wait counted in elapsed: {response.elapsed}"
+    with pytest.raises(ValueError, match="Unknown rate limit key 'typo'"):
+        parse_limits(['typo=2'], known={'local'})
+    with pytest.raises(ValueError, match="Rate for 'local' must be positive, got 0"):
+        parse_limits(['local=0'], known={'local'})
+
+
+@pytest.mark.harness
+def test_latency_slo_resamples_exclude_rate_limit_wait(standin, tmp_path, api_session, assert_latency_slo,
+                                                        monkeypatch):
+    """
+    TC-HRN-028: Sequential latency resamples on a rate-limited session time the exchange only
+    Verifies: Resamples queue at 1/rate, yet a 100ms SLO shorter than the queueing wait still passes
+    """
+    # Arrange
+    limiter = RateLimiter.from_endpoints({'local': standin.url}, {'local': 10}, state_dir=str(tmp_path))
+    monkeypatch.setattr(api_session, 'send', api_session.send)
+    throttle(api_session, limiter)
+    response = api_session.get(f"{standin.url}/posts/1")
+
+    # Act
+    started = time.perf_counter()
+    result = assert_latency_slo(response, max_time_ms=100, percentile=50, min_samples=4)
+    wall = time.perf_counter() - started
+
+    # Assert
+    resamples = len(result.samples) - 1
+    assert resamples >= 3, f"Expected min_samples to force resamples: {result.samples}"
+    assert wall >= resamples / 10 * 0.95, f"{resamples} resamples at 10 rps took {wall:.3f}s"
+    assert max(result.samples) < 50, f"Limiter wait counted in resample latency: {result.samples}"
+
+
+def _burn(seconds):
+    """Busy loop used as a known CPU hot spot"""
+    end = time.time() + seconds
+    total = 0
+    while time.time() < end:
+        total += sum(range(200))
+    return total
+
+
+def _idle(seconds):
+    """Sleep used as known off-CPU time"""
+    time.sleep(seconds)
+
+
+@pytest.mark.harness
+def test_stack_sampler_attributes_cpu_time_only():
+    """
+    TC-HRN-004: Stack sampler records on-CPU stacks and skips blocked time
+    Verifies: Busy function appears in hot functions; sleeping function does not
+    """
+    # Arrange
+    sampler = StackSampler(threading.get_ident(), interval=0.002)
+    if sampler._clock_id is None:
+        pytest.skip("Per-thread CPU clock not available on this platform")
+    
+    # Act
+    sampler.start()
+    _burn(0.2)
+    _idle(0.2)
+    sampler.stop()
+    
+    # Assert
+    hot = {label.split(' ')[0]: own for label, own, _ in hot_functions(sampler.stacks, top=50)}
+    assert '_burn' in hot, f"Busy function missing from profile: {sorted(hot)}"
+    assert hot.get('_idle', 0.0) < 0.02, "Sleep time was attributed as CPU time"
+    assert sum(sampler.stacks.values()) < 0.35, "Sampled CPU time exceeds wall time of busy work"
+
+
+@pytest.mark.harness
+@pytest.mark.parametrize('reset_peak', [True, False], ids=['reset-peak', 'no-reset-peak'])
+def test_memory_tracker_flags_retained_allocations(reset_peak, monkeypatch):
+    """
+    TC-HRN-005: Memory tracker separates transient peaks from retained growth
+    Verifies: Transient allocation is not flagged; retained allocation is flagged with its site;
+    without tracemalloc.reset_peak (Python 3.8) per-test peaks are reported as unavailable
+    """
+    # Arrange
+    if reset_peak and not hasattr(tracemalloc, 'reset_peak'):
+        pytest.skip('tracemalloc.reset_peak needs Python 3.9+')
+    monkeypatch.setattr('harness.memory.HAS_RESET_PEAK', reset_peak)
+    tracker = MemoryTracker(threshold_kb=512)
+    tracker.begin_session()
+    retained = []
+    
+    try:
+        # Act
+        tracker.start()
+        transient = bytearray(4 * 1024 * 1024)
+        del transient
+        clean = tracker.stop('transient')
+        
+        tracker.start()
+        retained.append(bytearray(2 * 1024 * 1024))
+        leaky = tracker.stop('leaky')
+    finally:
+        tracker.end_session()
+    
+    # Assert
+    assert not clean['flagged']
+    if reset_peak:
+        assert clean['peak_kb'] >= 4096
+    else:
+        assert clean['peak_kb'] is None and leaky['peak_kb'] is None
+    assert leaky['flagged'] and leaky['retained_kb'] > 1536
+    assert any('test_harness.py' in site['site'] for site in leaky['top_sites'])
+
+
+@pytest.mark.harness
+def test_snapshot_masks_volatile_fields(tmp_path):
+    """
+    TC-HRN-006: Snapshot comparison ignores masked volatile fields
+    Verifies: Recorded snapshot matches a response differing only in masked fields; updates skip matches
+    """
+    # Arrange
+    recorded = {"name": "QA Test User", "id": "42", "createdAt": "2025-10-01T10:00:00Z",
+                "meta": {"uuid": "b7f1", "tags": ["a", "b"]}}
+    replayed = dict(recorded, createdAt="2025-10-02T11:00:00Z", meta={"tags": ["a", "b"], "uuid": "c9d2"})
+    SnapshotStore(str(tmp_path), update=True).check('users/create', recorded)
+    path = tmp_path / 'users' / 'create.json'
+    os.utime(path, (0, 0))
+    
+    # Act
+    digest = SnapshotStore(str(tmp_path)).check('users/create', replayed)
+    SnapshotStore(str(tmp_path), update=True).check('users/create', replayed)
+    
+    # Assert
+    stored = path.read_text()
+    assert digest in stored
+    assert 'QA Test User' not in stored, "Snapshot file should only hold digests"
+    assert path.stat().st_mtime == 0, "--snapshot-update rewrote a matching snapshot"
+
+
+@pytest.mark.harness
+def test_snapshot_mismatch_reports_structural_diff(tmp_path):
+    """
+    TC-HRN-007: Snapshot mismatch reports the most specific differing paths
+    Verifies: Changed, added and missing fields are listed; unchanged siblings are not
+    """
+    # Arrange
+    recorded = {"data": [{"id": 1, "email": "a@reqres.in"}, {"id": 2, "email": "b@reqres.in"}], "page": 1}
+    replayed = {"data": [{"id": 1, "email": "a@reqres.in"}, {"id": 2, "email": "changed@reqres.in"}],
+                "total": 2}
+    SnapshotStore(str(tmp_path), update=True).check('users/list', recorded)
+    
+    # Act
+    with pytest.raises(SnapshotMismatch) as excinfo:
+        SnapshotStore(str(tmp_path)).check('users/list', replayed)
+    
+    # Assert
+    message = str(excinfo.value)
+    assert 'changed: data.1.email (now "changed@reqres.in")' in message
+    assert 'removed: page' in message
+    assert 'added: total' in message
+    assert 'data.0' not in message
+
+
+@pytest.mark.harness
+def test_soak_drift_detection():
+    """
+    TC-HRN-008: Soak trend test separates sustained drift from noise
+    Verifies: Steady FD growth is flagged; noisy but flat latency is stable
+    """
+    # Arrange
+    leaking_fds = [40 + i * 2 for i in range(30)]
+    noisy_latency = [120, 135, 118, 140, 122, 131, 119, 138, 125, 129] * 3
+    
+    # Act
+    leak = detect_drift(leaking_fds)
+    flat = detect_drift(noisy_latency)
+    short = detect_drift(leaking_fds[:5])
+    
+    # Assert
+    assert leak['verdict'] == 'drift', leak
+    assert flat['verdict'] == 'stable', flat
+    assert short['verdict'] == 'insufficient'
+    assert parse_duration('4h') == 14400 and parse_duration('90') == 90
+
+
+SHARDED_SUITE = """
+import os
+import time
+import pytest
+
+
+@pytest.fixture(scope='session')
+def warm_session():
+    with open(os.path.join(os.path.dirname(__file__), 'setups.log'), 'a') as f:
+        f.write(f"{os.getpid()}\\n")
+
+
+@pytest.mark.parametrize('n', range(24))
+def test_case(warm_session, n):
+    time.sleep(0.05 if n < 12 else 0.01)
+    assert n != 7
+"""
+
+
+@pytest.mark.harness
+def test_distributed_run_merges_worker_results(tmp_path):
+    """
+    TC-HRN-009: Coordinator with local workers runs every test exactly once
+    Verifies: Merged results.json schema, one session setup per worker, failure propagated
+    """
+    # Arrange
+    suite = tmp_path / 'suite'
+    suite.mkdir()
+    (suite / 'test_sample.py').write_text(textwrap.dedent(SHARDED_SUITE))
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    
+    # Act
+    completed = subprocess.run(
+        [sys.executable, '-m', 'harness.distributed', 'coordinator', '--bind', '127.0.0.1:0',
+         '--local-workers', '3', '--max-shard', '4', '--report', 'merged.json', '--', 'suite', '-q'],
+        cwd=str(tmp_path), env=env, capture_output=True, text=True, timeout=120
+    )
+    
+    # Assert
+    report = json.loads((tmp_path / 'merged.json').read_text())
+    assert completed.returncode == 1, completed.stderr[-2000:]
+    assert report['summary'] == {'passed': 23, 'failed': 1, 'total': 24, 'collected': 24}
+    assert len({test['nodeid'] for test in report['tests']}) == 24
+    assert {'created', 'duration', 'exitcode', 'root', 'environment', 'summary', 'tests'} <= set(report)
+    setups = (suite / 'setups.log').read_text().split()
+    assert len(setups) == len(set(setups)) <= 3, "Session fixture was set up more than once per worker"
+
+
+LAZY_SHARDED_SUITE = """
+from harness.cases import generated_cases, lazy_cases
+
+
+@lazy_cases('n', generated_cases(lambda: range(10)), ids='case-{}')
+def test_lazy(n):
+    assert n != 4
+
+
+def test_plain():
+    pass
+"""
+
+
+@pytest.mark.harness
+def test_distributed_run_completes_with_lazy_cases(tmp_path):
+    """
+    TC-HRN-029: Coordinator finishes when lazy cases report more nodeids than were collected
+    Verifies: Run completes once every shard item is done; per-case results are merged into the report
+    """
+    # Arrange
+    suite = tmp_path / 'suite'
+    suite.mkdir()
+    (suite / 'test_sample.py').write_text(textwrap.dedent(LAZY_SHARDED_SUITE))
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    
+    # Act
+    completed = subprocess.run(
+        [sys.executable, '-m', 'harness.distributed', 'coordinator', '--bind', '127.0.0.1:0',
+         '--local-workers', '2', '--max-shard', '1', '--report', 'merged.json', '--',
+         'suite', '-q', '-p', 'harness.cases', '--lazy-shards', '2'],
+        cwd=str(tmp_path), env=env, capture_output=True, text=True, timeout=60
+    )
+    
+    # Assert
+    report = json.loads((tmp_path / 'merged.json').read_text())
+    assert completed.returncode == 1, completed.stderr[-2000:]
+    nodeids = [test['nodeid'] for test in report['tests']]
+    assert report['summary']['collected'] == 3 and report['summary']['failed'] == 1
+    assert sorted(nodeid for nodeid in nodeids if 'case-' in nodeid) == \
+        sorted(f"suite/test_sample.py::test_lazy[case-{n}]" for n in range(10))
+    assert nodeids[:3] == ['suite/test_sample.py::test_lazy[lazy1of2]', 'suite/test_sample.py::test_lazy[lazy2of2]',
+                           'suite/test_sample.py::test_plain']
+
+
+@pytest.mark.harness
+def test_sequential_latency_clear_cases_decide_fast():
+    """
+    TC-HRN-010: Sequential latency test decides clear cases in two or three samples
+    Verifies: Jittery fast endpoint meets, slow endpoint violates, without resampling much
+    """
+    # Arrange
+    slo = SequentialLatencyTest(threshold_ms=500, pct=95)
+    
+    # Act
+    fast_samples = iter([60.0, 52.0, 48.0, 55.0])
+    fast = slo.run(lambda: next(fast_samples), first_ms=45.0)
+    slow = slo.run(lambda: 1400.0, first_ms=1600.0)
+    
+    # Assert
+    assert fast.verdict == MEETS and len(fast.samples) <= 3
+    assert slow.verdict == VIOLATES and len(slow.samples) == 2
+
+
+@pytest.mark.harness
+def test_sequential_latency_error_rate_on_borderline_endpoints():
+    """
+    TC-HRN-011: Sequential latency test keeps its error rates near the SLO boundary
+    Verifies: Borderline endpoints use more samples; wrong verdicts stay below alpha/beta
+    """
+    # Arrange
+    rng = random.Random(1234)
+    slo = SequentialLatencyTest(threshold_ms=500, pct=95)
+    z95 = 1.6449
+    
+    def endpoint(p95_ms):
+        mu = math.log(p95_ms) - z95 * 0.5
+        return lambda: rng.lognormvariate(mu, 0.5)
+    
+    # Act: p95 of 350ms clearly meets, 700ms clearly violates the 500ms SLO
+    good = [slo.run(endpoint(350)) for _ in range(300)]
+    bad = [slo.run(endpoint(700)) for _ in range(300)]
+    
+    # Assert
+    false_fail = sum(result.verdict == VIOLATES for result in good) / len(good)
+    false_pass = sum(result.verdict == MEETS for result in bad) / len(bad)
+    assert false_fail <= 0.05 and false_pass <= 0.05, (false_fail, false_pass)
+    assert max(len(result.samples) for result in good + bad) > 2, "Borderline cases should resample"
+
+
+@pytest.mark.harness
+def test_sequential_latency_steady_endpoints_meet_below_threshold():
+    """
+    TC-HRN-030: Sequential latency test passes steady sub-threshold endpoints at once
+    Verifies: Constant latencies below the threshold meet after one resend, however close
+    """
+    # Arrange
+    cases = [(500, 200.0), (500, 300.0), (500, 450.0), (1000, 500.0), (1000, 950.0)]
+
+    # Act
+    results = [(threshold, SequentialLatencyTest(threshold_ms=threshold).run(lambda: latency, first_ms=latency))
+               for threshold, latency in cases]
+
+    # Assert
+    for threshold, result in results:
+        assert result.verdict == MEETS and len(result.samples) == 2, result.describe(threshold, 95)
+
+
+@pytest.fixture
+def standin(tmp_path):
+    """Stand-in API over a small generated dataset"""
+    dataset = Dataset.generate(str(tmp_path / 'bench.qads'), posts=2000, seed=7)
+    server = StandInServer(dataset).start()
+    yield server
+    server.stop()
+    dataset.close()
+
+
+@pytest.mark.harness
+def test_dataset_generation_is_deterministic(tmp_path, post_schema, user_schema, assert_json_schema):
+    """
+    TC-HRN-012: Same seed produces the same dataset; rows match the suite schemas
+    Verifies: Byte-identical files for equal seeds; USER_SCHEMA and POST_SCHEMA compliance
+    """
+    # Act
+    first = Dataset.generate(str(tmp_path / 'a.qads'), posts=500, seed=3)
+    second = Dataset.generate(str(tmp_path / 'b.qads'), posts=500, seed=3)
+    
+    # Assert
+    assert (tmp_path / 'a.qads').read_bytes() == (tmp_path / 'b.qads').read_bytes()
+    assert first.post(123) == second.post(123)
+    assert first.counts == {'users': 50, 'posts': 500, 'comments': 2500, 'todos': 1000}
+    assert_json_schema(first.post(0), post_schema)
+    assert_json_schema(first.user(0), user_schema)
+    first.close()
+    second.close()
+
+
+@pytest.mark.harness
+def test_standin_filters_match_full_scan(standin):
+    """
+    TC-HRN-013: Indexed stand-in filters return exactly the rows a full scan would
+    Verifies: userId, postId and completed filters, _limit and page handling
+    """
+    # Arrange
+    dataset = standin.api.dataset
+    expected_posts = [row + 1 for row in range(dataset.counts['posts'])
+                      if dataset.columns['posts.userId'][row] == 17]
+    expected_todos = [row + 1 for row in range(dataset.counts['todos'])
+                      if dataset.columns['todos.userId'][row] == 4 and not dataset.columns['todos.completed'][row]]
+    
+    # Act
+    posts = requests.get(f"{standin.url}/posts", params={'userId': 17}).json()
+    todos = requests.get(f"{standin.url}/todos", params={'userId': 4, 'completed': 'false'}).json()
+    comments = requests.get(f"{standin.url}/comments", params={'postId': 5, '_limit': 2}).json()
+    users = requests.get(f"{standin.url}/api/users", params={'page': 3}).json()
+    
+    # Assert
+    assert [post['id'] for post in posts] == expected_posts
+    assert [todo['id'] for todo in todos] == expected_todos
+    assert len(comments) <= 2 and all(comment['postId'] == 5 for comment in comments)
+    assert users['page'] == 3 and [user['id'] for user in users['data']] == [13, 14, 15, 16, 17, 18]
+
+
+@pytest.mark.harness
+def test_standin_basic_auth_rejects_malformed_credentials(standin):
+    """
+    TC-HRN-032: Stand-in basic auth answers malformed credentials with 401, not a server error
+    Verifies: Valid login, wrong password, invalid base64 and non-ASCII credentials
+    """
+    # Arrange
+    url = f"{standin.url}/basic-auth/testuser/testpass"
+
+    # Act
+    valid = requests.get(url, auth=('testuser', 'testpass'))
+    wrong = requests.get(url, auth=('testuser', 'wrong'))
+    malformed = requests.get(url, headers={'Authorization': 'Basic not-base64!'})
+    non_ascii = requests.get(url, headers={'Authorization': 'Basic dGVzdA==\u00e9'.encode('utf-8')})
+
+    # Assert
+    assert valid.status_code == 200 and valid.json() == {'authenticated': True, 'user': 'testuser'}
+    assert [wrong.status_code, malformed.status_code, non_ascii.status_code] == [401, 401, 401]
+
+
+@pytest.mark.harness
+def test_metrics_exposition_labels_and_scrape(standin):
+    """
+    TC-HRN-014: Request metrics use low-cardinality labels and valid OpenMetrics text
+    Verifies: API key and route template labels, status classes, failed requests, scrape endpoint
+    """
+    # Arrange
+    registry = MetricsRegistry()
+    session = RequestMetrics(registry, standin.endpoints()).instrument(requests.Session())
+    server = serve(registry, 0)
+    
+    # Act
+    for post_id in (1, 2, 3):
+        session.get(f"{standin.url}/posts/{post_id}/comments")
+    session.get(f"{standin.url}/api/users/999999")
+    session.post(f"{standin.url}/api/users", json={'name': 'QA Test User', 'job': 'Test Engineer'})
+    with pytest.raises(requests.ConnectionError):
+        session.get('http://127.0.0.1:9/posts/1', timeout=1)
+    scraped = requests.get(f"http://127.0.0.1:{server.server_port}/metrics")
+    server.shutdown()
+    server.server_close()
+    
+    # Assert
+    assert registry.value('api_requests', route='/posts/{id}/comments', status_class='2xx') == 3
+    assert registry.value('api_requests', api='reqres', route='/api/users/{id}', status_class='4xx') == 1
+    assert registry.value('api_requests', status_class='error') == 1
+    assert registry.value('api_request_sent_bytes', method='POST') > 0
+    assert registry.value('api_response_received_bytes', api='jsonplaceholder') > 0
+    assert scraped.headers['Content-Type'].startswith('application/openmetrics-text')
+    lines = scraped.text.splitlines()
+    assert lines[-1] == '# EOF'
+    assert ('api_request_duration_seconds_count{api="jsonplaceholder",method="GET",'
+            'route="/posts/{id}/comments"} 3') in lines
+
+
+@pytest.mark.harness
+def test_scenario_runner_bounds_in_flight_and_threads_data(standin):
+    """
+    TC-HRN-015: Workflow instances run concurrently with bounded depth and carry data between steps
+    Verifies: Max in-flight requests <= concurrency, extracted ids reused, failures counted per step
+    """
+    # Arrange
+    in_flight, peak, lock = [0], [0], threading.Lock()
+    
+    class CountingSession(requests.Session):
+        def send(self, request, **kwargs):
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            try:
+                return super().send(request, **kwargs)
+            finally:
+                with lock:
+                    in_flight[0] -= 1
+    
+    def same_post(response, context):
+        assert response.json()['id'] == context['id']
+    
+    checked = Scenario('checked', 'jsonplaceholder', list(POST_LIFECYCLE.steps[:3]) + [
+        Step('patch', 'PATCH', '/posts/{id}', json={'title': 'x'}, check=same_post),
+        Step('missing', 'GET', '/posts/{instance}000000'),
+    ])
+    runner = ScenarioRunner(CountingSession(), standin.url)
+    
+    # Act
+    passing = runner.run(POST_LIFECYCLE, instances=200, concurrency=8)
+    failing = runner.run(checked, instances=20, concurrency=4)
+    
+    # Assert
+    assert passing.completed == 200 and passing.failed == 0
+    assert 1 < peak[0] <= 8
+    assert passing.summary()['steps']['update']['count'] == 200
+    assert failing.completed == 0 and failing.failures == {'missing': 20}
+    assert failing.step_ms['patch'] and 'expected 200, got 404' in failing.errors[0]
+
+
+@pytest.mark.harness
+def test_tracer_propagates_traceparent_and_nests_spans(standin):
+    """
+    TC-HRN-016: Requests carry a traceparent matching their span; spans nest and export as Chrome trace
+    Verifies: Header format, parent/child ids, decode span, complete events in the trace file
+    """
+    # Arrange
+    tracer = Tracer()
+    session = tracer.instrument(requests.Session())
+    
+    # Act
+    with tracer.span('test', 'test'):
+        with tracer.span('call', 'phase'):
+            echoed = session.get(f"{standin.url}/headers").json()['headers']
+    trace = tracer.chrome_trace()
+    
+    # Assert
+    spans = {span.id: (name, span) for name, _, _, _, _, _, span in tracer.spans}
+    request_id = next(span.id for name, span in spans.values() if name == 'GET /headers')
+    assert echoed['traceparent'] == f"00-{tracer.trace_id}-{request_id}-01"
+    call_id = spans[request_id][1].parent
+    assert spans[call_id][0] == 'call'
+    decode = next(span for name, span in spans.values() if name == 'decode')
+    assert decode.parent == call_id and decode.args['bytes'] > 0
+    events = [event for event in trace['traceEvents'] if event['ph'] == 'X']
+    assert [event['name'] for event in events] == ['GET /headers', 'decode', 'call', 'test']
+    assert all(event['dur'] >= 0 and event['args']['trace_id'] == tracer.trace_id for event in events)
+    assert json.loads(json.dumps(trace)) == trace
+
+
+@pytest.mark.harness
+def test_tracer_keeps_rate_limit_wait_out_of_request_spans(standin, tmp_path):
+    """
+    TC-HRN-031: A rate-limit wait is traced as its own throttle span, not as request time
+    Verifies: Throttle span is a sibling ending where the request span starts; request spans exclude the wait
+    """
+    # Arrange
+    limiter = RateLimiter.from_endpoints({'local': standin.url}, {'local': 10}, state_dir=str(tmp_path))
+    tracer = Tracer()
+    session = tracer.instrument(throttle(requests.Session(), limiter))
+
+    # Act
+    with session, tracer.span('call', 'phase'):
+        for _ in range(3):
+            session.get(f"{standin.url}/posts/1")
+
+    # Assert
+    sent = [(start, end, span) for name, _, start, end, _, _, span in tracer.spans if name == 'GET /posts/{id}']
+    throttles = [(start, end, span) for name, _, start, end, _, _, span in tracer.spans if name == 'throttle']
+    assert len(sent) == 3 and len(throttles) == 2
+    for (wait_start, wait_end, wait), (start, end, request) in zip(throttles, sent[1:]):
+        assert wait.parent == request.parent and wait_end == start
+        assert wait_end - wait_start >= 0.08e9, "Second and third requests queue for about 100ms"
+        assert end - start < 0.05e9, f"Limiter wait counted in request span: {(end - start) / 1e6:.1f}ms"
+
+
+@pytest.mark.harness
+def test_comparison_verdicts_and_variant_undo():
+    """
+    TC-HRN-017: A/A comparisons report no difference, real shifts are detected, variants undo cleanly
+    Verifies: Bootstrap ratio intervals, verdicts, header and pool variants restore the session
+    """
+    # Arrange
+    rng = random.Random(11)
+    reference = [rng.lognormvariate(math.log(100), 0.3) for _ in range(60)]
+    same = [rng.lognormvariate(math.log(100), 0.3) for _ in range(60)]
+    slower = [rng.lognormvariate(math.log(150), 0.3) for _ in range(60)]
+    samples = {'a': {'GET /users': reference}, 'b': {'GET /users': same}, 'c': {'GET /users': slower}}
+    session = requests.Session()
+    adapter = session.get_adapter('https://')
+    
+    # Act
+    report = compare(samples, ['a', 'b', 'c'])['GET /users']
+    undo_header = resolve_variant('no-keepalive', {})(session)
+    patched = (session.headers.get('Connection'), session.get_adapter('https://'))
+    undo_header()
+    undo_pool = resolve_variant('pool-2', {})(session)
+    resized = session.get_adapter('https://')
+    undo_pool()
+    
+    # Assert
+    assert report['b']['verdict'] == NO_DIFFERENCE
+    assert report['b']['ci'][0] < 1 < report['b']['ci'][1]
+    assert report['c']['verdict'] == 'slower' and report['c']['ci'][0] > 1.2
+    assert patched[0] == 'close' and patched[1] is not adapter
+    assert resized._pool_maxsize == 2
+    assert session.headers['Connection'] == 'keep-alive' and session.get_adapter('https://') is adapter
+    with pytest.raises(pytest.UsageError):
+        resolve_variant('http3', {})
+
+
+@pytest.mark.harness
+def test_fuzzer_dedups_and_shrinks_failures(standin, post_schema, valid_post_payload):
+    """
+    TC-HRN-018: Generated cases are distinct and reproducible; failures are grouped and shrunk
+    Verifies: Deterministic generation, signature de-duplication, minimal mutation sets and seeds
+    """
+    # Arrange - treat the stand-in's malformed-JSON rejection as the failure being hunted
+    first = [case.encode() for case in generate_cases(post_schema, valid_post_payload, 400, rng_seed=5)]
+    second = [case.encode() for case in generate_cases(post_schema, valid_post_payload, 400, rng_seed=5)]
+    fuzzer = Fuzzer(f"{standin.url}/posts", 'POST', concurrency=4,
+                    oracle=lambda outcome: b'Malformed JSON' in outcome.body)
+    
+    # Act
+    report = fuzzer.run(generate_cases(post_schema, valid_post_payload, 400, rng_seed=5))
+    
+    # Assert
+    assert first == second and len(set(first)) == 400
+    assert report.cases == 400
+    assert list(report.failures) == ['400 Malformed JSON body']
+    failure = report.failures['400 Malformed JSON body']
+    assert 10 < failure.count <= report.statuses['400']
+    assert len(failure.minimal.mutations) == 1 and failure.minimal.mutations[0].op == 'raw'
+    assert len(failure.minimal.seed) < len(valid_post_payload)
+    for body in (b'{}', b'{"a": {}}'):
+        # Only the encoding is invalid: the same bytes read as Latin-1 are well-formed JSON
+        assert json.loads(RAW_MUTATIONS['invalid-utf8'](body).decode('latin-1'))['\xff\xfe'] == 1
+
+
+@pytest.mark.harness
+def test_fast_json_codec_matches_stdlib_results_and_errors(standin):
+    """
+    TC-HRN-019: The fast codec returns the same values and raises the same exceptions as requests
+    Verifies: Decoding edge cases (NaN, big ints, BOM, bad UTF-8, UTF-16, malformed), stdlib json= bytes
+    """
+    pytest.importorskip('orjson')
+    # Arrange
+    bodies = [
+        (b'{"a": [1, 2.5, "\\u00e9", null, true]}', 'utf-8'), (b'{"v": NaN}', 'utf-8'),
+        (b'{"big": 123456789012345678901234567890}', 'utf-8'), (b'\xef\xbb\xbf{"a": 1}', 'utf-8'),
+        (b'{"a": "\xff"}', 'utf-8'), ('{"a": 1}'.encode('utf-16'), None), (b'{invalid json}', 'utf-8'),
+        (b'', 'utf-8'), (b'{"a": 1, "a": 2}', 'ISO-8859-1'), (b'[1e400, -0, "12345678901234567890"]', 'utf-8'),
+        # A big int straddling the first 64 KiB scan window
+        (b' ' * 65527 + b'[23456789012345678901]', 'utf-8'),
+    ]
+    fast, plain = requests.Session(), requests.Session()
+    undo = install_codec(fast, OrjsonCodec())
+
+    def outcome(call):
+        try:
+            return 'ok', call()
+        except Exception as e:
+            return type(e), str(e)
+
+    # Act & Assert - decoding
+    for body, encoding in bodies:
+        response = requests.Response()
+        response._content, response.encoding = body, encoding
+        expected = outcome(response.json)
+        fast.hooks['response'][-1](response)
+        assert outcome(response.json) == expected, body[:40]
+    
+    # Act & Assert - json= bodies are byte-identical to the stdlib encoding
+    payload = {'title': 'caf\u00e9 \u2603 \U0001F600', 'ids': [1, 2], 'nested': {'ok': True, 'none': None},
+               'ratio': 0.1}
+    sent = fast.post(f"{standin.url}/post", json=payload)
+    assert sent.request.body == json.dumps(payload).encode('utf-8')
+    assert sent.request.body == plain.post(f"{standin.url}/post", json=payload).request.body
+    assert sent.json()['json'] == payload and sent.json()['headers']['Content-Type'] == 'application/json'
+    for invalid in ({'v': float('nan')}, {'tags': {1, 2}}, {1: 'int key'}):
+        assert outcome(lambda: fast.post(f"{standin.url}/post", json=invalid).json()['json']) == \
+            outcome(lambda: plain.post(f"{standin.url}/post", json=invalid).json()['json'])
+    undo()
+    assert fast.json_codec.fast is False
+
+
+HISTORY_SUITE = """
+import os
+import time
+import pytest
+
+
+@pytest.mark.smoke
+def test_slow():
+    time.sleep(0.05)
+
+
+def test_alternating():
+    with open('runs.log', 'a') as f:
+        f.write('x')
+    assert os.path.getsize('runs.log') % 2 == 1
+
+
+def test_stable():
+    pass
+"""
+
+
+@pytest.mark.harness
+def test_run_history_records_runs_and_answers_trend_queries(tmp_path, capsys):
+    """
+    TC-HRN-020: Every run is appended to the history store and the trend queries read it back
+    Verifies: Outcomes, durations, markers and commits per run; slowest, flaky and p95 trend queries
+    """
+    # Arrange
+    (tmp_path / 'pytest.ini').write_text('[pytest]\nmarkers =\n    smoke: quick checks\n')
+    (tmp_path / 'test_sample.py').write_text(textwrap.dedent(HISTORY_SUITE))
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    database = str(tmp_path / 'history.db')
+    
+    # Act
+    for run in range(4):
+        subprocess.run(
+            [sys.executable, '-m', 'pytest', '-q', '-p', 'harness.history', f'--history-db={database}',
+             f'--history-commit=c{run}', 'test_sample.py'],
+            cwd=str(tmp_path), env=env, capture_output=True, text=True, timeout=120
+        )
+    for run, p95 in enumerate((40.0, 42.0, 80.0)):
+        history = RunHistory(database, commit=f"l{run}")
+        history.add_latency('GET /api/users', [10.0] * 18 + [p95] * 2, 0)
+        history.add_latency('POST /api/users', [20.0] * 20, 1)
+        history.add_latency('GET /api/users/{id}', [5.0] * 20, 0)
+        history.flush(finished=time.time())
+    
+    # Assert
+    db = connect(database)
+    commits = [row[0] for row in db.execute('SELECT git_commit FROM runs ORDER BY id')]
+    outcomes = [row[0] for row in db.execute(
+        "SELECT outcome FROM results WHERE nodeid LIKE '%alternating' ORDER BY started")]
+    assert commits == ['c0', 'c1', 'c2', 'c3', 'l0', 'l1', 'l2']
+    assert outcomes == ['passed', 'failed', 'passed', 'failed']
+    
+    slow = slowest(db)
+    assert slow[0]['nodeid'] == 'test_sample.py::test_slow' and slow[0]['runs'] == 4 and slow[0]['mean_s'] >= 0.05
+    assert [row['nodeid'] for row in slowest(db, marker='smoke')] == ['test_sample.py::test_slow']
+    
+    flakes = flaky(db)
+    assert [(row['nodeid'], row['failures'], row['flips'], row['flip_rate']) for row in flakes] == \
+        [('test_sample.py::test_alternating', 2, 3, 1.0)]
+    assert flaky(db, marker='smoke') == []
+    
+    users = trend(db, '/users')
+    assert [row['p95_ms'] for row in users if row['endpoint'] == 'GET /api/users'] == [40.0, 42.0, 80.0]
+    assert {row['endpoint'] for row in users} == {'GET /api/users', 'POST /api/users'}
+    assert [row['errors'] for row in trend(db, 'POST /users')] == [1, 1, 1]
+    db.close()
+    
+    assert history_main(['--db', database, 'flaky']) == 0
+    assert 'test_sample.py::test_alternating' in capsys.readouterr().out
+
+
+MONITORED_SUITE = """
+import os
+import pytest
+
+
+@pytest.fixture(scope='session')
+def warm_session():
+    with open('setups.log', 'a') as f:
+        f.write('x')
+
+
+def test_canary(warm_session):
+    with open('cycles.log', 'a') as f:
+        f.write('x')
+    assert os.path.getsize('cycles.log') not in (2, 3, 4), 'outage'
+
+
+def test_always_up(warm_session):
+    pass
+"""
+
+
+@pytest.mark.harness
+def test_monitor_alerts_only_on_state_change(tmp_path):
+    """
+    TC-HRN-021: The resident monitor re-runs tests on one warm session and alerts on state changes only
+    Verifies: Hysteresis of test checks, latency check, bounded windows, anchored jittered schedule
+    """
+    # Arrange
+    (tmp_path / 'test_sample.py').write_text(textwrap.dedent(MONITORED_SUITE))
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    monitor = Monitor(window=10, fail_after=2, p95_ms=100)
+    rng = random.Random(1)
+    
+    # Act
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, '-m', 'pytest', '-q', '-p', 'harness.monitor', '--monitor', '0.2',
+         '--monitor-cycles', '7', '--monitor-file=alerts.jsonl', 'test_sample.py'],
+        cwd=str(tmp_path), env=env, capture_output=True, text=True, timeout=120
+    )
+    elapsed = time.perf_counter() - started
+    states = []
+    for latency in [50.0] * 10 + [150.0] * 10 + [50.0] * 10:
+        monitor.record_latency('GET /posts', latency)
+        states.extend(alert['to'] for alert in monitor.evaluate(0))
+    starts = [next_start(100.0, 10.0, 0.1, now, rng) for now in (100.0, 105.0, 137.5)]
+    
+    # Assert
+    alerts = [json.loads(line) for line in (tmp_path / 'alerts.jsonl').read_text().splitlines()]
+    assert completed.returncode == 0, completed.stdout[-2000:]
+    assert [(alert['cycle'], alert['to']) for alert in alerts] == [(3, 'down'), (6, 'up')]
+    assert alerts[0]['name'] == 'test_sample.py::test_canary' and 'outage' in alerts[0]['detail']
+    assert (tmp_path / 'setups.log').read_text() == 'x', "Session fixture was set up more than once"
+    assert 6 * 0.2 <= elapsed
+    assert states == ['slow', 'ok']
+    assert len(monitor.latencies['GET /posts']) == 10
+    assert 110.0 <= starts[0] <= 111.0 and 110.0 <= starts[1] <= 111.0 and 140.0 <= starts[2] <= 141.0
+
+
+@pytest.mark.harness
+def test_capacity_search_finds_limit_and_knee(standin, tmp_path):
+    """
+    TC-HRN-022: Capacity search brackets the highest passing concurrency and reports the knee
+    Verifies: Doubling + bisection on a saturating model, k6 thresholds parsing, load-test.js mix on the stand-in
+    """
+    # Arrange
+    def saturating_target(concurrency):
+        # 100 rps per client up to 1000 rps; beyond that only queueing delay grows
+        rps = min(concurrency * 100, 1000)
+        p95 = 1.5 * concurrency / rps * 1000
+        return StepResult(concurrency, duration_s=1.0, requests=rps, latencies_ms=[p95] * rps)
+    
+    script = tmp_path / 'load-test.js'
+    script.write_text("thresholds: {\n http_req_failed: ['rate<0.02'],\n http_req_duration: ['p(95)<800'],\n}")
+    
+    # Act
+    steps = search(saturating_target, Thresholds(p95_ms=500), max_concurrency=1024)
+    result = report(steps, Thresholds(p95_ms=500), 1024)
+    step = LoadGenerator(standin.endpoints()).run_step(concurrency=2, duration=0.3)
+    
+    # Assert
+    assert [step.concurrency for step in steps] == [1, 2, 4, 8, 16, 32, 64, 128, 256, 320, 328, 332, 333, 334,
+                                                     336, 352, 384, 512]
+    assert result['max_sustainable_rps'] == 1000.0 and result['at_concurrency'] == 16
+    assert result['max_passing_concurrency'] == 333
+    assert result['limit_reached'] and result['knee']['concurrency'] == 8
+    assert Thresholds.from_k6() == Thresholds(p95_ms=500, failed_rate=0.01, api_error_rate=0.05)
+    assert Thresholds.from_k6(str(script)) == Thresholds(p95_ms=800, failed_rate=0.02, api_error_rate=0.05)
+    assert step.requests > 10 and step.failed == 0 and step.api_errors == 0
+
+
+LAZY_SUITE = """
+from harness.cases import csv_cases, generated_cases, jsonl_cases, lazy_cases
+
+
+@lazy_cases('n', generated_cases(lambda: range(10 ** 6)))
+def test_million(n):
+    assert n >= 0
+
+
+@lazy_cases('row', jsonl_cases('rows.jsonl'), ids=lambda row: f"row-{row['n']}")
+def test_rows(row):
+    with open('seen.log', 'a') as f:
+        f.write(f"{row['n']}\\n")
+    assert row['n'] % 250 != 0
+
+
+@lazy_cases('n', csv_cases('rows.csv', column='n', convert=int), ids='csv-{}')
+def test_csv(n):
+    assert n % 300 != 0
+"""
+
+
+@pytest.mark.harness
+def test_lazy_cases_report_individually_without_collecting_them(tmp_path):
+    """
+    TC-HRN-023: Lazily parametrized cases are read per shard at run time and reported one by one
+    Verifies: Collection independent of case count, byte-range shards cover each line once, case reruns
+    """
+    # Arrange
+    (tmp_path / 'test_sample.py').write_text(textwrap.dedent(LAZY_SUITE))
+    (tmp_path / 'rows.jsonl').write_text(''.join(json.dumps({'n': n, 'pad': 'x' * (n % 7)}) + '\n'
+                                                 for n in range(1000)))
+    (tmp_path / 'rows.csv').write_text('n,label\n' + ''.join(f"{n},\"row, {n}\"\n" for n in range(1000)))
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    
+    def pytest_run(*args):
+        return subprocess.run(
+            [sys.executable, '-m', 'pytest', '-p', 'harness.cases', '-p', 'no:cacheprovider', '-q', '-rf',
+             'test_sample.py', *args], cwd=str(tmp_path), env=env, capture_output=True, text=True, timeout=120
+        )
+    
+    # Act
+    started = time.perf_counter()
+    collected = pytest_run('--collect-only', '--lazy-shards', '4')
+    collect_s = time.perf_counter() - started
+    completed = pytest_run('--lazy-shards', '3', '-k', 'rows or csv')
+    seen = (tmp_path / 'seen.log').read_text().split()
+    rerun = pytest_run('--lazy-shards', '3', '--lazy-case', 'row-500', '--lazy-case', 'csv-600',
+                       '-k', 'rows or csv')
+    
+    # Assert
+    assert '12 tests collected' in collected.stdout and collect_s < 15
+    failed = sorted(line.split()[1] for line in completed.stdout.splitlines() if line.startswith('FAILED'))
+    assert failed == ['test_sample.py::test_csv[csv-0]', 'test_sample.py::test_csv[csv-300]',
+                      'test_sample.py::test_csv[csv-600]', 'test_sample.py::test_csv[csv-900]',
+                      'test_sample.py::test_rows[row-0]', 'test_sample.py::test_rows[row-250]',
+                      'test_sample.py::test_rows[row-500]', 'test_sample.py::test_rows[row-750]']
+    assert '8 failed, 1998 passed' in completed.stdout and '_ test_rows[row-250] _' in completed.stdout
+    assert sorted(map(int, seen[:1000])) == list(range(1000))
+    assert '2 failed, 6 passed' in rerun.stdout  # the failing cases plus the shard items
+
+
+LAZY_OUTCOMES_SUITE = """
+import pytest
+
+from harness.cases import generated_cases, lazy_cases
+
+
+@lazy_cases('n', generated_cases(lambda: range(5)))
+def test_outcomes(n):
+    with open('ran.log', 'a') as f:
+        f.write(f"{n}\\n")
+    if n == 1:
+        pytest.fail('case 1 failed')
+    if n == 2:
+        pytest.skip('case 2 skipped')
+    if n == 3:
+        pytest.xfail('case 3 known bug')
+
+
+@pytest.mark.xfail(reason='known bug', strict=True)
+@lazy_cases('n', generated_cases(lambda: range(3)))
+def test_marked(n):
+    assert n != 1
+"""
+
+
+@pytest.mark.harness
+def test_lazy_cases_fail_skip_and_xfail_per_case(tmp_path):
+    """
+    TC-HRN-027: pytest.fail, skip and xfail in one lazy case do not affect the other cases
+    Verifies: Failed middle case is reported and later cases still run; xfail markers apply per case
+    """
+    # Arrange
+    (tmp_path / 'test_sample.py').write_text(textwrap.dedent(LAZY_OUTCOMES_SUITE))
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    
+    # Act
+    completed = subprocess.run(
+        [sys.executable, '-m', 'pytest', '-p', 'harness.cases', '-p', 'no:cacheprovider', '-q', '-rfxXs',
+         'test_sample.py'], cwd=str(tmp_path), env=env, capture_output=True, text=True, timeout=120
+    )
+    
+    # Assert
+    assert (tmp_path / 'ran.log').read_text().split() == ['0', '1', '2', '3', '4']
+    assert 'FAILED test_sample.py::test_outcomes[1] - Failed: case 1 failed' in completed.stdout
+    assert 'XFAIL test_sample.py::test_outcomes[3] - case 3 known bug' in completed.stdout
+    assert 'XFAIL test_sample.py::test_marked[1] - known bug' in completed.stdout
+    assert 'FAILED test_sample.py::test_marked[0]' in completed.stdout and 'XPASS(strict)' in completed.stdout
+    assert '3 failed, 4 passed, 1 skipped, 2 xfailed' in completed.stdout  # plus the two shard items
+
+
+@pytest.mark.harness
+def test_streamed_upload_round_trips_through_the_echo(standin, tmp_path):
+    """
+    TC-HRN-024: Chunked uploads from generators and memory-mapped files are echoed byte for byte
+    Verifies: Chunked request bodies, streamed echo comparison across split escapes, MB/s
+    """
+    # Arrange
+    rng = random.Random(3)
+    text = ''.join(rng.choice(['a', '"', '\\', '\n', 'é', '\U0001F600', '/', '\x01']) for _ in range(5000))
+    echoed = json.dumps({'args': {'page': '1'}, 'data': text, 'json': None}).encode()
+    path = tmp_path / 'import.ndjson'
+    with open(path, 'wb') as f:
+        for chunk in synthetic_ndjson(3 * MB):
+            f.write(chunk)
+    session = requests.Session()
+    
+    # Act
+    digests = []
+    for size in (1, 2, 5, 7, 4096):
+        digest = EchoDigest()
+        for offset in range(0, len(echoed), size):
+            digest.feed(echoed[offset:offset + size])
+        digests.append(digest.hexdigest())
+    generated = measure_upload(session, f"{standin.url}/post", synthetic_ndjson(8 * MB, 64 * 1024))
+    mapped = measure_upload(session, f"{standin.url}/post", mmap_chunks(str(path)))
+    body = StreamedBody(iter([b'{"a": ', b'', '1}']))
+    chunked = session.post(f"{standin.url}/post", data=body, headers={'Content-Type': 'application/json'}).json()
+    invalid = session.post(f"{standin.url}/posts", data=iter([b'{"title": ']),
+                           headers={'Content-Type': 'application/json'})
+    
+    # Assert
+    expected = hashlib.sha256(text.encode()).hexdigest()
+    assert digests == [expected] * 5
+    assert [len(chunk) for chunk in iter_chunks([b'ab', 'cde', b'f' * 7], 4)] == [4, 4, 4]
+    assert generated.echo_matches and generated.sent_bytes >= 8 * MB and generated.chunks > 100
+    assert generated.upload_mb_s > 0 and generated.summary()['echo_bytes'] == generated.sent_bytes
+    assert mapped.echo_matches and mapped.sent_bytes == os.path.getsize(path)
+    assert chunked['headers']['Transfer-Encoding'] == 'chunked' and 'Content-Length' not in chunked['headers']
+    assert chunked['json'] == {'a': 1} and body.sent == 8 and body.chunks == 2
+    assert invalid.status_code == 400
+
+
+IMPACT_CONFTEST = """
+import pytest
+from harness.dataset import Dataset
+from harness.impact import record_schema
+from harness.standin import StandInServer
+
+ITEM_SCHEMA = {'type': 'object', 'required': ['id']}
+
+
+@pytest.fixture(scope='session')
+def base_url(tmp_path_factory):
+    dataset = Dataset.generate(str(tmp_path_factory.mktemp('data') / 'bench.qads'), posts=50, seed=1)
+    server = StandInServer(dataset).start()
+    yield server.url
+    server.stop()
+    dataset.close()
+
+
+@pytest.fixture
+def item_schema():
+    return ITEM_SCHEMA
+
+
+@pytest.fixture
+def assert_schema(pytestconfig):
+    def _assert(data, schema):
+        record_schema(pytestconfig, schema)
+        assert all(key in data for key in schema['required'])
+    return _assert
+"""
+
+IMPACT_SUITE = """
+import os
+import requests
+
+
+def test_post(base_url, item_schema, assert_schema):
+    assert_schema(requests.get(f"{base_url}/posts/1").json(), item_schema)
+
+
+def test_user(base_url):
+    assert requests.get(f"{base_url}/api/users/2").status_code == 200
+
+
+def test_echo(base_url):
+    assert requests.post(f"{base_url}/post", json={}).status_code == 200
+
+
+def test_flag():
+    assert os.path.exists('pass.flag')
+"""
+
+
+@pytest.mark.harness
+def test_impact_selects_tests_affected_by_changes(tmp_path):
+    """
+    TC-HRN-025: The coverage index records routes and schemas; --impact runs only the affected tests
+    Verifies: Digest-based selection, explicit routes, failed tests rerun, stale index falls back to all
+    """
+    # Arrange
+    (tmp_path / 'pytest.ini').write_text('[pytest]\n')
+    (tmp_path / 'conftest.py').write_text(IMPACT_CONFTEST)
+    (tmp_path / 'test_sample.py').write_text(IMPACT_SUITE)
+    (tmp_path / 'helpers.py').write_text('TIMEOUT = 5\n')
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    
+    def pytest_run(*args):
+        return subprocess.run(
+            [sys.executable, '-m', 'pytest', '-p', 'harness.impact', '-p', 'no:cacheprovider', '-q', *args],
+            cwd=str(tmp_path), env=env, capture_output=True, text=True, timeout=120
+        )
+    
+    def selected(*args):
+        output = pytest_run('--impact', '--collect-only', *args).stdout
+        return sorted(line.split('::')[1] for line in output.splitlines() if line.startswith('test_sample.py::'))
+    
+    # Act
+    first = pytest_run()
+    index = json.loads((tmp_path / '.api-impact.json').read_text())['tests']
+    unchanged = selected()
+    by_route = selected('--impact-route', 'GET /api/users/{id}', '--impact-route', '/post')
+    (tmp_path / 'conftest.py').write_text(IMPACT_CONFTEST.replace("['id']", "['id', 'title']"))
+    schema_changed = selected()
+    (tmp_path / 'conftest.py').write_text(IMPACT_CONFTEST + '\n# A comment is not a change\n')
+    comment_only = selected()
+    (tmp_path / 'pass.flag').write_text('')
+    rerun = pytest_run('--impact')
+    nothing = pytest_run('--impact')
+    (tmp_path / 'helpers.py').write_text('TIMEOUT = 10\n')
+    stale = selected()
+    
+    # Assert
+    assert '1 failed, 3 passed' in first.stdout
+    assert index['test_sample.py::test_post']['routes'] == ['GET /posts/{id}']
+    assert index['test_sample.py::test_post']['schemas'] == ['item_schema']
+    assert index['test_sample.py::test_echo']['routes'] == ['POST /post']
+    assert index['test_sample.py::test_flag']['outcome'] == 'failed'
+    assert unchanged == ['test_flag']
+    assert by_route == ['test_echo', 'test_flag', 'test_user']
+    assert schema_changed == ['test_flag', 'test_post']
+    assert comment_only == ['test_flag']
+    assert '1 passed, 3 deselected' in rerun.stdout
+    assert nothing.returncode == 0 and 'running 0 of 4 tests' in nothing.stdout
+    assert stale == ['test_echo', 'test_flag', 'test_post', 'test_user']
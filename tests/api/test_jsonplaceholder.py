@@ -6,10 +6,12 @@ Tests posts, comments, todos endpoints with CRUD operations and filtering
 import pytest
 import requests
 
+from harness.cases import lazy_cases, standin_ids
+
 
 @pytest.mark.smoke
 @pytest.mark.crud
-def test_get_all_posts(api_session, jsonplaceholder_base_url, assert_response_time):
+def test_get_all_posts(api_session, jsonplaceholder_base_url, assert_latency_slo, list_counts):
     """
     TC-API-013: GET /posts returns 100 posts
     Verifies: Status 200, returns expected number of posts
@@ -19,11 +21,11 @@ def test_get_all_posts(api_session, jsonplaceholder_base_url, assert_response_ti
     
     # Assert
     assert response.status_code == 200, f"Expected 200, got {response.status_code}"
-    assert_response_time(response, max_time_ms=1000)
+    assert_latency_slo(response, max_time_ms=1000)
     
     posts = response.json()
     assert isinstance(posts, list), "Response should be a list"
-    assert len(posts) == 100, f"Expected 100 posts, got {len(posts)}"
+    assert len(posts) == list_counts['posts'], f"Expected {list_counts['posts']} posts, got {len(posts)}"
 
 
 @pytest.mark.smoke
@@ -49,6 +51,23 @@ def test_get_single_post(api_session, jsonplaceholder_base_url, post_schema, ass
     assert_json_schema(post, post_schema)
 
 
+@pytest.mark.regression
+@lazy_cases('post_id', standin_ids('posts'), ids='post-{}')
+def test_get_every_post(api_session, jsonplaceholder_base_url, post_schema, assert_json_schema, post_id):
+    """
+    TC-API-032: GET /posts/{id} returns the post for every id of the stand-in dataset
+    Verifies: Status 200, id echoed, schema compliance (cases materialised lazily)
+    """
+    # Act
+    response = api_session.get(f"{jsonplaceholder_base_url}/posts/{post_id}")
+    
+    # Assert
+    assert response.status_code == 200, f"Post {post_id}: expected 200, got {response.status_code}"
+    post = response.json()
+    assert post['id'] == post_id
+    assert_json_schema(post, post_schema)
+
+
 @pytest.mark.crud
 def test_filter_posts_by_user(api_session, jsonplaceholder_base_url):
     """
@@ -193,7 +212,7 @@ def test_filter_comments_by_post(api_session, jsonplaceholder_base_url):
 
 
 @pytest.mark.smoke
-def test_get_todos(api_session, jsonplaceholder_base_url):
+def test_get_todos(api_session, jsonplaceholder_base_url, list_counts):
     """
     GET /todos returns todo items
     Verifies: Todo endpoint works correctly
@@ -206,7 +225,7 @@ def test_get_todos(api_session, jsonplaceholder_base_url):
     
     todos = response.json()
     assert isinstance(todos, list)
-    assert len(todos) == 200, f"Expected 200 todos, got {len(todos)}"
+    assert len(todos) == list_counts['todos'], f"Expected {list_counts['todos']} todos, got {len(todos)}"
     
     # Verify todo structure
     first_todo = todos[0]
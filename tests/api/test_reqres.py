@@ -3,13 +3,18 @@ API Tests for reqres.in
 Tests user management endpoints: CRUD operations, authentication, pagination
 """
 
+from dataclasses import replace
+
 import pytest
 import requests
 
+from harness.cases import lazy_cases, standin_ids
+from harness.scenario import USER_LIFECYCLE
+
 
 @pytest.mark.smoke
 @pytest.mark.crud
-def test_list_users_with_pagination(api_session, reqres_base_url, assert_response_time):
+def test_list_users_with_pagination(api_session, reqres_base_url, assert_latency_slo):
     """
     TC-API-001: GET /api/users?page=2 returns paginated users
     Verifies: Status 200, pagination metadata, user array
@@ -19,7 +24,7 @@ def test_list_users_with_pagination(api_session, reqres_base_url, assert_respons
     
     # Assert
     assert response.status_code == 200, f"Expected 200, got {response.status_code}"
-    assert_response_time(response, max_time_ms=500)
+    assert_latency_slo(response, max_time_ms=500)
     
     data = response.json()
     assert 'page' in data, "Response missing 'page' field"
@@ -36,10 +41,10 @@ def test_list_users_with_pagination(api_session, reqres_base_url, assert_respons
 
 @pytest.mark.smoke
 @pytest.mark.crud
-def test_get_single_user(api_session, reqres_base_url, user_schema, assert_json_schema):
+def test_get_single_user(api_session, reqres_base_url, user_schema, assert_json_schema, assert_snapshot):
     """
     TC-API-002: GET /api/users/2 returns correct user object
-    Verifies: Status 200, user object structure, JSON schema compliance
+    Verifies: Status 200, user object structure, JSON schema compliance, stored snapshot
     """
     # Act
     response = api_session.get(f"{reqres_base_url}/users/2")
@@ -59,6 +64,26 @@ def test_get_single_user(api_session, reqres_base_url, user_schema, assert_json_
     
     # Validate against JSON schema
     assert_json_schema(user, user_schema)
+    
+    # Compare with the stored snapshot; names and email are masked, so it pins fields, id and avatar
+    assert_snapshot(user, name='user', mask=['email', 'first_name', 'last_name'])
+
+
+@pytest.mark.regression
+@lazy_cases('user_id', standin_ids('users'), ids='user-{}')
+def test_get_every_user(api_session, reqres_base_url, user_schema, assert_json_schema, user_id):
+    """
+    TC-API-030: GET /api/users/{id} returns the user for every id of the stand-in dataset
+    Verifies: Status 200, id echoed, schema compliance (cases materialised lazily)
+    """
+    # Act
+    response = api_session.get(f"{reqres_base_url}/users/{user_id}")
+    
+    # Assert
+    assert response.status_code == 200, f"User {user_id}: expected 200, got {response.status_code}"
+    user = response.json()['data']
+    assert user['id'] == user_id
+    assert_json_schema(user, user_schema)
 
 
 @pytest.mark.negative
@@ -269,3 +294,40 @@ def test_login_invalid_credentials(api_session, reqres_base_url):
     
     data = response.json()
     assert 'error' in data, "Error response should include 'error' field"
+
+
+@pytest.mark.crud
+@pytest.mark.performance
+def test_user_lifecycle_workflow(run_scenario):
+    """
+    TC-API-033: POST, PUT, PATCH and DELETE the same user as one workflow
+    Verifies: Created id flows into later steps, updates reflect the created user, DELETE returns 204
+    """
+    # Arrange
+    def created(response, context):
+        user = response.json()
+        assert user['name'] == f"QA User {context['instance']}" and user['id']
+        context['name'] = user['name']
+    
+    def updated(response, context):
+        user = response.json()
+        assert user['name'] == context['name'], f"PUT returned {user['name']}, created {context['name']}"
+        assert user['job'] == 'Senior Test Engineer' and 'updatedAt' in user
+    
+    def patched(response, context):
+        user = response.json()
+        assert user['job'] == 'QA Lead' and 'updatedAt' in user
+    
+    def deleted(response, context):
+        assert response.status_code == 204 and not response.content
+    
+    checks = {'create': created, 'update': updated, 'patch': patched, 'delete': deleted}
+    scenario = replace(USER_LIFECYCLE, steps=[replace(step, check=checks[step.name]) for step in USER_LIFECYCLE.steps])
+    
+    # Act
+    result = run_scenario(scenario, instances=2)
+    
+    # Assert
+    assert result.failed == 0, f"Workflow failures: {result.errors}"
+    assert result.completed == 2
+    assert {name: len(latencies) for name, latencies in result.step_ms.items()} == dict.fromkeys(checks, 2)